@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import json
+import sqlite3
+import argparse
+import resource
+import tempfile
+import multiprocessing
+sys.path.append(os.path.realpath(os.path.dirname(__file__) + "/../"))
+from monzo_utils.lib.fake_monzo_api import FakeMonzoData, FakeMonzoServer
+
+SCHEMA_SQLITE = os.path.realpath(os.path.dirname(__file__) + "/../schema_sqlite3.sql")
+
+# effectively unlimited, the fake api doesn't need protecting
+UNTHROTTLED = {'rate': 100000, 'burst': 100000}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark monzo-sync against a local fake Monzo API')
+    parser.add_argument('--accounts', type=int, default=2, help='number of accounts')
+    parser.add_argument('--pots', type=int, default=3, help='number of pots per account')
+    parser.add_argument('--transactions', type=int, default=1000, help='number of transactions per account')
+    parser.add_argument('--days', type=int, default=89, help='days of history to generate and sync')
+    parser.add_argument('--latency', type=float, default=0, help='simulated api latency per request in seconds')
+    parser.add_argument('--mode', choices=['sync','backfill'], default='backfill', help='run MonzoSync.backfill or MonzoSync.sync')
+    parser.add_argument('--passes', type=int, default=2, help='number of passes, the first inserts and the rest update')
+    parser.add_argument('--drivers', default='sqlite,mysql', help='comma-separated db drivers to benchmark')
+    parser.add_argument('--mysql-host', default='127.0.0.1')
+    parser.add_argument('--mysql-port', type=int, default=3306)
+    parser.add_argument('--mysql-user', default='monzo')
+    parser.add_argument('--mysql-password', default='monzo')
+    parser.add_argument('--mysql-database', default=None, help='empty database created from schema_mysql.sql')
+    parser.add_argument('--json', action='store_true', help='output results as json')
+
+    return parser.parse_args()
+
+
+def db_config(driver, args, tmpdir):
+    if driver == 'sqlite':
+        path = f"{tmpdir}/data.db"
+
+        db = sqlite3.connect(path)
+        db.executescript(open(SCHEMA_SQLITE).read())
+        db.close()
+
+        return {
+            'driver': 'sqlite',
+            'path': path
+        }
+
+    return {
+        'driver': 'mysql',
+        'host': args.mysql_host,
+        'port': args.mysql_port,
+        'user': args.mysql_user,
+        'password': args.mysql_password,
+        'database': args.mysql_database
+    }
+
+
+def run(driver_config, api_url, accounts, expected, mode, days, passes, tmpdir, results):
+    # keep the log lines off the terminal
+    sys.stdin = open(os.devnull)
+
+    from monzo_utils.lib.config import Config
+    from monzo_utils.lib.db import DB
+    from monzo_utils.lib.log import Log
+    from monzo_utils.lib.monzo_api import MonzoAPI
+    from monzo_utils.lib.monzo_sync import MonzoSync
+    from monzo_utils.lib.fake_monzo_api import fake_client
+
+    Config._instances[Config] = Config({
+        'db': driver_config,
+        'accounts': accounts,
+        'rate_limits': {
+            'endpoints': {
+                'accounts': UNTHROTTLED,
+                'pots': UNTHROTTLED,
+                'transactions': UNTHROTTLED
+            }
+        }
+    }, tmpdir)
+
+    Log().logfile = f"{tmpdir}/logfile"
+
+    if DB().one("select count(*) as count from `transaction`")['count'] != 0:
+        results.put({'driver': driver_config['driver'], 'error': 'database is not empty'})
+        return
+
+    m = MonzoSync(api=MonzoAPI(fake_client(api_url)))
+    m.backfill_file = f"{tmpdir}/backfill.json"
+
+    for i in range(0, passes):
+        if os.path.exists(m.backfill_file):
+            os.remove(m.backfill_file)
+
+        queries = DB().query_count
+        start = time.time()
+
+        if mode == 'backfill':
+            m.backfill()
+        else:
+            m.sync(days=days)
+
+        duration = time.time() - start
+        queries = DB().query_count - queries
+
+        transactions = DB().one("select count(*) as count from `transaction`")['count']
+
+        # the figures are meaningless if only part of the data was synced, eg
+        # sync mode only fetches the first page of each account
+        if transactions != expected:
+            results.put({'driver': driver_config['driver'], 'pass': i + 1, 'error': f"synced {transactions} of {expected} transactions"})
+            return
+
+        results.put({
+            'driver': driver_config['driver'],
+            'pass': i + 1,
+            'transactions': transactions,
+            'seconds': duration,
+            'tx_per_sec': transactions / duration if duration >0 else 0,
+            'queries': queries,
+            'queries_per_tx': queries / transactions if transactions >0 else 0,
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        })
+
+
+def benchmark(driver, args, server, accounts, expected):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = multiprocessing.Queue()
+
+        # each driver runs in its own process so that peak rss is per driver
+        process = multiprocessing.Process(target=run, args=(db_config(driver, args, tmpdir), server.url, accounts, expected, args.mode, args.days, args.passes, tmpdir, results))
+        process.start()
+        process.join()
+
+        driver_results = []
+
+        while not results.empty():
+            driver_results.append(results.get())
+
+        if process.exitcode != 0 and len(driver_results) == 0:
+            driver_results.append({'driver': driver, 'error': f"benchmark process exited with code {process.exitcode}"})
+
+        return driver_results
+
+
+def display(results):
+    print("%-8s %5s %12s %9s %10s %9s %11s %12s" % ('driver', 'pass', 'transactions', 'seconds', 'tx/sec', 'queries', 'queries/tx', 'peak rss mb'))
+
+    for result in results:
+        if 'error' in result:
+            print("%-8s error: %s" % (result['driver'], result['error']))
+            continue
+
+        print("%-8s %5d %12d %9.2f %10.1f %9d %11.1f %12.1f" % (
+            result['driver'],
+            result['pass'],
+            result['transactions'],
+            result['seconds'],
+            result['tx_per_sec'],
+            result['queries'],
+            result['queries_per_tx'],
+            result['peak_rss_mb']
+        ))
+
+
+def main():
+    args = parse_args()
+
+    data = FakeMonzoData(accounts=args.accounts, pots=args.pots, transactions=args.transactions, days=args.days)
+
+    accounts = {}
+
+    for i in range(0, len(data.accounts)):
+        accounts[data.accounts[i]['id']] = {
+            'name': f"Account {i+1}",
+            'sortcode': '040004',
+            'account_no': f"{i+1:08d}"
+        }
+
+    # every account and pot account transaction should end up in the database
+    expected = sum([len(data.transactions[account_id]) for account_id in data.transactions])
+
+    server = FakeMonzoServer(data, latency=args.latency).start()
+
+    results = []
+
+    try:
+        for driver in args.drivers.split(','):
+            if driver == 'mysql' and args.mysql_database is None:
+                results.append({'driver': driver, 'error': 'skipped, --mysql-database not specified'})
+                continue
+
+            results += benchmark(driver, args, server, accounts, expected)
+    finally:
+        server.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+    else:
+        display(results)
+
+
+if __name__ == '__main__':
+    main()
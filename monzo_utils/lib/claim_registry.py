@@ -0,0 +1,31 @@
+# the transactions that have been matched to a payment. a transaction can
+# only be claimed once so claims have to be made in a fixed order (payment
+# lists in config order, yearly before monthly) to get the same result
+class ClaimRegistry:
+
+    def __init__(self):
+        self.seen = {}
+
+
+    def is_claimed(self, transaction_id):
+        return transaction_id in self.seen
+
+
+    # claiming a transaction again for the same owner succeeds, so a payment
+    # that's rebuilt within a run finds the same transaction. payments use
+    # their config entry as the owner
+    def claim(self, transaction_id, owner=1):
+        if transaction_id in self.seen:
+            return self.seen[transaction_id] == owner
+
+        self.seen[transaction_id] = owner
+
+        return True
+
+
+    def owner(self, transaction_id):
+        return self.seen[transaction_id] if transaction_id in self.seen else None
+
+
+    def reset(self):
+        self.seen = {}
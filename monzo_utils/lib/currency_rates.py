@@ -0,0 +1,184 @@
+import os
+import math
+import pickle
+import datetime
+from array import array
+from zipfile import ZipFile
+from monzo_utils.lib.singleton import Singleton
+
+REF_CURRENCY = 'EUR'
+
+# ECB reference rates loaded once per process into a date x currency table,
+# replacing a CurrencyConverter() (and a full parse of the rate history)
+# per conversion
+class CurrencyRates(metaclass=Singleton):
+
+    def __init__(self, cache_file=None, currency_file=None):
+        self.cache_file = cache_file
+        self.currency_file = currency_file
+        self.loaded = False
+
+
+    def load(self):
+        if self.loaded:
+            return
+
+        # currency_converter is only imported once a conversion is needed
+        if self.currency_file is None:
+            from currency_converter import CURRENCY_FILE
+
+            self.currency_file = CURRENCY_FILE
+
+        stat = os.stat(self.currency_file)
+        key = [self.currency_file, stat.st_mtime, stat.st_size]
+
+        data = None
+
+        if self.cache_file and os.path.exists(self.cache_file):
+            try:
+                data = pickle.loads(open(self.cache_file, 'rb').read())
+
+                if data['key'] != key:
+                    data = None
+            except Exception:
+                data = None
+
+        if data is None:
+            data = self.parse(self.currency_file)
+            data['key'] = key
+
+            if self.cache_file:
+                try:
+                    with open(self.cache_file + '.new', 'wb') as f:
+                        f.write(pickle.dumps(data))
+
+                    os.rename(self.cache_file + '.new', self.cache_file)
+                except Exception:
+                    pass
+
+        self.dates = data['dates']
+        self.currencies = data['currencies']
+        self.rates = data['rates']
+
+        self.date_index = {}
+
+        for i in range(0, len(self.dates)):
+            self.date_index[self.dates[i]] = i
+
+        self.currency_index = {}
+
+        for i in range(0, len(self.currencies)):
+            self.currency_index[self.currencies[i]] = i
+
+        # the most recent date that each currency has a rate for
+        self.last_date = {}
+
+        for currency in self.currencies:
+            for i in range(len(self.dates) - 1, -1, -1):
+                if not math.isnan(self.rates[i * len(self.currencies) + self.currency_index[currency]]):
+                    self.last_date[currency] = self.dates[i]
+                    break
+
+        self.last_date[REF_CURRENCY] = self.dates[-1]
+
+        self.loaded = True
+
+
+    # returns the dates as ordinals in ascending order, the currencies and a
+    # flat array of rates (one row per date, nan where there is no rate)
+    def parse(self, currency_file):
+        if currency_file.endswith('.zip'):
+            zip_file = ZipFile(currency_file)
+            lines = []
+
+            for name in zip_file.namelist():
+                lines += zip_file.read(name).decode('utf-8').splitlines()
+        else:
+            lines = open(currency_file).read().splitlines()
+
+        header = [currency.strip() for currency in lines[0].strip().split(',')[1:]]
+        columns = [i for i in range(0, len(header)) if header[i]]
+        currencies = [header[i] for i in columns]
+
+        rows = {}
+
+        for line in lines[1:]:
+            line = line.strip().split(',')
+
+            if len(line) <2:
+                continue
+
+            date = datetime.date(int(line[0][:4]), int(line[0][5:7]), int(line[0][8:10])).toordinal()
+            row = []
+
+            for i in columns:
+                if i + 1 < len(line) and line[i + 1] not in ['', 'N/A']:
+                    row.append(float(line[i + 1]))
+                else:
+                    row.append(math.nan)
+
+            rows[date] = row
+
+        dates = sorted(rows.keys())
+        rates = array('d')
+
+        for date in dates:
+            rates.extend(rows[date])
+
+        return {
+            'dates': dates,
+            'currencies': currencies,
+            'rates': rates
+        }
+
+
+    def rate(self, currency, date):
+        if currency == REF_CURRENCY:
+            return 1.0
+
+        date = date.toordinal()
+
+        if date not in self.date_index:
+            self.rate_not_found(currency, date)
+
+        rate = self.rates[self.date_index[date] * len(self.currencies) + self.currency_index[currency]]
+
+        if math.isnan(rate):
+            self.rate_not_found(currency, date)
+
+        return rate
+
+
+    def rate_not_found(self, currency, date):
+        from currency_converter import RateNotFoundError
+
+        raise RateNotFoundError(f"{currency} has no rate for {datetime.date.fromordinal(date)}")
+
+
+    def factor(self, currency, new_currency, date=None):
+        self.load()
+
+        for c in [currency, new_currency]:
+            if c != REF_CURRENCY and c not in self.currency_index:
+                raise ValueError(f"{c} is not a supported currency")
+
+        if date is None:
+            date = datetime.date.fromordinal(self.last_date[currency])
+        elif type(date) == datetime.datetime:
+            date = date.date()
+
+        return self.rate(currency, date), self.rate(new_currency, date)
+
+
+    # same result as CurrencyConverter().convert(), the most recent rate is
+    # used unless a date is given
+    def convert(self, amount, currency, new_currency='GBP', date=None):
+        r0, r1 = self.factor(currency, new_currency, date)
+
+        return float(amount) / r0 * r1
+
+
+    def convert_many(self, amounts, currency, new_currency='GBP', date=None):
+        r0, r1 = self.factor(currency, new_currency, date)
+
+        return [float(amount) / r0 * r1 for amount in amounts]
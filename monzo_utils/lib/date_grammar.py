@@ -0,0 +1,69 @@
+import re
+import datetime
+import calendar
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+ISO_DATE = re.compile(r'^([\d]{4})-([\d]{1,2})-([\d]{1,2})(?:[ t]([\d]{1,2}):([\d]{2})(?::([\d]{2}))?)?$')
+YEAR_MONTH = re.compile(r'^([\d]{4})-([\d]{1,2})$')
+YEAR = re.compile(r'^([\d]{4})$')
+AGO = re.compile(r'^([\d]+|an?) (day|week|month|year)s? ago$')
+
+# parses the date forms people actually type into monzo-search without having
+# to load dateparser. returns None for anything it doesn't understand so the
+# caller can fall back to dateparser
+class DateGrammar:
+
+    def parse(self, value, now=None):
+        if now is None:
+            now = datetime.datetime.now()
+
+        value = value.strip().lower()
+        today = datetime.datetime(now.year, now.month, now.day)
+
+        try:
+            m = ISO_DATE.match(value)
+
+            if m:
+                return datetime.datetime(*[int(part) for part in m.groups() if part is not None])
+
+            m = YEAR_MONTH.match(value)
+
+            if m:
+                return datetime.datetime(int(m.group(1)), int(m.group(2)), 1)
+
+            if YEAR.match(value):
+                return datetime.datetime(int(value), 1, 1)
+        except ValueError:
+            return None
+
+        if value == 'today':
+            return today
+
+        if value == 'yesterday':
+            return today - datetime.timedelta(days=1)
+
+        m = AGO.match(value)
+
+        if m:
+            return self.ago(today, 1 if m.group(1) in ['a', 'an'] else int(m.group(1)), m.group(2))
+
+        if value in WEEKDAYS:
+            return today - datetime.timedelta(days=(today.weekday() - WEEKDAYS.index(value)) % 7)
+
+        return None
+
+
+    def ago(self, today, n, unit):
+        if unit == 'day':
+            return today - datetime.timedelta(days=n)
+
+        if unit == 'week':
+            return today - datetime.timedelta(weeks=n)
+
+        months = today.year * 12 + today.month - 1 - (n * 12 if unit == 'year' else n)
+
+        year = months // 12
+        month = months % 12 + 1
+
+        return datetime.datetime(year, month, min(today.day, calendar.monthrange(year, month)[1]))
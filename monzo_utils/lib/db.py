@@ -1,4 +1,3 @@
-import MySQLdb
 import re
 import sys
 import os
@@ -10,6 +9,8 @@ from monzo_utils.lib.config import Config
 
 class DB(metaclass=Singleton):
 
+    query_count = 0
+
     def __init__(self, db_config=None, config_path=None):
         if db_config:
             self.config = db_config
@@ -40,6 +41,8 @@ class DB(metaclass=Singleton):
             print("SQL: %s" % (sql))
             print("PARAMS: %s" % (json.dumps(self.json_params(params),indent=4)))
 
+        self.query_count += 1
+
         result = self.driver.query(sql, params)
 
         if type(result) == list:
@@ -53,6 +56,22 @@ class DB(metaclass=Singleton):
         return result
 
 
+    def begin(self):
+        self.driver.begin()
+
+
+    def commit(self):
+        self.driver.commit()
+
+
+    def rollback(self):
+        self.driver.rollback()
+
+
+    def ping(self):
+        self.driver.ping()
+
+
     def fix_dates(self, row):
         fixed_row = {}
 
@@ -95,6 +114,8 @@ class DB(metaclass=Singleton):
         self._join = []
         self._leftJoin = []
         self._groupBy = None
+        self._limit = None
+        self._offset = None
 
         return self
 
@@ -165,6 +186,13 @@ class DB(metaclass=Singleton):
         return self
 
 
+    def limit(self, limit, offset=None):
+        self._limit = limit
+        self._offset = offset
+
+        return self
+
+
     def prepare(self):
         if self.sel == []:
             select = '*'
@@ -222,11 +250,20 @@ class DB(metaclass=Singleton):
         if self._orderDir:
             sql += " " + self._orderDir
 
+        if self._limit is not None:
+            sql += f" limit {int(self._limit)}"
+
+            if self._offset:
+                sql += f" offset {int(self._offset)}"
+
         return sql
 
 
     def getone(self):
-        sql = self.prepare() + " limit 1"
+        sql = self.prepare()
+
+        if self._limit is None:
+            sql += " limit 1"
 
         return self.one(sql, self.whereParams)
 
@@ -240,6 +277,23 @@ class DB(metaclass=Singleton):
         return rows
 
 
+    # like getall() but yields the rows as the driver fetches them rather than
+    # loading the whole result into memory
+    def iterate(self):
+        return self.stream(self.prepare(), self.whereParams)
+
+
+    def stream(self, sql, params=[]):
+        if 'DEBUG' in os.environ and os.environ['DEBUG'] == '1':
+            print("SQL: %s" % (sql))
+            print("PARAMS: %s" % (json.dumps(self.json_params(params),indent=4)))
+
+        self.query_count += 1
+
+        for row in self.driver.iterate(sql, params):
+            yield self.fix_dates(row)
+
+
     def get_raw_query(self):
         sql = self.prepare()
 
@@ -266,6 +320,18 @@ class DB(metaclass=Singleton):
         return raw_sql
 
 
+    def table_exists(self, table):
+        if table not in self.columns:
+            columns = self.driver.get_columns(table, exclude=['id'])
+
+            if len(columns) == 0:
+                return False
+
+            self.columns[table] = columns
+
+        return True
+
+
     def update(self, table, _id, data):
         if table not in self.columns:
             self.columns[table] = self.driver.get_columns(table, exclude=['id'])
@@ -1,9 +1,14 @@
 import MySQLdb
+import MySQLdb.cursors
 import sys
 import os
 
+ITERATE_BATCH_SIZE = 500
+
 class mysql:
 
+    autocommit = True
+
     def __init__(self, config):
         self.config = config
         self.columns = {}
@@ -28,10 +33,12 @@ class mysql:
         self.cur.execute((sql), params)
 
         if sql[0:6].lower() == "select":
-            self.db.commit()
+            if self.autocommit:
+                self.db.commit()
             return self.build_rows(self.cur.fetchall())
 
-        self.db.commit()
+        if self.autocommit:
+            self.db.commit()
 
         if sql[0:6].lower() == "insert":
             return self.cur.lastrowid
@@ -39,11 +46,57 @@ class mysql:
         return None
 
 
-    def build_row(self, data):
+    # streams the rows of a select from the server in batches. the connection
+    # can't run other queries until the rows have been consumed
+    def iterate(self, sql, params=[], batch_size=ITERATE_BATCH_SIZE):
+        cur = self.db.cursor(MySQLdb.cursors.SSCursor)
+
+        try:
+            cur.execute(sql, params)
+
+            while True:
+                batch = cur.fetchmany(batch_size)
+
+                if not batch:
+                    break
+
+                for item in batch:
+                    yield self.build_row(item, cur)
+        finally:
+            cur.close()
+
+            if self.autocommit:
+                self.db.commit()
+
+
+    def ping(self):
+        try:
+            self.db.ping()
+        except MySQLdb.OperationalError:
+            self.connect()
+
+
+    def begin(self):
+        self.autocommit = False
+
+
+    def commit(self):
+        self.db.commit()
+        self.autocommit = True
+
+
+    def rollback(self):
+        self.db.rollback()
+        self.autocommit = True
+
+
+    def build_row(self, data, cur=None):
+        description = (cur or self.cur).description
+
         row = {}
 
-        for i in range(0, len(self.cur.description)):
-            row[self.cur.description[i][0]] = data[i]
+        for i in range(0, len(description)):
+            row[description[i][0]] = data[i]
 
         return row
 
@@ -57,6 +110,17 @@ class mysql:
         return rows
 
 
+    # sql expression for the value at a json path (passed as a parameter) in a
+    # json column
+    def json_value(self, column):
+        return f"json_unquote(json_extract({column}, %s))"
+
+
+    # start of an insert that skips rows which would duplicate a unique key
+    def insert_ignore(self, table):
+        return f"insert ignore into `{table}`"
+
+
     def get_columns(self, table, exclude=None):
         columns = []
 
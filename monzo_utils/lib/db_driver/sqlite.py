@@ -2,8 +2,12 @@ import sqlite3
 import sys
 import os
 
+ITERATE_BATCH_SIZE = 500
+
 class sqlite:
 
+    autocommit = True
+
     def __init__(self, config):
         self.config = config
         self.columns = {}
@@ -21,10 +25,12 @@ class sqlite:
         result = self.cur.execute((sql), params)
 
         if sql[0:6].lower() in ['select','pragma']:
-            self.db.commit()
+            if self.autocommit:
+                self.db.commit()
             return self.build_rows(result.fetchall())
 
-        self.db.commit()
+        if self.autocommit:
+            self.db.commit()
 
         if sql[0:6].lower() == "insert":
             return self.cur.lastrowid
@@ -32,11 +38,56 @@ class sqlite:
         return None
 
 
-    def build_row(self, data):
+    # fetches the rows of a select in batches on a cursor of its own so that
+    # other queries can run while the rows are being consumed
+    def iterate(self, sql, params=[], batch_size=ITERATE_BATCH_SIZE):
+        sql = sql.replace('%s', '?')
+
+        cur = self.db.cursor()
+
+        try:
+            cur.execute(sql, params)
+
+            while True:
+                batch = cur.fetchmany(batch_size)
+
+                if not batch:
+                    break
+
+                for item in batch:
+                    yield self.build_row(item, cur)
+        finally:
+            cur.close()
+
+            if self.autocommit:
+                self.db.commit()
+
+
+    def ping(self):
+        pass
+
+
+    def begin(self):
+        self.autocommit = False
+
+
+    def commit(self):
+        self.db.commit()
+        self.autocommit = True
+
+
+    def rollback(self):
+        self.db.rollback()
+        self.autocommit = True
+
+
+    def build_row(self, data, cur=None):
+        description = (cur or self.cur).description
+
         row = {}
 
-        for i in range(0, len(self.cur.description)):
-            row[self.cur.description[i][0]] = data[i]
+        for i in range(0, len(description)):
+            row[description[i][0]] = data[i]
 
         return row
 
@@ -50,6 +101,17 @@ class sqlite:
         return rows
 
 
+    # sql expression for the value at a json path (passed as a parameter) in a
+    # json column
+    def json_value(self, column):
+        return f"json_extract({column}, %s)"
+
+
+    # start of an insert that skips rows which would duplicate a unique key
+    def insert_ignore(self, table):
+        return f"insert or ignore into `{table}`"
+
+
     def get_columns(self, table, exclude=None):
         columns = []
 
@@ -0,0 +1,163 @@
+import os
+import re
+
+class DescriptionMatcher:
+
+    # compiled matchers by config file, reused until the file changes
+    cache = {}
+
+    def __init__(self, patterns=[]):
+        self.patterns = []
+        self.ids = {}
+        self.regexes = {}
+        self.always = []
+        self.keywords = {}
+        self.results = {}
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.compiled = False
+
+        for pattern in patterns:
+            self.add(pattern)
+
+
+    @classmethod
+    def load(cls, config_file, patterns=[]):
+        if config_file is None:
+            return cls(patterns)
+
+        mtime = os.stat(config_file).st_mtime
+
+        if config_file not in cls.cache or cls.cache[config_file][0] != mtime:
+            cls.cache[config_file] = [mtime, cls()]
+
+        matcher = cls.cache[config_file][1]
+
+        for pattern in patterns:
+            matcher.add(pattern)
+
+        return matcher
+
+
+    # adds a description pattern, matched like the sql "description like
+    # '%<pattern>%'", and returns its id
+    def add(self, pattern):
+        pattern = pattern.lower()
+
+        if pattern in self.ids:
+            return self.ids[pattern]
+
+        pattern_id = len(self.patterns)
+
+        self.patterns.append(pattern)
+        self.ids[pattern] = pattern_id
+
+        # patterns with LIKE wildcards are found by their longest literal part
+        # and then checked against the full pattern
+        if '%' in pattern or '_' in pattern:
+            keyword = max(re.split('[%_]', pattern), key=len)
+
+            regex = ''
+
+            for char in '%' + pattern + '%':
+                if char == '%':
+                    regex += '.*'
+                elif char == '_':
+                    regex += '.'
+                else:
+                    regex += re.escape(char)
+
+            self.regexes[pattern_id] = re.compile(regex, re.IGNORECASE | re.DOTALL)
+        else:
+            keyword = pattern
+
+        if keyword == '':
+            self.always.append(pattern_id)
+        else:
+            if keyword not in self.keywords:
+                self.keywords[keyword] = []
+
+            self.keywords[keyword].append(pattern_id)
+
+        self.compiled = False
+
+        return pattern_id
+
+
+    # builds the aho-corasick automaton for all of the keywords
+    def compile(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for keyword in self.keywords:
+            state = 0
+
+            for char in keyword:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+
+                state = self.goto[state][char]
+
+            self.output[state] += self.keywords[keyword]
+
+        queue = list(self.goto[0].values())
+
+        while len(queue) >0:
+            state = queue.pop(0)
+
+            for char in self.goto[state]:
+                child = self.goto[state][char]
+                queue.append(child)
+
+                fail = self.fail[state]
+
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+
+                if char in self.goto[fail]:
+                    self.fail[child] = self.goto[fail][char]
+                else:
+                    self.fail[child] = 0
+
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+        self.results = {}
+        self.compiled = True
+
+
+    # returns the ids of every pattern that matches the description in a
+    # single scan, descriptions repeat a lot so the result is remembered
+    def match(self, description):
+        if description is None:
+            return frozenset()
+
+        if not self.compiled:
+            self.compile()
+
+        if description in self.results:
+            return self.results[description]
+
+        text = description.lower()
+        found = set(self.always)
+        state = 0
+
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+
+            state = self.goto[state].get(char, 0)
+
+            found.update(self.output[state])
+
+        for pattern_id in list(found):
+            if pattern_id in self.regexes and not self.regexes[pattern_id].fullmatch(description):
+                found.discard(pattern_id)
+
+        self.results[description] = frozenset(found)
+
+        return self.results[description]
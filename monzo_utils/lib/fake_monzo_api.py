@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+
+import re
+import json
+import time
+import random
+import datetime
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from monzo_utils.lib.monzo_api import MonzoClient
+
+DEFAULT_ACCOUNTS = 2
+DEFAULT_POTS = 3
+DEFAULT_TRANSACTIONS = 1000
+DEFAULT_DAYS = 89
+DEFAULT_MERCHANTS = 50
+DEFAULT_COUNTERPARTIES = 20
+MAX_LIMIT = 100
+
+CATEGORIES = ['groceries', 'eating_out', 'transport', 'shopping', 'bills', 'entertainment', 'general']
+CITIES = ['London', 'Manchester', 'Bristol', 'Leeds', 'Glasgow', 'Cardiff']
+
+# synthetic accounts, pots and transactions in the same shape as the Monzo API
+# responses so that they can be fed through MonzoSync unmodified
+class FakeMonzoData:
+
+    def __init__(self, accounts=DEFAULT_ACCOUNTS, pots=DEFAULT_POTS, transactions=DEFAULT_TRANSACTIONS, days=DEFAULT_DAYS, merchants=DEFAULT_MERCHANTS, counterparties=DEFAULT_COUNTERPARTIES, seed=1):
+        self.random = random.Random(seed)
+        self.now = datetime.datetime.utcnow().replace(microsecond=0)
+        self.days = days
+
+        self.accounts = []
+        self.balances = {}
+        self.pots = {}
+        self.transactions = {}
+
+        self.merchants = [self.merchant(i) for i in range(0, merchants)]
+        self.counterparties = [self.counterparty(i) for i in range(0, counterparties)]
+
+        for i in range(0, accounts):
+            account_id = f"acc_{i:016d}"
+
+            self.accounts.append({
+                'id': account_id,
+                'description': f"user_{i:016d}",
+                'created': self.format_date(self.now - datetime.timedelta(days=days+1)),
+                'closed': False,
+                'type': 'uk_retail'
+            })
+
+            self.balances[account_id] = self.random.randint(10000, 500000)
+            self.pots[account_id] = []
+            self.transactions[account_id] = []
+
+            for j in range(0, pots):
+                pot_id = f"pot_{i:08d}{j:08d}"
+                pot_account_id = f"pacc_{i:08d}{j:08d}"
+
+                self.pots[account_id].append({
+                    'id': pot_id,
+                    'name': f"Pot {j+1}",
+                    'style': 'beach_ball',
+                    'balance': self.random.randint(0, 200000),
+                    'currency': 'GBP',
+                    'created': self.accounts[-1]['created'],
+                    'updated': self.accounts[-1]['created'],
+                    'deleted': False,
+                    'goal_amount': None,
+                    'round_up_multiplier': None,
+                    'round_up': False,
+                    'type': 'default',
+                    'locked': False,
+                    'current_account_id': account_id,
+                    'pot_account_id': pot_account_id
+                })
+
+                self.transactions[pot_account_id] = []
+
+            for j in range(0, transactions):
+                self.add_transaction(account_id, j)
+
+        for account_id in self.transactions:
+            self.transactions[account_id].sort(key=lambda t: t['created'])
+
+
+    def format_date(self, date):
+        return date.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+    def merchant(self, i):
+        name = f"Merchant {i}"
+        city = self.random.choice(CITIES)
+
+        return {
+            'id': f"merch_{i:016d}",
+            'group_id': f"grp_{i:016d}",
+            'name': name,
+            'logo': f"https://example.com/logos/{i}.png",
+            'emoji': '',
+            'category': self.random.choice(CATEGORIES),
+            'online': self.random.random() < 0.3,
+            'atm': False,
+            'address': {
+                'short_formatted': f"{i} High Street, {city}",
+                'city': city,
+                'latitude': 51.5 + self.random.random(),
+                'longitude': -0.1 - self.random.random(),
+                'zoom_level': 17,
+                'approximate': False,
+                'formatted': f"{i} High Street, {city}, GB",
+                'address': f"{i} High Street",
+                'region': city,
+                'country': 'GBR',
+                'postcode': 'AB1 2CD'
+            },
+            'disable_feedback': False,
+            'suggested_tags': '',
+            'website': f"https://merchant{i}.example.com",
+            'metadata': {}
+        }
+
+
+    def counterparty(self, i):
+        return {
+            'user_id': f"anonuser_{i:016d}",
+            'account_id': f"acc_cp_{i:016d}",
+            'account_number': f"{self.random.randint(0, 99999999):08d}",
+            'sort_code': f"{self.random.randint(0, 999999):06d}",
+            'name': f"Counterparty {i}",
+            'preferred_name': f"Counterparty {i}",
+            'beneficiary_account_type': 'Personal'
+        }
+
+
+    def transaction(self, account_id, transaction_id, created, amount, description):
+        return {
+            'id': transaction_id,
+            'account_id': account_id,
+            'amount': amount,
+            'amount_is_pending': False,
+            'atm_fees_detailed': None,
+            'attachments': None,
+            'can_add_to_tab': False,
+            'can_be_excluded_from_breakdown': False,
+            'can_be_made_subscription': False,
+            'can_match_transactions_in_categorization': False,
+            'can_split_the_bill': False,
+            'categories': None,
+            'category': 'general',
+            'counterparty': {},
+            'created': self.format_date(created),
+            'currency': 'GBP',
+            'dedupe_id': transaction_id,
+            'decline_reason': '',
+            'description': description,
+            'fees': {},
+            'include_in_spending': True,
+            'international': None,
+            'is_load': False,
+            'labels': None,
+            'local_amount': amount,
+            'local_currency': 'GBP',
+            'merchant': None,
+            'metadata': {},
+            'notes': '',
+            'originator': False,
+            'scheme': 'mastercard',
+            'settled': self.format_date(created + datetime.timedelta(days=1)),
+            'updated': self.format_date(created),
+            'user_id': 'user_0000000000000000'
+        }
+
+
+    def add_transaction(self, account_id, i):
+        created = self.now - datetime.timedelta(seconds=self.random.randint(0, self.days * 86400))
+        transaction_id = f"tx_{account_id[4:]}{i:08d}"
+        kind = self.random.random()
+
+        if kind < 0.7 or len(self.pots[account_id]) == 0:
+            merchant = self.random.choice(self.merchants)
+            amount = 0 - self.random.randint(100, 10000)
+
+            transaction = self.transaction(account_id, transaction_id, created, amount, merchant['name'].upper())
+            transaction['merchant'] = json.loads(json.dumps(merchant))
+            transaction['category'] = merchant['category']
+            transaction['categories'] = {merchant['category']: amount}
+            transaction['metadata'] = {
+                'mcc': str(self.random.randint(1000, 9999)),
+                'ledger_insertion_id': f"entryset_{transaction_id}"
+            }
+
+        elif kind < 0.9:
+            counterparty = self.random.choice(self.counterparties)
+            amount = self.random.choice([1, -1]) * self.random.randint(500, 200000)
+
+            transaction = self.transaction(account_id, transaction_id, created, amount, f"Payment {i}")
+            transaction['counterparty'] = dict(counterparty)
+            transaction['scheme'] = 'payport_faster_payments'
+            transaction['metadata'] = {
+                'faster_payment': 'true',
+                'notes': f"Payment {i}"
+            }
+
+        else:
+            pot = self.random.choice(self.pots[account_id])
+            amount = self.random.choice([1, -1]) * self.random.randint(100, 50000)
+
+            transaction = self.transaction(account_id, transaction_id, created, amount, pot['id'])
+            transaction['scheme'] = 'uk_retail_pot'
+            transaction['metadata'] = {
+                'pot_id': pot['id'],
+                'pot_account_id': pot['pot_account_id'],
+                'external_id': f"pot_transfer_{transaction_id}"
+            }
+
+            pot_transaction = self.transaction(pot['pot_account_id'], f"tx_p{account_id[4:]}{i:08d}", created, 0 - amount, account_id)
+            pot_transaction['scheme'] = 'uk_retail_pot'
+            pot_transaction['metadata'] = {
+                'pot_id': pot['id'],
+                'external_id': f"pot_transfer_{transaction_id}"
+            }
+
+            self.transactions[pot['pot_account_id']].append(pot_transaction)
+
+        self.transactions[account_id].append(transaction)
+
+
+    def get_transactions(self, account_id, since=None, before=None, limit=MAX_LIMIT):
+        if account_id not in self.transactions:
+            return None
+
+        transactions = self.transactions[account_id]
+
+        if since:
+            if since.startswith('tx_'):
+                for i in range(0, len(transactions)):
+                    if transactions[i]['id'] == since:
+                        transactions = transactions[i+1:]
+                        break
+            else:
+                since = self.format_date(self.parse_date(since))
+
+                transactions = [t for t in transactions if t['created'] >= since]
+
+        if before:
+            before = self.format_date(self.parse_date(before))
+
+            transactions = [t for t in transactions if t['created'] < before]
+
+        return transactions[:min(limit, MAX_LIMIT)]
+
+
+    def parse_date(self, date):
+        return datetime.datetime.strptime(date[:19], '%Y-%m-%dT%H:%M:%S')
+
+
+    def get_pot(self, pot_id):
+        for account_id in self.pots:
+            for pot in self.pots[account_id]:
+                if pot['id'] == pot_id:
+                    return pot
+
+        return None
+
+
+class FakeMonzoRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+
+        if not self.authorised():
+            return
+
+        data = self.server.data
+
+        if url.path == '/accounts':
+            return self.respond(200, {'accounts': data.accounts})
+
+        if url.path == '/balance':
+            if params.get('account_id') not in data.balances:
+                return self.respond(404, {'message': 'account not found'})
+
+            return self.respond(200, {
+                'balance': data.balances[params['account_id']],
+                'total_balance': data.balances[params['account_id']],
+                'currency': 'GBP',
+                'spend_today': 0
+            })
+
+        if url.path == '/pots':
+            if params.get('current_account_id') not in data.pots:
+                return self.respond(404, {'message': 'account not found'})
+
+            return self.respond(200, {'pots': data.pots[params['current_account_id']]})
+
+        if url.path == '/transactions':
+            try:
+                limit = int(params['limit']) if 'limit' in params else MAX_LIMIT
+                transactions = data.get_transactions(params.get('account_id'), params.get('since'), params.get('before'), limit)
+            except ValueError:
+                return self.respond(400, {'message': 'bad request'})
+
+            if transactions is None:
+                return self.respond(404, {'message': 'account not found'})
+
+            return self.respond(200, {'transactions': transactions})
+
+        self.respond(404, {'message': 'not found'})
+
+
+    def do_PUT(self):
+        url = urllib.parse.urlparse(self.path)
+
+        if not self.authorised():
+            return
+
+        m = re.match(r'^/pots/([^/]+)/(deposit|withdraw)$', url.path)
+
+        if not m:
+            return self.respond(404, {'message': 'not found'})
+
+        length = int(self.headers.get('Content-Length', 0))
+        params = dict(urllib.parse.parse_qsl(self.rfile.read(length).decode('utf-8')))
+
+        pot = self.server.data.get_pot(m.group(1))
+
+        if pot is None:
+            return self.respond(404, {'message': 'pot not found'})
+
+        try:
+            amount = int(params['amount'])
+        except (KeyError, ValueError):
+            return self.respond(400, {'message': 'bad request'})
+
+        with self.server.lock:
+            if m.group(2) == 'deposit':
+                pot['balance'] += amount
+                self.server.data.balances[pot['current_account_id']] -= amount
+            else:
+                pot['balance'] -= amount
+                self.server.data.balances[pot['current_account_id']] += amount
+
+            pot['updated'] = self.server.data.format_date(datetime.datetime.utcnow())
+
+        self.respond(200, pot)
+
+
+    def authorised(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        with self.server.lock:
+            self.server.requests += 1
+
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            self.respond(401, {'message': 'unauthorized'})
+            return False
+
+        return True
+
+
+    def respond(self, code, data):
+        body = json.dumps(data).encode('utf-8')
+
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeMonzoServer:
+
+    def __init__(self, data=None, listen='127.0.0.1', port=0, latency=0):
+        self.data = data if data else FakeMonzoData()
+        self.listen = listen
+        self.port = port
+        self.latency = latency
+        self.server = None
+        self.thread = None
+
+
+    @property
+    def url(self):
+        return f"http://{self.server.server_address[0]}:{self.server.server_address[1]}"
+
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.listen, self.port), FakeMonzoRequestHandler)
+        self.server.daemon_threads = True
+        self.server.data = self.data
+        self.server.latency = self.latency
+        self.server.requests = 0
+        self.server.lock = threading.Lock()
+
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+        return self
+
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+    def client(self):
+        return fake_client(self.url)
+
+
+def fake_client(api_url):
+    return MonzoClient(
+        api_url=api_url,
+        client_id='fake',
+        client_secret='fake',
+        redirect_url='http://127.0.0.1/',
+        access_token='fake',
+        access_token_expiry=int(time.time()) + 86400,
+        refresh_token='fake'
+    )
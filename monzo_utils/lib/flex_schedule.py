@@ -0,0 +1,102 @@
+import datetime
+import math
+import bisect
+from calendar import monthrange
+
+class FlexSchedule:
+
+    # schedules by (start date, payment day, months, amount)
+    cache = {}
+
+    def __init__(self, start_date, payment_day, months, amount):
+        self.start_date = datetime.date(start_date.year, start_date.month, start_date.day)
+        self.payment_day = payment_day
+        self.months = months
+        self.amount = amount
+
+        self.dates = self.payment_dates(self.start_date, payment_day, months)
+        self.amounts = []
+        self.paid = [0]
+
+        # due_date doesn't need an amount
+        if amount is None:
+            return
+
+        for i in range(0, months):
+            amount = int(math.ceil(self.amount / self.months))
+
+            if self.paid[-1] + amount > self.amount:
+                amount = self.amount - self.paid[-1]
+
+            self.amounts.append(amount)
+            self.paid.append(self.paid[-1] + amount)
+
+
+    @classmethod
+    def get(cls, start_date, payment_day, months, amount):
+        key = (datetime.date(start_date.year, start_date.month, start_date.day), payment_day, months, amount)
+
+        if key not in cls.cache:
+            cls.cache[key] = cls(start_date, payment_day, months, amount)
+
+        return cls.cache[key]
+
+
+    # the first n dates on or after start_date that fall on payment_day,
+    # months that are too short to have the day are skipped
+    @staticmethod
+    def payment_dates(start_date, payment_day, n):
+        year = start_date.year
+        month = start_date.month
+
+        if start_date.day > payment_day:
+            month += 1
+
+        dates = []
+
+        while len(dates) < n:
+            if month > 12:
+                month = 1
+                year += 1
+
+            if payment_day <= monthrange(year, month)[1]:
+                dates.append(datetime.date(year, month, payment_day))
+
+            month += 1
+
+        return dates
+
+
+    def num_paid(self, today):
+        return bisect.bisect_right(self.dates, datetime.date(today.year, today.month, today.day))
+
+
+    def due_date(self, today):
+        num_paid = self.num_paid(today)
+
+        if num_paid < self.months:
+            return self.dates[num_paid]
+
+        return None
+
+
+    # the amount of the next instalment, or the final one once all are paid
+    def display_amount(self, today):
+        return self.amounts[min(self.num_paid(today), self.months - 1)]
+
+
+    def remaining(self, today):
+        return self.amount - self.paid[self.num_paid(today)]
+
+
+    # the instalment for the first payment date after salary_from_date
+    def amount_for_period(self, salary_from_date, salary_to_date):
+        if self.start_date >= salary_to_date:
+            return 0
+
+        i = bisect.bisect_right(self.dates, salary_from_date)
+
+        if i < self.months:
+            return self.amounts[i]
+
+        return 0
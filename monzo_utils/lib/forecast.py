@@ -0,0 +1,271 @@
+import re
+import datetime
+from array import array
+from itertools import accumulate
+from calendar import monthrange
+from monzo_utils.model.flex import Flex
+from monzo_utils.model.finance import Finance
+from monzo_utils.model.refund import Refund
+
+# daily balance projection for an account and its pots. every ledger has an
+# array of net flows per day and the balances are a running sum over it
+class Forecast:
+
+    def __init__(self, start, end):
+        self.start = datetime.date(start.year, start.month, start.day)
+        self.end = end
+        self.days = (self.end - self.start).days + 1
+        self.ledgers = {}
+
+
+    # horizon is a number followed by d, w, m or y, eg 90d or 12m. a bare
+    # number is a number of days
+    @staticmethod
+    def parse_horizon(horizon, start):
+        match = re.match(r'^([0-9]+)([dwmy]?)$', str(horizon).strip().lower())
+
+        if not match:
+            raise ValueError(f"invalid forecast period: {horizon}")
+
+        n = int(match.group(1))
+        unit = match.group(2)
+
+        if unit == 'w':
+            return start + datetime.timedelta(days=n * 7)
+
+        if unit in ['m', 'y']:
+            months = n if unit == 'm' else n * 12
+
+            return Forecast.add_months(start, months)
+
+        return start + datetime.timedelta(days=n)
+
+
+    @staticmethod
+    def add_months(date, months, day=None):
+        index = date.year * 12 + date.month - 1 + months
+        year = index // 12
+        month = index % 12 + 1
+
+        if day is None:
+            day = date.day
+
+        return datetime.date(year, month, min(day, monthrange(year, month)[1]))
+
+
+    def add_ledger(self, name, balance):
+        if name not in self.ledgers:
+            self.ledgers[name] = {
+                'balance': float(balance),
+                'flows': array('d', bytes(8 * self.days))
+            }
+
+
+    # amount is positive for money in and negative for money out. anything
+    # already overdue is charged on the first day
+    def add(self, name, date, amount):
+        if date > self.end:
+            return False
+
+        day = max(0, (date - self.start).days)
+
+        self.ledgers[name]['flows'][day] += float(amount)
+
+        return True
+
+
+    def balances(self, name):
+        ledger = self.ledgers[name]
+
+        return list(accumulate(ledger['flows'], initial=ledger['balance']))[1:]
+
+
+    def balance_on(self, name, date):
+        return self.ledgers[name]['balance'] + sum(self.ledgers[name]['flows'][0:(date - self.start).days + 1])
+
+
+    # money out of a ledger from start up to but not including end
+    def outgoings(self, name, start, end):
+        first = max(0, (start - self.start).days)
+        last = min(self.days, (end - self.start).days)
+
+        return 0 - sum([flow for flow in self.ledgers[name]['flows'][first:last] if flow <0])
+
+
+    # moves money between two ledgers
+    def transfer(self, source, destination, date, amount):
+        if self.add(source, date, 0 - amount):
+            self.add(destination, date, amount)
+
+
+    def date(self, day):
+        return self.start + datetime.timedelta(days=day)
+
+
+    def summary(self):
+        summary = {}
+
+        for name in self.ledgers:
+            balances = self.balances(name)
+            minimum = min(range(0, self.days), key=lambda day: balances[day])
+
+            shortfall_dates = []
+
+            for day in range(0, self.days):
+                if balances[day] < 0 and (day == 0 or balances[day - 1] >= 0):
+                    shortfall_dates.append(self.date(day))
+
+            months = {}
+
+            for day in range(0, self.days):
+                month = self.date(day).strftime('%Y-%m')
+
+                if month not in months:
+                    months[month] = {'in': 0, 'out': 0}
+
+                flow = self.ledgers[name]['flows'][day]
+
+                if flow >0:
+                    months[month]['in'] += flow
+                else:
+                    months[month]['out'] -= flow
+
+            for month in months:
+                months[month]['in'] = round(months[month]['in'], 2)
+                months[month]['out'] = round(months[month]['out'], 2)
+
+            summary[name] = {
+                'balance': round(self.ledgers[name]['balance'], 2),
+                'end_balance': round(balances[-1], 2),
+                'minimum_balance': round(balances[minimum], 2),
+                'minimum_date': self.date(minimum),
+                'shortfall_dates': shortfall_dates,
+                'months': months
+            }
+
+        return summary
+
+
+    # expands a payment into its future occurrences
+    def payment_occurrences(self, payment):
+        payment_config = payment.payment_config
+        today = self.start
+
+        if isinstance(payment, Flex):
+            if 'amount' not in payment_config:
+                return []
+
+            schedule = payment.schedule
+
+            return [(schedule.dates[i], schedule.amounts[i]) for i in range(0, len(schedule.dates)) if schedule.dates[i] > today]
+
+        if isinstance(payment, Finance):
+            due_date = payment.due_date
+            remaining = float(payment.remaining)
+            num_left = payment_config['months'] - payment.num_paid
+
+            if due_date is None or num_left <= 0 or remaining <= 0:
+                return []
+
+            amount = float(payment.display_amount)
+            occurrences = []
+
+            for date in self.monthly_dates(due_date, due_date.day)[0:num_left]:
+                instalment = min(amount, round(remaining, 2))
+                remaining -= instalment
+
+                occurrences.append((date, instalment))
+
+            return occurrences
+
+        if isinstance(payment, Refund):
+            if payment.status == 'PAID':
+                return []
+
+            if payment.due_date:
+                date = payment.due_date
+            elif 'due_after' in payment_config:
+                date = payment_config['due_after']
+            else:
+                date = today
+
+            return [(date, float(payment.display_amount))]
+
+        due_date = payment.due_date
+
+        if due_date is None:
+            due_date = payment_config['start_date'] if 'start_date' in payment_config else today
+
+        if 'yearly_month' in payment_config:
+            dates = []
+            date = due_date
+
+            while date <= self.end:
+                dates.append(date)
+                date = self.add_months(date, 12, payment_config['yearly_day'])
+
+        elif 'renew_date' in payment_config:
+            dates = [payment_config['renew_date']]
+
+        else:
+            if payment.last_date:
+                day = payment.last_date.day
+            else:
+                day = due_date.day
+
+            dates = self.monthly_dates(due_date, day, payment_config['exclude_months'] if 'exclude_months' in payment_config else [])
+
+        if 'start_date' in payment_config:
+            dates = [date for date in dates if date >= payment_config['start_date']]
+
+        occurrences = []
+
+        for date in dates:
+            occurrences.append((date, self.payment_amount(payment, date, len(occurrences) == 0)))
+
+        return occurrences
+
+
+    # monthly dates from first up to the end of the forecast, on day (or the
+    # last day of shorter months)
+    def monthly_dates(self, first, day, exclude_months=[]):
+        dates = []
+        i = 0
+
+        while True:
+            if i == 0:
+                date = first
+            else:
+                date = self.add_months(first, i, day)
+
+            if date > self.end:
+                break
+
+            if i == 0 or date.month not in exclude_months:
+                dates.append(date)
+
+            i += 1
+
+        return dates
+
+
+    def payment_amount(self, payment, date, first):
+        payment_config = payment.payment_config
+
+        if 'renewal' in payment_config and date >= payment_config['renewal']['date']:
+            renewal = payment_config['renewal']
+
+            if 'first_payment' in renewal and date < self.add_months(renewal['date'], 1):
+                amount = renewal['first_payment']
+            else:
+                amount = renewal['amount']
+
+            if 'currency' in payment_config and payment_config['currency'] != 'GBP':
+                amount = payment.convert_currency(amount, payment_config['currency'])
+
+            return float(amount)
+
+        if first:
+            return float(payment.display_amount)
+
+        return float(payment.next_month_amount)
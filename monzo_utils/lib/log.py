@@ -10,9 +10,12 @@ MAX_FILES = 5
 
 class Log(metaclass=Singleton):
 
-    def __init__(self):
-        homedir = pwd.getpwuid(os.getuid()).pw_dir
-        self.logfile = f"{homedir}/.monzo/logfile"
+    def __init__(self, config_path=None):
+        if config_path is None:
+            homedir = pwd.getpwuid(os.getuid()).pw_dir
+            config_path = f"{homedir}/.monzo"
+
+        self.logfile = f"{config_path}/logfile"
 
 
     def info(self, message):
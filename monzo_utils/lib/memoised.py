@@ -0,0 +1,113 @@
+import sys
+from monzo_utils.lib.singleton import Singleton
+
+# hit/miss counts for memoised properties keyed by Class.property
+class MemoStats(metaclass=Singleton):
+    hits = {}
+    misses = {}
+
+
+    def reset(self):
+        self.hits = {}
+        self.misses = {}
+
+
+    def record(self, key, hit):
+        counts = self.hits if hit else self.misses
+        counts[key] = counts.get(key, 0) + 1
+
+
+    def summary(self):
+        summary = {}
+
+        for key in sorted(set(self.hits) | set(self.misses)):
+            summary[key] = {
+                'hits': self.hits.get(key, 0),
+                'misses': self.misses.get(key, 0)
+            }
+
+        return summary
+
+
+    # written to stderr so it can be used with -o json
+    def display(self):
+        for key, counts in self.summary().items():
+            total = counts['hits'] + counts['misses']
+
+            sys.stderr.write("%s: %d hits, %d misses (%d%% hit rate)\n" % (key, counts['hits'], counts['misses'], round(counts['hits'] * 100 / total)))
+
+
+# a property whose value is stored in the object's cache dict the first time
+# it's read. depends names the memoised properties it's derived from so that
+# invalidating one of those also drops this one
+class MemoisedProperty(property):
+
+    def __init__(self, func, depends=()):
+        self.func = func
+        self.name = func.__name__
+        self.depends = tuple(depends)
+
+        super().__init__(self.get, doc=func.__doc__)
+
+
+    def get(self, obj):
+        key = f"{type(obj).__name__}.{self.name}"
+
+        if self.name in obj.cache:
+            MemoStats().record(key, True)
+
+            return obj.cache[self.name]
+
+        MemoStats().record(key, False)
+
+        value = self.func(obj)
+
+        obj.cache[self.name] = value
+
+        return value
+
+
+def memoised(*depends):
+    def decorator(func):
+        return MemoisedProperty(func, depends)
+
+    return decorator
+
+
+# the memoised properties of a class and those that depend on each of them
+def dependents(cls):
+    if '_memoised_dependents' not in cls.__dict__:
+        graph = {}
+
+        for name in dir(cls):
+            prop = getattr(cls, name, None)
+
+            if isinstance(prop, MemoisedProperty):
+                graph.setdefault(name, set())
+
+                for depend in prop.depends:
+                    graph.setdefault(depend, set()).add(name)
+
+        cls._memoised_dependents = graph
+
+    return cls._memoised_dependents
+
+
+# drops the cached values for names and everything derived from them
+def invalidate(obj, *names):
+    graph = dependents(type(obj))
+    pending = list(names)
+    dropped = set()
+
+    while pending:
+        name = pending.pop()
+
+        if name in dropped:
+            continue
+
+        dropped.add(name)
+        obj.cache.pop(name, None)
+
+        pending += graph.get(name, [])
+
+    return dropped
@@ -0,0 +1,121 @@
+import json
+from monzo_utils.lib.singleton import Singleton
+from monzo_utils.lib.db import DB
+
+TABLE = 'transaction_metadata_pivot'
+
+# metadata keys that are generated columns with their own index in the pivot
+# table. everything else is read out of the json column
+HOT_KEYS = [
+    'metadata_mastercard_lifecycle_id',
+    'metadata_external_id',
+    'metadata_pot_id'
+]
+
+# a transaction's metadata as a single json document in one row per
+# transaction, so lookups by key don't need a join on transaction_metadata
+# per key. the transaction_metadata rows are still written and remain the
+# source of truth, the pivot table is optional and can be rebuilt from them
+class MetadataPivot(metaclass=Singleton):
+
+    available = None
+
+    def enabled(self):
+        if self.available is None:
+            self.available = DB().table_exists(TABLE)
+
+        return self.available
+
+
+    def encode(self, metadata):
+        values = {}
+
+        for key in metadata:
+            values[key] = None if metadata[key] is None else str(metadata[key])
+
+        return json.dumps(values, sort_keys=True)
+
+
+    # sql expression and params for the value of key in the pivot row aliased
+    # as alias
+    def expression(self, key, alias='pivot'):
+        if key in HOT_KEYS:
+            return f"{alias}.`{key}`", []
+
+        return DB().driver.json_value(f"{alias}.metadata"), ['$."' + key.replace('"', '\\"') + '"']
+
+
+    def write(self, transaction_id, metadata):
+        if not self.enabled():
+            return
+
+        row = DB().one(f"select id, metadata from {TABLE} where transaction_id = %s", [transaction_id])
+
+        if len(metadata) == 0:
+            if row:
+                DB().query(f"delete from {TABLE} where id = %s", [row['id']])
+            return
+
+        value = self.encode(metadata)
+
+        if not row:
+            DB().query(f"insert into {TABLE} (transaction_id, metadata) values (%s, %s)", [transaction_id, value])
+        elif self.decode(row['metadata']) != json.loads(value):
+            DB().query(f"update {TABLE} set metadata = %s where id = %s", [value, row['id']])
+
+
+    def decode(self, value):
+        if type(value) == dict:
+            return value
+
+        return json.loads(value)
+
+
+    # metadata keyed by transaction id for every transaction in the accounts,
+    # optionally only for transactions since a date
+    def load(self, account_ids, since=None):
+        metadata = {}
+
+        if len(account_ids) == 0:
+            return metadata
+
+        sql = f"select pivot.transaction_id, pivot.metadata from {TABLE} pivot join `transaction` on `transaction`.id = pivot.transaction_id where `transaction`.account_id in (" + ",".join(["%s"] * len(account_ids)) + ")"
+        params = list(account_ids)
+
+        if since:
+            sql += " and `transaction`.`date` >= %s"
+            params.append(since.strftime('%Y-%m-%d'))
+
+        for row in DB().stream(sql, params):
+            metadata[row['transaction_id']] = self.decode(row['metadata'])
+
+        return metadata
+
+
+    # recreates the pivot rows from transaction_metadata. returns the number
+    # of transactions written
+    def rebuild(self):
+        transactions = {}
+
+        for row in DB().stream("select transaction_id, `key`, value from transaction_metadata order by id"):
+            if row['transaction_id'] not in transactions:
+                transactions[row['transaction_id']] = {}
+
+            transactions[row['transaction_id']][row['key']] = row['value']
+
+        DB().begin()
+
+        try:
+            DB().query(f"delete from {TABLE}")
+
+            for transaction_id in sorted(transactions):
+                DB().query(f"insert into {TABLE} (transaction_id, metadata) values (%s, %s)", [transaction_id, self.encode(transactions[transaction_id])])
+
+            DB().commit()
+        except Exception:
+            DB().rollback()
+            raise
+
+        self.available = True
+
+        return len(transactions)
@@ -0,0 +1,161 @@
+from monzo_utils.lib.singleton import Singleton
+from monzo_utils.lib.db import DB
+
+TABLE = 'transaction_summary'
+
+GROUPS = {
+    'month': 's.month',
+    'merchant': "coalesce(m.name, '')",
+    'category': "coalesce(m.category, '')"
+}
+
+# per account, pot, month and merchant counts and totals of transactions, kept
+# up to date by the sync as transactions are added or changed so that spending
+# summaries don't have to scan the transaction table. merchant categories are
+# joined in when the summary is read so a merchant being recategorised doesn't
+# leave stale rows behind
+class MonthlySummary(metaclass=Singleton):
+
+    available = None
+
+    # the summary table is optional so it's only maintained if it exists
+    def enabled(self):
+        if self.available is None:
+            self.available = DB().table_exists(TABLE)
+
+        return self.available
+
+
+    def key(self, row):
+        if row is None or row.get('declined'):
+            return None
+
+        return (
+            row['account_id'],
+            row.get('pot_id') or 0,
+            str(row['date'])[0:7],
+            row.get('merchant_id') or 0,
+            1 if str(row.get('description') or '').startswith('pot_0000') else 0
+        )
+
+
+    def amounts(self, row):
+        return [
+            round(float(row.get('money_in') or 0), 2),
+            round(float(row.get('money_out') or 0), 2)
+        ]
+
+
+    # moves a transaction's contribution from the bucket of its old row to the
+    # bucket of its new one. before is None for new transactions
+    def apply(self, before, after):
+        if not self.enabled():
+            return
+
+        old_key = self.key(before)
+        new_key = self.key(after)
+
+        if old_key == new_key and (old_key is None or self.amounts(before) == self.amounts(after)):
+            return
+
+        if old_key:
+            money_in, money_out = self.amounts(before)
+            self.add(old_key, -1, 0 - money_in, 0 - money_out)
+
+        if new_key:
+            money_in, money_out = self.amounts(after)
+            self.add(new_key, 1, money_in, money_out)
+
+
+    # the daemon and the webhook receiver can both be applying changes, so the
+    # bucket is created if it's missing and then adjusted in place rather than
+    # read and written back
+    def add(self, key, count, money_in, money_out):
+        bucket = "account_id = %s and pot_id = %s and month = %s and merchant_id = %s and pot_transfer = %s"
+
+        if count >0:
+            DB().query(DB().driver.insert_ignore(TABLE) + " (account_id, pot_id, month, merchant_id, pot_transfer, count, money_in, money_out) values (%s, %s, %s, %s, %s, %s, %s, %s)", list(key) + [0, 0, 0])
+
+        DB().query(f"update {TABLE} set count = count + %s, money_in = round(money_in + %s, 2), money_out = round(money_out + %s, 2) where {bucket}", [count, money_in, money_out] + list(key))
+
+        if count <0:
+            DB().query(f"delete from {TABLE} where {bucket} and count <= %s", list(key) + [0])
+
+
+    # recomputes the whole table from the transactions, used to backfill it
+    # after it's first created. returns the number of summary rows written
+    def rebuild(self):
+        buckets = {}
+
+        for row in DB().stream("select account_id, pot_id, `date`, merchant_id, description, money_in, money_out, declined from `transaction`"):
+            key = self.key(row)
+
+            if key is None:
+                continue
+
+            if key not in buckets:
+                buckets[key] = [0, 0, 0]
+
+            money_in, money_out = self.amounts(row)
+
+            buckets[key][0] += 1
+            buckets[key][1] += money_in
+            buckets[key][2] += money_out
+
+        DB().begin()
+
+        try:
+            DB().query("delete from transaction_summary")
+
+            for key in sorted(buckets):
+                DB().create(TABLE, {
+                    'account_id': key[0],
+                    'pot_id': key[1],
+                    'month': key[2],
+                    'merchant_id': key[3],
+                    'pot_transfer': key[4],
+                    'count': buckets[key][0],
+                    'money_in': round(buckets[key][1], 2),
+                    'money_out': round(buckets[key][2], 2)
+                })
+
+            DB().commit()
+        except Exception:
+            DB().rollback()
+            raise
+
+        self.available = True
+
+        return len(buckets)
+
+
+    # totals grouped by month, merchant or category
+    def summarise(self, group='month', month_from=None, month_to=None, include_pots=False, exclude_accounts=None, merchant=None):
+        column = GROUPS[group]
+
+        sql = f"select {column} as `{group}`, sum(s.count) as count, sum(s.money_in) as money_in, sum(s.money_out) as money_out from transaction_summary s join account a on a.id = s.account_id left join merchant m on m.id = s.merchant_id where 1 = 1"
+        params = []
+
+        if month_from:
+            sql += " and s.month >= %s"
+            params.append(month_from)
+
+        if month_to:
+            sql += " and s.month <= %s"
+            params.append(month_to)
+
+        if include_pots is False:
+            sql += " and s.pot_transfer = %s"
+            params.append(0)
+
+        for account in exclude_accounts or []:
+            sql += " and a.name != %s"
+            params.append(account)
+
+        if merchant:
+            sql += " and m.name like %s"
+            params.append('%' + merchant + '%')
+
+        sql += f" group by {column} order by {column}"
+
+        return DB().query(sql, params)
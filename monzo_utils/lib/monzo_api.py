@@ -9,31 +9,152 @@ import re
 import datetime
 import pwd
 from pathlib import Path
-from monzo.authentication import Authentication
+from monzo.authentication import Authentication, MONZO_API_URL
+from monzo.httpio import HttpIO, DEFAULT_TIMEOUT
 import monzo.endpoints.account
 import monzo.endpoints.pot
 import monzo.endpoints.transaction
-from monzo.exceptions import MonzoAuthenticationError, MonzoServerError, MonzoHTTPError, MonzoPermissionsError
+import monzo.endpoints.webhooks
+from monzo.exceptions import MonzoError, MonzoAuthenticationError, MonzoServerError, MonzoHTTPError, MonzoPermissionsError
 from monzo_utils.lib.log import Log
 from monzo_utils.lib.config import Config
+from monzo_utils.lib.request_scheduler import RequestScheduler, RETRYABLE_ERRORS
+from monzo_utils.lib.token_store import TokenStore
 from pushover import Client
 
+# refresh a little before the token actually expires so that it can't expire
+# between the check and the request
+TOKEN_EXPIRY_MARGIN = 60
+
+# raised when a request still fails after the scheduler has retried it, so
+# that long-running callers can carry on and the cli commands can exit
+class MonzoAPIError(Exception):
+    pass
+
+
+class MonzoClient(Authentication):
+
+    # Authentication with a configurable base url so that the client can be
+    # pointed at something other than the real Monzo API, eg for benchmarking
+    def __init__(self, api_url=MONZO_API_URL, token_store=None, **kwargs):
+        self.api_url = api_url
+        self.token_store = token_store
+
+        super().__init__(**kwargs)
+
+
+    def make_request(self, path, authenticated=True, method='GET', data=None, headers=None, timeout=DEFAULT_TIMEOUT):
+        if self._access_token and self._access_token_expiry - time.time() < TOKEN_EXPIRY_MARGIN:
+            self.refresh_access()
+
+        if data is None:
+            data = {}
+
+        if headers is None:
+            headers = {}
+
+        if authenticated:
+            headers['Authorization'] = f"Bearer {self.access_token}"
+
+        conn = HttpIO(self.api_url)
+
+        try:
+            connection = getattr(conn, method.lower())
+        except AttributeError as e:
+            raise MonzoHTTPError('Specified HTTP method is not supported') from e
+
+        return connection(path=path, data=data, headers=headers, timeout=timeout)
+
+
+    def refresh_access(self):
+        if self.token_store is None:
+            return self.refresh_tokens()
+
+        # refresh tokens can only be used once so concurrent processes must
+        # take turns, and if another process got there first we use its token
+        with self.token_store.lock():
+            tokens = self.token_store.load()
+
+            if tokens and tokens['access_token'] != self._access_token and tokens['expiry'] - time.time() >= TOKEN_EXPIRY_MARGIN:
+                self.use_tokens(tokens)
+                return
+
+            self.refresh_tokens()
+
+            self.token_store.save({
+                'access_token': self._access_token,
+                'expiry': self._access_token_expiry,
+                'refresh_token': self._refresh_token
+            })
+
+
+    def use_tokens(self, tokens):
+        self._access_token = tokens['access_token']
+        self._access_token_expiry = tokens['expiry']
+        self._refresh_token = tokens['refresh_token']
+
+
+    def refresh_tokens(self):
+        if not self.refresh_token:
+            raise MonzoAuthenticationError('Unable to refresh without a refresh token')
+
+        conn = HttpIO(self.api_url)
+
+        try:
+            self._populate_tokens(conn.post(path='/oauth2/token', data={
+                'grant_type': 'refresh_token',
+                'client_id': self._client_id,
+                'client_secret': self._client_secret,
+                'refresh_token': self.refresh_token
+            }))
+        except MonzoError as e:
+            raise MonzoAuthenticationError('Could not refresh the access token') from e
+
+
 class MonzoAPI:
 
-    def __init__(self):
-        homedir = pwd.getpwuid(os.getuid()).pw_dir
-        self.monzo_dir = f"{homedir}/.monzo"
+    token_file = None
+
+    def __init__(self, client=None, config_path=None):
+        if config_path is None:
+            homedir = pwd.getpwuid(os.getuid()).pw_dir
+            config_path = f"{homedir}/.monzo"
+
+        self.monzo_dir = config_path
         self.token_file = f"{self.monzo_dir}/tokens"
 
-        self.load_tokens()
+        if client is None:
+            self.load_tokens()
 
-        self.client = self.get_client()
+            self.client = self.get_client()
+        else:
+            self.client = client
+
+            self.access_token = client.access_token
+            self.access_token_expiry = client.access_token_expiry
+            self.refresh_token = client.refresh_token
+
+        if 'rate_limits' in Config().keys and Config().rate_limits:
+            RequestScheduler().configure(Config().rate_limits)
+
+
+    @property
+    def scheduler(self):
+        return RequestScheduler()
+
+
+    @property
+    def token_store(self):
+        if self.token_file is None:
+            return None
+
+        return TokenStore.get(self.token_file)
 
 
     def load_tokens(self):
-        if os.path.exists(self.token_file):
-            data = json.loads(open(self.token_file).read())
+        data = self.token_store.load()
 
+        if data:
             self.access_token = data['access_token']
             self.access_token_expiry = data['expiry']
             self.refresh_token = data['refresh_token']
@@ -115,11 +236,29 @@ class MonzoAPI:
 
 
     def save_tokens(self):
-        self.set_file_contents(self.token_file, json.dumps({
-            'access_token': self.access_token,
-            'expiry': self.access_token_expiry,
-            'refresh_token': self.refresh_token
-        }))
+        with self.token_store.lock():
+            self.set_file_contents(self.token_file, json.dumps({
+                'access_token': self.access_token,
+                'expiry': self.access_token_expiry,
+                'refresh_token': self.refresh_token
+            }))
+
+
+    def reload_tokens(self):
+        # picks up tokens refreshed by another process or by another MonzoAPI
+        # instance, this is just a stat() unless the token file has changed
+        data = self.token_store.load()
+
+        if not data or data['access_token'] == self.client.access_token:
+            return False
+
+        self.access_token = data['access_token']
+        self.access_token_expiry = data['expiry']
+        self.refresh_token = data['refresh_token']
+
+        self.client = self.get_client()
+
+        return True
 
 
     def set_file_contents(self, path, content):
@@ -130,7 +269,9 @@ class MonzoAPI:
 
 
     def get_client(self):
-        return Authentication(
+        return MonzoClient(
+            api_url=Config().api_url if 'api_url' in Config().keys else MONZO_API_URL,
+            token_store=self.token_store,
             client_id=Config().client_id,
             client_secret=Config().client_secret,
             redirect_url=Config().redirect_url,
@@ -145,50 +286,35 @@ class MonzoAPI:
 
 
     def accounts(self, first=True):
-        for i in range(0, 3):
-            try:
-                accounts = monzo.endpoints.account.Account.fetch(self.client)
+        try:
+            accounts = self.scheduler.call('accounts', monzo.endpoints.account.Account.fetch, self.client)
 
-                self.update_tokens()
+            self.update_tokens()
 
-                return accounts
+            return accounts
 
-            except MonzoHTTPError:
-                if first:
-                    if 'NO_AUTH' in os.environ:
-                        raise Exception("token expired")
+        except MonzoHTTPError:
+            if first:
+                if 'NO_AUTH' in os.environ:
+                    raise Exception("token expired")
 
-                    self.authenticate()
+                self.authenticate()
 
-                    return self.accounts(False)
+                return self.accounts(False)
 
-                Log().error('auth failed')
-                sys.exit(1)
-            except MonzoAuthenticationError:
-                if first:
+            Log().error('auth failed')
+            sys.exit(1)
+        except MonzoAuthenticationError:
+            if first:
+                if not self.reload_tokens():
                     self.authenticate()
 
-                    return self.accounts(False)
-
-                Log().error("auth failed")
-                sys.exit(1)
-            except MonzoServerError:
-                Log().error("server error")
-
-                if i == 2:
-                    sys.exit(1)
-
-                time.sleep(5)
+                return self.accounts(False)
 
-            except TimeoutError:
-                Log().error("timeout")
-
-                if i == 2:
-                    sys.exit(1)
-
-                time.sleep(5)
-
-        raise Exception("failed to retrieve accounts after 3 attempts")
+            Log().error("auth failed")
+            sys.exit(1)
+        except RETRYABLE_ERRORS as e:
+            raise MonzoAPIError("failed to retrieve accounts: %s" % (str(e))) from e
 
 
     def update_tokens(self):
@@ -204,32 +330,29 @@ class MonzoAPI:
         self.save_tokens()
 
 
-    def transactions(self, account_id, days=3):
-        error = None
+    def transactions(self, account_id, days=3, since=None, before=None, limit=None):
+        if since is None:
+            now = datetime.datetime.utcnow()
+            since = now - datetime.timedelta(days=days)
 
-        now = datetime.datetime.utcnow()
-        since = now - datetime.timedelta(days=days)
+        params = {
+            'account_id': account_id,
+            'expand': ['merchant'],
+            'since': since
+        }
 
-        for i in range(0, 3):
-            try:
-                return monzo.endpoints.transaction.Transaction.fetch(self.client, account_id=account_id, expand=['merchant'], since=since)
-            except MonzoPermissionsError as e:
-                raise e
-            except Exception as e:
-                error = str(e)
+        if before is not None:
+            params['before'] = before
 
-                if i != 2:
-                    time.sleep(5)
-                else:
-                    raise e
+        if limit is not None:
+            params['limit'] = limit
 
-        Log().error("failed to retrieve transactions: %s" % (error))
-        sys.exit(1)
+        return self.scheduler.call('transactions', monzo.endpoints.transaction.Transaction.fetch, self.client, **params)
 
 
     def pots(self, account_id, first=True):
         try:
-            pots = monzo.endpoints.pot.Pot.fetch(self.client, account_id=account_id)
+            pots = self.scheduler.call('pots', monzo.endpoints.pot.Pot.fetch, self.client, account_id=account_id)
         except MonzoHTTPError:
             if first:
                 if 'NO_AUTH' in os.environ:
@@ -244,29 +367,36 @@ class MonzoAPI:
             sys.exit(1)
         except MonzoAuthenticationError:
             if first:
-                self.authenticate()
-                self.client = self.get_client()
+                if not self.reload_tokens():
+                    self.authenticate()
+                    self.client = self.get_client()
 
                 return self.pots(account_id, False)
 
             Log().error("auth failed")
             sys.exit(1)
-        except MonzoServerError:
-            Log().error("server error")
-            sys.exit(1)
-        except TimeoutError:
-            Log().error("timeout")
-            sys.exit(1)
+        except RETRYABLE_ERRORS as e:
+            raise MonzoAPIError("failed to retrieve pots: %s" % (str(e))) from e
 
         return pots
 
 
-    def withdraw_from_pot(self, account_id, pot, credit):
-        self.load_tokens()
+    def webhooks(self, account_id):
+        return monzo.endpoints.webhooks.Webhook.fetch(self.client, account_id=account_id)
 
-        self.client = self.get_client()
 
-        pot = monzo.endpoints.pot.Pot.fetch_single(self.client, account_id=account_id, pot_id=pot.pot_id)
+    def register_webhook(self, account_id, url):
+        for webhook in self.webhooks(account_id):
+            if webhook.url == url:
+                return webhook
+
+        return monzo.endpoints.webhooks.Webhook.create(self.client, account_id=account_id, url=url)
+
+
+    def withdraw_from_pot(self, account_id, pot, credit):
+        self.reload_tokens()
+
+        pot = self.scheduler.call('pots', monzo.endpoints.pot.Pot.fetch_single, self.client, account_id=account_id, pot_id=pot.pot_id)
 
         dedupe_code = '%s_%s' % (
             pot.pot_id,
@@ -275,25 +405,19 @@ class MonzoAPI:
 
         amount = round(credit * 100)
 
-        for i in range(0, 3):
-            try:
-                monzo.endpoints.pot.Pot.withdraw(self.client, pot=pot, account_id=account_id, amount=amount, dedupe_id=dedupe_code)
-                return True
-            except Exception as e:
-                print("failed to withdraw pot money: %s" % (str(e)))
-
-                if i <2:
-                    time.sleep(3)
+        try:
+            self.scheduler.call('pot_transfers', monzo.endpoints.pot.Pot.withdraw, self.client, pot=pot, account_id=account_id, amount=amount, dedupe_id=dedupe_code)
+            return True
+        except Exception as e:
+            print("failed to withdraw pot money: %s" % (str(e)))
 
         return False
 
 
     def deposit_to_pot(self, account_id, pot, shortfall):
-        self.load_tokens()
+        self.reload_tokens()
 
-        self.client = self.get_client()
-
-        pot = monzo.endpoints.pot.Pot.fetch_single(self.client, account_id=account_id, pot_id=pot.pot_id)
+        pot = self.scheduler.call('pots', monzo.endpoints.pot.Pot.fetch_single, self.client, account_id=account_id, pot_id=pot.pot_id)
 
         dedupe_code = '%s_%s' % (
             pot.pot_id,
@@ -302,14 +426,10 @@ class MonzoAPI:
 
         amount = round(shortfall * 100)
 
-        for i in range(0, 3):
-            try:
-                monzo.endpoints.pot.Pot.deposit(self.client, pot=pot, account_id=account_id, amount=amount, dedupe_id=dedupe_code)
-                return True
-            except Exception as e:
-                print("failed to deposit pot money: %s" % (str(e)))
-
-                if i <2:
-                    time.sleep(3)
+        try:
+            self.scheduler.call('pot_transfers', monzo.endpoints.pot.Pot.deposit, self.client, pot=pot, account_id=account_id, amount=amount, dedupe_id=dedupe_code)
+            return True
+        except Exception as e:
+            print("failed to deposit pot money: %s" % (str(e)))
 
         return False
@@ -7,29 +7,41 @@ import yaml
 import calendar
 import json
 import time
-import requests
 import math
 import pwd
 import importlib
 import decimal
-from pushover import Client
-from monzo_utils.lib.monzo_api import MonzoAPI
 from monzo_utils.lib.config import Config
+from monzo_utils.lib.log import Log
 from monzo_utils.lib.db import DB
-from monzo_utils.lib.monzo_sync import MonzoSync
+from monzo_utils.lib.payment_matcher import PaymentMatcher
+from monzo_utils.lib.description_matcher import DescriptionMatcher
+from monzo_utils.lib.salary_calendar import SalaryCalendar, BANK_HOLIDAYS_FILE
+from monzo_utils.lib.currency_rates import CurrencyRates
+from monzo_utils.lib.forecast import Forecast
+from monzo_utils.lib.claim_registry import ClaimRegistry
+from monzo_utils.lib.payments_config import PaymentsConfig, PaymentRule, PaymentsConfigError
 from monzo_utils.model.provider import Provider
 from monzo_utils.model.account import Account
 from monzo_utils.model.pot import Pot
 from monzo_utils.model.transaction import Transaction
 from monzo_utils.model.flex_summary import FlexSummary
-from govuk_bank_holidays.bank_holidays import BankHolidays
-from calendar import monthrange
 
 PROVIDER = 'Monzo'
 
 class MonzoPayments:
 
-    def __init__(self, account_name, output_json=False, abbreviate=False):
+    matcher = None
+    config_file = None
+    config_path = None
+    salary_calendar = None
+    accounts = None
+    print_json = True
+    last_salary_amount = None
+    claims = None
+    compiled = None
+
+    def __init__(self, account_name, output_json=False, abbreviate=False, provider=None, accounts=None):
         self.account_name = account_name
         self.json = output_json
         self.abbreviate = abbreviate
@@ -47,8 +59,21 @@ class MonzoPayments:
         self.seen = []
         self.exchange_rates = {}
 
-        self.provider = Provider.one("select * from provider where name = %s", [PROVIDER])
-        self.account = Account.one("select * from account where provider_id = %s and name = %s", [self.provider.id, self.account_name])
+        # transactions matched to a payment in this run
+        self.claims = ClaimRegistry()
+
+        # when running for several accounts the lookups are shared
+        self.accounts = accounts
+
+        if provider:
+            self.provider = provider
+        else:
+            self.provider = Provider.one("select * from provider where name = %s", [PROVIDER])
+
+        if accounts is not None:
+            self.account = accounts[self.account_name] if self.account_name in accounts else None
+        else:
+            self.account = Account.one("select * from account where provider_id = %s and name = %s", [self.provider.id, self.account_name])
 
         if not self.account:
             sys.stderr.write(f"account {self.account_name} not found in the database\n")
@@ -60,6 +85,8 @@ class MonzoPayments:
         self.shortfall_tracker = f"{homedir}/.monzo/{self.config['account']}.shortfall"
         self.shortfall_notify_tracker = f"{homedir}/.monzo/{self.config['account']}.shortfall_notify"
 
+        CurrencyRates(f"{homedir}/.monzo/currency_rates.cache")
+
 
     def get_db(self):
         try:
@@ -90,18 +117,35 @@ class MonzoPayments:
             sys.stderr.write(f"Cannot find account config file: {account_config_file}\n")
             sys.exit(1)
 
-        try:
-            config = yaml.safe_load(open(account_config_file).read())
-        except Exception as e:
-            sys.stderr.write(f"Cannot read or parse account config file {account_config_file}: {str(e)}\n")
-            sys.exit(1)
+        self.compiled = PaymentsConfig.load(account_config_file, self.compiled_config_file(account_config_file))
+
+        if self.compiled:
+            config = self.compiled.config
+        else:
+            try:
+                config = yaml.safe_load(open(account_config_file).read())
+            except Exception as e:
+                sys.stderr.write(f"Cannot read or parse account config file {account_config_file}: {str(e)}\n")
+                sys.exit(1)
 
         self.account_name = config['account']
+        self.config_file = account_config_file
 
         return config
 
 
+    # compiled configs are kept in ~/.monzo wherever the config is
+    def compiled_config_file(self, account_config_file):
+        homedir = pwd.getpwuid(os.getuid()).pw_dir
+
+        return PaymentsConfig.cache_file(account_config_file, f"{homedir}/.monzo")
+
+
     def validate_config(self):
+        # a cached config was validated when it was compiled
+        if self.compiled is not None:
+            return
+
         for required in ['payments','salary_description','salary_payment_day']:
             if required not in self.config or not self.config[required]:
                 sys.stderr.write(f"Missing config key: {required}\n")
@@ -113,12 +157,30 @@ class MonzoPayments:
                     sys.stderr.write(f"Push is enabled but push config key is missing: {required}\n")
                     sys.exit(1)
 
+        if self.config_file:
+            try:
+                self.compiled = PaymentsConfig.compile(self.config_file, self.config)
+            except PaymentsConfigError as e:
+                sys.stderr.write(f"Invalid config: {str(e)}\n")
+                sys.exit(1)
+
+            self.compiled.save(self.compiled_config_file(self.config_file))
+
+
+    def load_salary_dates(self):
+        since = PaymentMatcher.lookback(self.config)
+
+        if self.matcher is None:
+            self.matcher = PaymentMatcher(since, DescriptionMatcher.load(self.config_file, self.description_patterns()))
 
-    def main(self):
         self.last_salary_date = self.get_last_salary_date()
         self.next_salary_date = self.get_next_salary_date(self.last_salary_date)
         self.following_salary_date = self.get_next_salary_date(self.next_salary_date)
 
+
+    def main(self):
+        self.load_salary_dates()
+
         if self.json is False:
             self.widths = {
                 'Status': 9,
@@ -200,8 +262,10 @@ class MonzoPayments:
                 data['shortfall'] = shortfall
                 data['credit'] = 0
 
-            print(json.dumps(data,indent=4))
-            return
+            if self.print_json:
+                print(json.dumps(data,indent=4))
+
+            return data
 
         self.adjust_column_widths(payment_lists)
 
@@ -278,8 +342,190 @@ class MonzoPayments:
             sync_required = True
 
         if sync_required:
+            self.sync_account()
+
+
+    # the money has already moved so a failed sync is only logged, the next
+    # sync will pick the transfers up
+    def sync_account(self):
+        from monzo_utils.lib.monzo_sync import MonzoSync
+        from monzo_utils.lib.monzo_api import MonzoAPIError
+
+        try:
             ms = MonzoSync()
             ms.sync(3, self.account)
+        except MonzoAPIError as e:
+            Log().error(f"failed to sync {self.account_name} after moving money: {str(e)}")
+
+
+    # projects the balances of the account, the bills pot and any pots that
+    # are paid into forward over the horizon (eg 12m)
+    def forecast(self, horizon):
+        today = datetime.date.today()
+
+        try:
+            end = Forecast.parse_horizon(horizon, today)
+        except ValueError as e:
+            sys.stderr.write(f"{str(e)}\n")
+            sys.exit(1)
+
+        self.load_salary_dates()
+
+        f = Forecast(today, end)
+        f.add_ledger(self.account_name, self.account.balance)
+
+        if 'pot' in self.config:
+            bills = self.config['pot']
+            f.add_ledger(bills, self.account.get_pot(bills).balance)
+        else:
+            bills = self.account_name
+
+        payment_lists = []
+
+        if 'payments' in self.config:
+            for annual in [True, False]:
+                for payment_list in self.config['payments']:
+                    if payment_list['payments']:
+                        payment_lists.append([payment_list, annual])
+
+        if 'refunds_due' in self.config and self.config['refunds_due']:
+            payment_lists.append([{'type': 'Refund', 'payments': self.config['refunds_due']}, False])
+
+        for payment_list, annual in payment_lists:
+            for payment in self.get_payments(payment_list, annual):
+                for date, amount in f.payment_occurrences(payment):
+                    f.add(bills, date, 0 - amount)
+
+        salary_dates = []
+        date = self.last_salary_date
+
+        while True:
+            date = self.get_next_salary_date(date)
+
+            if date > f.end:
+                break
+
+            salary_dates.append(date)
+
+        # the salary only lands in this account if it's paid here
+        if self.last_salary_amount and ('salary_account' not in self.config or self.config['salary_account'] == self.account_name):
+            for date in salary_dates:
+                f.add(self.account_name, date, self.last_salary_amount)
+
+        # the bills pot is topped up from the account with whatever is due
+        # before the next payday, today and then on each payday. with
+        # auto_withdraw any credit is moved back to the account
+        if bills != self.account_name:
+            periods = [today] + [date for date in salary_dates if date > today] + [f.end + datetime.timedelta(days=1)]
+
+            for i in range(0, len(periods) - 1):
+                due = f.outgoings(bills, periods[i], periods[i+1])
+                balance = f.balance_on(bills, periods[i] - datetime.timedelta(days=1))
+                amount = round(due - balance, 2)
+
+                if amount >0:
+                    f.transfer(self.account_name, bills, periods[i], amount)
+                elif amount <0 and 'auto_withdraw' in self.config and self.config['auto_withdraw']:
+                    f.transfer(bills, self.account_name, periods[i], 0 - amount)
+
+        pots = {}
+
+        for key in ['payments_to_pots', 'pot_auto_topup']:
+            if key not in self.config or type(self.config[key]) != list:
+                continue
+
+            for payment in self.config[key]:
+                if payment['name'] not in pots:
+                    pots[payment['name']] = Pot.one("select * from pot where name = %s and deleted = %s", [payment['name'], 0])
+
+                if pots[payment['name']]:
+                    f.add_ledger(payment['name'], pots[payment['name']].balance)
+
+        # transfers are made on payday, and today if this month's hasn't
+        # been made yet
+        if 'payments_to_pots' in self.config and type(self.config['payments_to_pots']) == list:
+            for payment in self.config['payments_to_pots']:
+                pot = pots[payment['name']]
+
+                if not pot:
+                    continue
+
+                if pot.last_monthly_transfer_date != self.last_salary_date:
+                    dates = [today] + salary_dates
+                else:
+                    dates = salary_dates
+
+                for date in dates:
+                    if 'topup' in payment and payment['topup']:
+                        amount = max([0, round(payment['amount'] - f.balance_on(payment['name'], date), 2)])
+                    else:
+                        amount = payment['amount']
+
+                    if amount >0:
+                        f.add(self.account_name, date, 0 - amount)
+                        f.add(payment['name'], date, amount)
+
+        # spending from the pots isn't known so topups only happen today
+        if 'pot_auto_topup' in self.config and type(self.config['pot_auto_topup']) == list:
+            for payment in self.config['pot_auto_topup']:
+                if not pots[payment['name']]:
+                    continue
+
+                balance = f.balance_on(payment['name'], today)
+
+                if balance < payment['threshold']:
+                    if 'topup_amount' not in payment:
+                        amount = round(payment['threshold'] - balance, 2)
+                    else:
+                        amount = payment['topup_amount']
+
+                    f.add(self.account_name, today, 0 - amount)
+                    f.add(payment['name'], today, amount)
+
+        summary = f.summary()
+
+        if self.json:
+            data = {
+                'start': f.start.strftime('%Y-%m-%d'),
+                'end': f.end.strftime('%Y-%m-%d'),
+                'balances': {}
+            }
+
+            for name in summary:
+                data['balances'][name] = {
+                    'balance': summary[name]['balance'],
+                    'end_balance': summary[name]['end_balance'],
+                    'minimum_balance': summary[name]['minimum_balance'],
+                    'minimum_date': summary[name]['minimum_date'].strftime('%Y-%m-%d'),
+                    'shortfall_dates': [date.strftime('%Y-%m-%d') for date in summary[name]['shortfall_dates']],
+                    'months': summary[name]['months']
+                }
+
+            if self.print_json:
+                print(json.dumps(data,indent=4))
+
+            return data
+
+        self.display_forecast(f, summary)
+
+
+    def display_forecast(self, f, summary):
+        print(f"Forecast from {f.start.strftime('%Y-%m-%d')} to {f.end.strftime('%Y-%m-%d')}")
+
+        for name in summary:
+            sys.stdout.write("\n")
+            print(f"{name}:")
+            print("      balance: £%.2f" % (summary[name]['balance']))
+            print("          end: £%.2f" % (summary[name]['end_balance']))
+            print("      minimum: £%.2f on %s" % (summary[name]['minimum_balance'], summary[name]['minimum_date'].strftime('%Y-%m-%d')))
+
+            if summary[name]['shortfall_dates']:
+                print("    shortfall: " + ", ".join([date.strftime('%Y-%m-%d') for date in summary[name]['shortfall_dates']]))
+
+            sys.stdout.write("\n")
+
+            for month in summary[name]['months']:
+                print("      %s: in £%.2f, out £%.2f" % (month, summary[name]['months'][month]['in'], summary[name]['months'][month]['out']))
 
 
     def display_columns(self, title):
@@ -341,6 +587,7 @@ class MonzoPayments:
                 flex_remaining += payment.remaining
 
             summary = FlexSummary(self.config, self.account, total_this_month, total_next_month, flex_remaining, self.last_salary_date, self.next_salary_date, self.following_salary_date)
+            summary.matcher = self.matcher
 
             if self.json:
                 self.output.append(summary.data(self.abbreviate))
@@ -349,8 +596,8 @@ class MonzoPayments:
 
         for payment in payments:
             if summary:
-                payment.cache['last_payment'] = summary.last_payment
-                payment.cache['last_date'] = summary.last_date
+                payment.set_cached('last_payment', summary.last_payment)
+                payment.set_cached('last_date', summary.last_date)
 
             if payment.status in ['DUE','PAID']:
                 total_due_this_month += payment.display_amount * 100
@@ -374,19 +621,18 @@ class MonzoPayments:
 
 
     def get_payments(self, payment_list, annual):
-        payments = {}
+        built = []
 
         for payment_config in payment_list['payments']:
-            payment_list_type_library = payment_list['type'].lower().replace(' ','_')
-            payment_list_type = payment_list['type'].title().replace(' ','')
+            rule = self.compiled.rule(payment_config) if self.compiled else None
 
-            if annual and ('is_yearly' not in payment_config or payment_config['is_yearly'] is False) and ('yearly_month' not in payment_config or 'yearly_day' not in payment_config):
-                continue
+            if rule is None:
+                rule = PaymentRule(payment_list, payment_config)
 
-            if not annual and (('yearly_month' in payment_config and 'yearly_day' in payment_config) or ('is_yearly' in payment_config and payment_config['is_yearly'])):
+            if annual != rule.annual:
                 continue
 
-            payment = getattr(importlib.import_module(f"monzo_utils.model.{payment_list_type_library}"), payment_list_type)(
+            payment = getattr(importlib.import_module(f"monzo_utils.model.{rule.library}"), rule.class_name)(
                 self.config,
                 self.account,
                 payment_list,
@@ -396,6 +642,19 @@ class MonzoPayments:
                 self.following_salary_date
             )
 
+            payment.matcher = self.matcher
+            payment.claims = self.claims
+
+            built.append(payment)
+
+        # due_date looks up the last payment so the candidates for the whole
+        # list need resolving before sorting
+        if self.matcher:
+            self.matcher.prepare(built)
+
+        payments = {}
+
+        for payment in built:
             if payment.due_date not in payments:
                 payments[payment.due_date] = []
 
@@ -416,7 +675,17 @@ class MonzoPayments:
         return sorted_payments
 
 
+    # the api client pulls in the monzo library so it's only imported when
+    # money needs moving
+    def api(self):
+        from monzo_utils.lib.monzo_api import MonzoAPI
+
+        return MonzoAPI()
+
+
     def notify(self, event, message):
+        from pushover import Client
+
         pushover = Client(self.config['pushover_key'], api_token=self.config['pushover_app'])
         pushover.send_message(message, title=event)
 
@@ -432,16 +701,26 @@ class MonzoPayments:
 
 
     def get_last_salary_date(self):
-        if 'salary_account' in self.config and self.config['salary_account'] != self.account_name:
+        if 'salary_account' in self.config and self.config['salary_account'] != self.account_name and self.accounts is not None and self.config['salary_account'] in self.accounts:
+            account = self.accounts[self.config['salary_account']]
+        elif 'salary_account' in self.config and self.config['salary_account'] != self.account_name:
             account = Account.one("select * from account where provider_id = %s and name = %s", [self.provider.id, self.config['salary_account']])
         else:
             account = self.account
 
-        last_salary_transaction = account.last_salary_transaction(
-            description=self.config['salary_description'],
-            salary_minimum=self.config['salary_minimum'] if 'salary_minimum' in self.config else 1000,
-            salary_payment_day=self.config['salary_payment_day']
-        )
+        if self.matcher:
+            last_salary_transaction = self.matcher.last_salary_transaction(
+                account,
+                description=self.config['salary_description'],
+                salary_minimum=self.config['salary_minimum'] if 'salary_minimum' in self.config else 1000,
+                salary_payment_day=self.config['salary_payment_day']
+            )
+        else:
+            last_salary_transaction = account.last_salary_transaction(
+                description=self.config['salary_description'],
+                salary_minimum=self.config['salary_minimum'] if 'salary_minimum' in self.config else 1000,
+                salary_payment_day=self.config['salary_payment_day']
+            )
 
         if not last_salary_transaction:
             sys.stderr.write("failed to find last salary transaction.\n")
@@ -449,49 +728,69 @@ class MonzoPayments:
 
         last_salary_date = last_salary_transaction['date']
 
+        if 'money_in' in last_salary_transaction:
+            self.last_salary_amount = last_salary_transaction['money_in']
+
         return last_salary_date
 
 
-    def get_next_salary_date(self, last_salary_date):
-        while last_salary_date.day != self.config['salary_payment_day']:
-            try:
-                last_salary_date = datetime.date(last_salary_date.year, last_salary_date.month, last_salary_date.day+1)
-            except:
-                last_salary_date = datetime.date(last_salary_date.year, last_salary_date.month+1, 1)
+    # every description pattern in the config so that they are compiled
+    # into a single matcher up front
+    def description_patterns(self):
+        if self.compiled:
+            return self.compiled.patterns
 
-        next_salary_date = datetime.date(last_salary_date.year, last_salary_date.month, last_salary_date.day+1)
+        patterns = []
 
-        while next_salary_date.day != self.config['salary_payment_day']:
-            try:
-                next_salary_date = datetime.date(next_salary_date.year, next_salary_date.month, next_salary_date.day+1)
-            except:
-                if next_salary_date.month == 12:
-                    next_salary_date = datetime.date(next_salary_date.year+1, 1, 1)
-                else:
-                    next_salary_date = datetime.date(next_salary_date.year, next_salary_date.month+1, 1)
+        for key in ['salary_description', 'payments', 'refunds_due']:
+            if key not in self.config or not self.config[key]:
+                continue
 
-        while next_salary_date.weekday() in [5,6]:
-            if next_salary_date.day == 1:
-                if next_salary_date.month == 1:
-                    next_salary_date = datetime.date(next_salary_date.year-1, 12, 31)
-                else:
-                    next_salary_date = datetime.date(next_salary_date.year, next_salary_date.month-1, monthrange(next_salary_date.year, next_salary_date.month-1)[1])
+            if key == 'salary_description':
+                payments = [{'desc': self.config[key]}]
+            elif key == 'payments':
+                payments = []
+
+                for payment_list in self.config[key]:
+                    if payment_list['payments']:
+                        payments += payment_list['payments']
             else:
-                next_salary_date = datetime.date(next_salary_date.year, next_salary_date.month, next_salary_date.day-1)
+                payments = self.config[key]
+
+            for payment in payments:
+                if 'desc' not in payment:
+                    continue
+
+                if type(payment['desc']) == list:
+                    patterns += payment['desc']
+                else:
+                    patterns.append(payment['desc'])
 
-        if 'uk_bank_holidays' in self.config and self.config['uk_bank_holidays']:
-            bank_holidays = BankHolidays()
+        return patterns
 
-            while bank_holidays.is_holiday(next_salary_date) or next_salary_date == datetime.date(2024,4,1) or next_salary_date.weekday() in [5,6]:
-                if next_salary_date.day == 1:
-                    if next_salary_date.month == 1:
-                        next_salary_date = datetime.date(next_salary_date.year-1, 12, 31)
-                    else:
-                        next_salary_date = datetime.date(next_salary_date.year, next_salary_date.month-1, monthrange(next_salary_date.year, next_salary_date.month-1)[1])
+
+    def get_salary_calendar(self):
+        if self.salary_calendar is None or self.salary_calendar.payment_day != self.config['salary_payment_day']:
+            holidays = None
+
+            if 'uk_bank_holidays' in self.config and self.config['uk_bank_holidays']:
+                if self.config_path:
+                    cache_file = f"{self.config_path}/{BANK_HOLIDAYS_FILE}"
+                else:
+                    cache_file = None
+
+                if 'bank_holidays_ttl_days' in self.config:
+                    holidays = SalaryCalendar.load_bank_holidays(cache_file, self.config['bank_holidays_ttl_days'])
                 else:
-                    next_salary_date = datetime.date(next_salary_date.year, next_salary_date.month, next_salary_date.day-1)
+                    holidays = SalaryCalendar.load_bank_holidays(cache_file)
 
-        return next_salary_date
+            self.salary_calendar = SalaryCalendar.get(self.config['salary_payment_day'], holidays)
+
+        return self.salary_calendar
+
+
+    def get_next_salary_date(self, last_salary_date):
+        return self.get_salary_calendar().next_salary_date(last_salary_date)
 
 
     def handle_shortfall(self, pot, shortfall):
@@ -515,7 +814,7 @@ class MonzoPayments:
                 notify = True
 
         if deposit:
-            m = MonzoAPI()
+            m = self.api()
 
             if not m.deposit_to_pot(self.account.account_id, pot, shortfall):
                 sys.stderr.write("ERROR: failed to deposit funds\n")
@@ -625,7 +924,7 @@ class MonzoPayments:
                 notify = True
 
         if withdraw:
-            m = MonzoAPI()
+            m = self.api()
 
             if not m.withdraw_from_pot(self.account.account_id, pot, credit):
                 sys.stderr.write("ERROR: failed to withdraw credit\n")
@@ -743,7 +1042,7 @@ class MonzoPayments:
                     continue
 
                 if not m:
-                    m = MonzoAPI()
+                    m = self.api()
                     sys.stdout.write("\n")
 
                 sys.stdout.write("Transferring £%.2f to pot: %s ... " % (amount_to_transfer / 100, pot.name))
@@ -784,7 +1083,7 @@ class MonzoPayments:
                     amount_to_transfer = int(payment['topup_amount'] * 100)
 
                 if not m:
-                    m = MonzoAPI()
+                    m = self.api()
                     sys.stdout.write("\n")
 
                 sys.stdout.write("Topping up pot %s with £%.2f ... " % (pot.name, amount_to_transfer / 100))
@@ -0,0 +1,104 @@
+import os
+import sys
+import pwd
+import json
+import yaml
+from monzo_utils.lib.monzo_payments import MonzoPayments
+from monzo_utils.lib.payment_matcher import PaymentMatcher
+from monzo_utils.lib.description_matcher import DescriptionMatcher
+from monzo_utils.model.account import Account
+
+# evaluates the payment configs for several accounts in one process, sharing
+# the database connection, provider/account lookups, the transaction
+# snapshot and the salary calendar. claimed transactions are per account as
+# each MonzoPayments has its own registry
+class MonzoPaymentsRunner:
+
+    def __init__(self, account_names, output_json=False, abbreviate=False, forecast=None):
+        self.account_names = account_names
+        self.json = output_json
+        self.abbreviate = abbreviate
+        self.forecast = forecast
+        self.payments = []
+
+
+    # every account config in ~/.monzo, ie yaml files other than config.yaml
+    # that have an account and payments
+    @staticmethod
+    def all_account_configs(config_path=None):
+        if config_path is None:
+            homedir = pwd.getpwuid(os.getuid()).pw_dir
+            config_path = f"{homedir}/.monzo"
+
+        account_configs = []
+
+        for filename in sorted(os.listdir(config_path)):
+            if not filename.endswith('.yaml') or filename == 'config.yaml':
+                continue
+
+            try:
+                config = yaml.safe_load(open(f"{config_path}/{filename}").read())
+            except Exception:
+                continue
+
+            if type(config) == dict and 'account' in config and 'payments' in config:
+                account_configs.append(f"{config_path}/{filename}")
+
+        return account_configs
+
+
+    def load(self):
+        provider = None
+        accounts = None
+
+        for account_name in self.account_names:
+            p = MonzoPayments(account_name, self.json, self.abbreviate, provider, accounts)
+
+            if accounts is None:
+                provider = p.provider
+                accounts = {}
+
+                for account in Account.find("select * from account where provider_id = %s", [provider.id]):
+                    accounts[account.name] = account
+
+                p.accounts = accounts
+
+            p.print_json = False
+
+            self.payments.append(p)
+
+        # the snapshot has to go back as far as the longest lookback
+        since = [PaymentMatcher.lookback(p.config) for p in self.payments]
+
+        if len(since) == 0 or None in since:
+            since = None
+        else:
+            since = min(since)
+
+        matcher = PaymentMatcher(since, DescriptionMatcher())
+
+        for p in self.payments:
+            p.matcher = matcher
+
+
+    def main(self):
+        self.load()
+
+        data = {}
+
+        for i in range(0, len(self.payments)):
+            p = self.payments[i]
+
+            if not self.json:
+                if i >0:
+                    sys.stdout.write("\n")
+
+                print(f"{p.account_name}:\n")
+
+            if self.forecast:
+                data[p.account_name] = p.forecast(self.forecast)
+            else:
+                data[p.account_name] = p.main()
+
+        if self.json:
+            print(json.dumps(data,indent=4))
@@ -7,12 +7,17 @@ import json
 import yaml
 import re
 import datetime
+import decimal
 import pwd
 from pathlib import Path
 from monzo_utils.lib.config import Config
 from monzo_utils.lib.db import DB
 from monzo_utils.lib.log import Log
 from monzo_utils.lib.monzo_api import MonzoAPI
+from monzo_utils.lib.monthly_summary import MonthlySummary
+from monzo_utils.lib.metadata_pivot import MetadataPivot
+from monzo_utils.lib.trigram_index import TrigramIndex
+from monzo_utils.lib.sync_metrics import SyncMetrics, PROMETHEUS_FILE, JSON_FILE
 from monzo_utils.model.provider import Provider
 from monzo_utils.model.account import Account
 from monzo_utils.model.merchant import Merchant
@@ -21,34 +26,55 @@ from monzo_utils.model.pot import Pot
 from monzo_utils.model.transaction import Transaction
 from monzo_utils.model.counterparty import Counterparty
 from monzo_utils.model.transaction_metadata import TransactionMetadata
-from monzo.exceptions import MonzoAuthenticationError, MonzoServerError, MonzoHTTPError, MonzoPermissionsError
+from monzo.exceptions import MonzoAuthenticationError, MonzoServerError, MonzoHTTPError, MonzoPermissionsError, MonzoRateError
 
 PROVIDER = 'Monzo'
+BACKFILL_PAGE_SIZE = 100
 
 class MonzoSync:
 
-    def __init__(self, no_init=False):
-        homedir = pwd.getpwuid(os.getuid()).pw_dir
-        self.monzo_dir = f"{homedir}/.monzo"
+    _metrics = None
+
+    # the metrics of each account synced on its own, only kept by the daemon.
+    # anything else that syncs a single account (eg monzo-payments after a
+    # transfer) leaves the metrics files alone so it doesn't replace the
+    # output of the last full sync
+    account_metrics = None
+
+    def __init__(self, no_init=False, api=None, config_path=None):
+        if config_path is None:
+            homedir = pwd.getpwuid(os.getuid()).pw_dir
+            config_path = f"{homedir}/.monzo"
+
+        self.monzo_dir = config_path
 
         if not os.path.exists(self.monzo_dir):
             os.mkdir(self.monzo_dir, 0o755)
 
         self.config_file = f"{self.monzo_dir}/config.yaml"
         self.token_file = f"{self.monzo_dir}/tokens"
+        self.backfill_file = f"{self.monzo_dir}/backfill.json"
 
         if no_init:
             return
 
-        Config()
+        Config(None, self.monzo_dir)
 
-        self.api = MonzoAPI()
+        self.api = api if api else MonzoAPI(config_path=self.monzo_dir)
 
-        self.db = DB()
+        self.db = DB(None, self.monzo_dir)
 
         self.provider = self.get_or_create_provider(PROVIDER)
 
 
+    @property
+    def metrics(self):
+        if self._metrics is None:
+            self._metrics = SyncMetrics()
+
+        return self._metrics
+
+
     def setup(self):
         print("\n========================")
         print("Monzo Utils Setup Wizard")
@@ -138,7 +164,8 @@ class MonzoSync:
         sys.stdout.write("Performing initial transaction sync ...\n\n")
         sys.stdout.flush()
 
-        self.sync(days=89)
+        # full history is only available for a few minutes after authenticating
+        self.backfill()
 
         sys.stdout.write("\nSetup complete!\n\n")
 
@@ -272,10 +299,15 @@ class MonzoSync:
         if not merchant:
             Log().info(f"creating merchant: {mo_merchant['name']} ({mo_merchant['merchant_id']})")
             merchant = Merchant()
+            before = None
+        else:
+            before = merchant.name
 
         merchant.update(mo_merchant)
         merchant.save()
 
+        TrigramIndex().update('merchant', merchant.id, before, mo_merchant['name'])
+
         mo_address['merchant_id'] = merchant.id
 
         address = MerchantAddress.one("select * from merchant_address where merchant_id = %s", [merchant.id])
@@ -294,86 +326,107 @@ class MonzoSync:
 
 
     def add_transaction(self, account, mo_transaction, pot_account_ids, pot_id=None):
-        counterparty = None
+        with self.metrics.phase('db_upsert'):
+            counterparty = None
 
-        if mo_transaction.counterparty:
-            counterparty = self.get_or_create_counterparty(mo_transaction.counterparty)
+            if mo_transaction.counterparty:
+                counterparty = self.get_or_create_counterparty(mo_transaction.counterparty)
 
-            if counterparty.name != mo_transaction.description:
-                description = self.sanitise('%s %s' % (counterparty.name, mo_transaction.description))
+                if counterparty.name != mo_transaction.description:
+                    description = self.sanitise('%s %s' % (counterparty.name, mo_transaction.description))
+                else:
+                    description = mo_transaction.description
             else:
-                description = mo_transaction.description
-        else:
-            description = self.sanitise(mo_transaction.description)
+                description = self.sanitise(mo_transaction.description)
 
-        amount = mo_transaction.amount
+            amount = mo_transaction.amount
 
-        if amount >0:
-            money_in = amount / 100
-            money_out = None
-            verb = 'from'
-            _type = 'credit'
-        else:
-            money_in = None
-            money_out = 0 - (amount / 100)
-            verb = 'to'
-            _type = 'debit'
-
-        if pot_id:
-            where = "pot_id = %s"
-            params = [pot_id]
-        else:
-            where = "pot_id is null"
-            params = []
+            if amount >0:
+                money_in = amount / 100
+                money_out = None
+                verb = 'from'
+                _type = 'credit'
+            else:
+                money_in = None
+                money_out = 0 - (amount / 100)
+                verb = 'to'
+                _type = 'debit'
+
+            if pot_id:
+                where = "pot_id = %s"
+                params = [pot_id]
+            else:
+                where = "pot_id is null"
+                params = []
 
-        where += " and account_id = %s and transaction_id = %s"
-        params += [account.id, mo_transaction.transaction_id]
+            where += " and account_id = %s and transaction_id = %s"
+            params += [account.id, mo_transaction.transaction_id]
 
-        transaction = Transaction.one(f"select * from transaction where {where}", params)
+            transaction = Transaction.one(f"select * from `transaction` where {where}", params)
 
-        date = mo_transaction.created.strftime('%Y-%m-%d')
+            date = mo_transaction.created.strftime('%Y-%m-%d')
 
-        if not transaction:
-            Log().info(f"creating transaction: {account.name} {date} -{money_in} +{money_out} {description}")
+            if not transaction:
+                Log().info(f"creating transaction: {account.name} {date} -{money_in} +{money_out} {description}")
 
-            transaction = Transaction()
+                transaction = Transaction()
+                before = None
+            else:
+                before = dict(transaction.attributes)
 
-        if pot_id is None and mo_transaction.metadata and 'pot_account_id' in mo_transaction.metadata and mo_transaction.metadata['pot_account_id'] not in pot_account_ids:
-            pot_account_ids[mo_transaction.metadata['pot_account_id']] = mo_transaction.metadata['pot_id']
+            if pot_id is None and mo_transaction.metadata and 'pot_account_id' in mo_transaction.metadata and mo_transaction.metadata['pot_account_id'] not in pot_account_ids:
+                pot_account_ids[mo_transaction.metadata['pot_account_id']] = mo_transaction.metadata['pot_id']
 
-        if mo_transaction.merchant:
-            merchant = self.get_or_create_merchant(mo_transaction.merchant)
-        else:
-            merchant = None
-
-        transaction.update({
-            'account_id': account.id,
-            'transaction_id': mo_transaction.transaction_id,
-            'date': date,
-            'type': _type,
-            'description': description,
-            'ref': mo_transaction.description,
-            'money_in': money_in,
-            'money_out': money_out,
-            'pending': mo_transaction.amount_is_pending,
-            'created_at': mo_transaction.created,
-            'updated_at': mo_transaction.updated,
-            'currency': mo_transaction.currency,
-            'local_currency': mo_transaction.local_currency,
-            'local_amount': mo_transaction.local_amount,
-            'merchant_id': merchant.id if merchant else None,
-            'notes': mo_transaction.notes,
-            'originator': mo_transaction.originator,
-            'scheme': mo_transaction.scheme,
-            'settled': mo_transaction.settled,
-            'declined': 1 if len(mo_transaction.decline_reason) >0 else 0,
-            'decline_reason': mo_transaction.decline_reason,
-            'counterparty_id': counterparty.id if counterparty else None,
-            'pot_id': pot_id
-        })
+            if mo_transaction.merchant:
+                merchant = self.get_or_create_merchant(mo_transaction.merchant)
+            else:
+                merchant = None
+
+            transaction.update({
+                'account_id': account.id,
+                'transaction_id': mo_transaction.transaction_id,
+                'date': date,
+                'type': _type,
+                'description': description,
+                'ref': mo_transaction.description,
+                'money_in': money_in,
+                'money_out': money_out,
+                'pending': mo_transaction.amount_is_pending,
+                'created_at': mo_transaction.created,
+                'updated_at': mo_transaction.updated,
+                'currency': mo_transaction.currency,
+                'local_currency': mo_transaction.local_currency,
+                'local_amount': mo_transaction.local_amount,
+                'merchant_id': merchant.id if merchant else None,
+                'notes': mo_transaction.notes,
+                'originator': mo_transaction.originator,
+                'scheme': mo_transaction.scheme,
+                'settled': mo_transaction.settled,
+                'declined': 1 if len(mo_transaction.decline_reason) >0 else 0,
+                'decline_reason': mo_transaction.decline_reason,
+                'counterparty_id': counterparty.id if counterparty else None,
+                'pot_id': pot_id
+            })
+
+            if before is None:
+                self.metrics.row('inserted')
+            elif self.row_changed(before, transaction.attributes):
+                self.metrics.row('updated')
+            else:
+                self.metrics.row('unchanged')
+
+            transaction.save()
+
+            MonthlySummary().apply(before, transaction.attributes)
+            TrigramIndex().update('transaction', transaction.id, before.get('description') if before else None, description)
+
+            with self.metrics.phase('metadata_diff'):
+                self.sync_transaction_metadata(transaction, mo_transaction)
 
-        transaction.save()
+            return transaction
 
+
+    def sync_transaction_metadata(self, transaction, mo_transaction):
         metadata = {}
 
         if type(mo_transaction.atm_fees_detailed) == dict:
@@ -408,7 +461,42 @@ class MonzoSync:
             if transaction_metadata.key not in metadata:
                 transaction_metadata.delete()
 
-        return transaction
+        MetadataPivot().write(transaction.id, metadata)
+
+
+    # values read back from the database are dates, decimals and ints rather
+    # than what the api gave us so normalise both sides before comparing
+    def normalise_value(self, value):
+        if value is None or value == '':
+            return None
+
+        if type(value) == datetime.datetime:
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+
+        if type(value) == datetime.date:
+            return value.strftime('%Y-%m-%d')
+
+        if type(value) in [bool, int, float, decimal.Decimal]:
+            return round(float(value), 2)
+
+        # sqlite hands back timestamps with microseconds and timezone as strings
+        m = re.match(r'^[\d]{4}-[\d]{2}-[\d]{2} [\d]{2}:[\d]{2}:[\d]{2}', str(value))
+
+        if m:
+            return m.group(0)
+
+        return str(value)
+
+
+    def row_changed(self, before, after):
+        for key in after:
+            if key == 'id':
+                continue
+
+            if self.normalise_value(before.get(key)) != self.normalise_value(after[key]):
+                return True
+
+        return False
 
 
     def get_or_create_counterparty(self, mo_counterparty):
@@ -439,7 +527,15 @@ class MonzoSync:
 
 
     def sync(self, days=3, account=None):
-        mo_accounts = self.api.accounts()
+        if account is None:
+            self._metrics = SyncMetrics()
+        elif account.account_id in Config().accounts:
+            self._metrics = SyncMetrics(Config().accounts[account.account_id]['name'])
+        else:
+            self._metrics = SyncMetrics(account.account_id)
+
+        with self.metrics.phase('account_fetch'), self.metrics.api_call('accounts'):
+            mo_accounts = self.api.accounts()
 
         for mo_account in mo_accounts:
             if 'monzoflexbackingloan' in mo_account.description:
@@ -451,18 +547,56 @@ class MonzoSync:
             if account is None or account.account_id == mo_account.account_id:
                 self.sync_account(mo_account, days)
 
+        self.metrics.finish()
+
         if 'touch_file' in Config().keys:
             Path(Config().touch_file).touch()
 
+        self.write_metrics()
+
+
+    def write_metrics(self):
+        if self.metrics.account is not None and self.account_metrics is None:
+            return
+
+        if 'metrics' in Config().keys:
+            prometheus_file = Config().metrics.get('prometheus_file')
+            json_file = Config().metrics.get('json_file')
+        elif 'touch_file' in Config().keys:
+            metrics_dir = os.path.dirname(os.path.realpath(Config().touch_file))
+
+            prometheus_file = f"{metrics_dir}/{PROMETHEUS_FILE}"
+            json_file = f"{metrics_dir}/{JSON_FILE}"
+        else:
+            return
+
+        try:
+            if self.metrics.account is None:
+                if self.account_metrics is not None:
+                    self.account_metrics = {}
+
+                self.metrics.write(prometheus_file, json_file)
+            else:
+                # the daemon syncs one account at a time so the latest sync of
+                # each account is kept and they're all written together
+                self.account_metrics[self.metrics.account] = self.metrics
+
+                SyncMetrics.write_all([self.account_metrics[name] for name in sorted(self.account_metrics)], prometheus_file, json_file)
+        except Exception as e:
+            Log().error(f"failed to write sync metrics: {str(e)}")
+
 
     def sync_account(self, mo_account, days):
         Log().info(f"syncing account: {Config().accounts[mo_account.account_id]['name']}")
 
+        self.metrics.accounts += 1
+
         account = self.get_or_create_account(mo_account, Config().accounts[mo_account.account_id])
 
         Log().info(f"getting pots for account: {account.name}")
 
-        pot_lookup = self.sync_account_pots(account)
+        with self.metrics.phase('pot_sync'):
+            pot_lookup = self.sync_account_pots(account)
 
         Log().info(f'syncing transactions for account: {account.name}')
 
@@ -470,12 +604,14 @@ class MonzoSync:
 
         Log().info(f'syncing pot transactions for account: {account.name}')
 
-        self.sync_account_pot_transactions(account, pot_account_ids, pot_lookup, total, days)
+        with self.metrics.phase('pot_transactions'):
+            self.sync_account_pot_transactions(account, pot_account_ids, pot_lookup, total, days)
 
 
     def sync_account_transactions(self, account, pot_lookup, days):
         try:
-            mo_transactions = self.api.transactions(account.account_id, days=days)
+            with self.metrics.phase('transaction_fetch'), self.metrics.api_call('transactions'):
+                mo_transactions = self.api.transactions(account.account_id, days=days)
         except MonzoPermissionsError as e:
             Log().error(f"permissions error: {str(e)}")
 
@@ -509,7 +645,8 @@ class MonzoSync:
 
             Log().info(f"syncing transactions for pot: {pot_lookup[pot_account_ids[pot_account_id]].name}")
 
-            mo_pot_transactions = self.api.transactions(pot_account_id, days=days)
+            with self.metrics.api_call('transactions'):
+                mo_pot_transactions = self.api.transactions(pot_account_id, days=days)
 
             for mo_pot_transaction in mo_pot_transactions:
                 transaction = self.add_transaction(account, mo_pot_transaction, pot_account_ids, pot_lookup[pot_account_ids[pot_account_id]].id)
@@ -520,35 +657,209 @@ class MonzoSync:
 
 
     def sync_account_pots(self, account):
-        mo_pots = self.api.pots(account_id=account.account_id)
+        with self.metrics.api_call('pots'):
+            mo_pots = self.api.pots(account_id=account.account_id)
+
+        pots = {}
+
+        for pot in Pot.find("select * from pot where account_id = %s", [account.id]):
+            pots[pot.pot_id] = pot
 
         pot_lookup = {}
+        changed = []
 
         for mo_pot in mo_pots:
-            pot = Pot.one("select * from pot where account_id = %s and pot_id = %s", [account.id, mo_pot.pot_id])
+            pot = pots[mo_pot.pot_id] if mo_pot.pot_id in pots else None
 
-            if not pot:
-                Log().info(f"creating pot: {mo_pot.name}")
-                pot = Pot()
+            values = {
+                'name': mo_pot.name,
+                'balance': mo_pot.balance / 100,
+                'deleted': mo_pot.deleted
+            }
+
+            # balances move far more often than anything else so most runs
+            # only have a handful of pots to write
+            if pot is None or self.row_changed(pot.attributes, values):
+                if pot is None:
+                    Log().info(f"creating pot: {mo_pot.name}")
 
-            pot.account_id = account.id
-            pot.pot_id = mo_pot.pot_id
-            pot.name = mo_pot.name
-            pot.balance = mo_pot.balance / 100
-            pot.deleted = mo_pot.deleted
+                    pot = Pot()
+                    pot.account_id = account.id
+                    pot.pot_id = mo_pot.pot_id
 
-            pot.save()
+                pot.update(values)
+                changed.append(pot)
 
             pot_lookup[pot.pot_id] = pot
 
+        # the changed pots are saved one at a time, but in a single transaction
+        # so that a sync doesn't commit once per pot
+        if len(changed) >0:
+            DB().begin()
+
+            try:
+                for pot in changed:
+                    pot.save()
+
+                DB().commit()
+            except:
+                DB().rollback()
+                raise
+
         return pot_lookup
 
 
+    def backfill(self, since=None, account=None):
+        mo_accounts = self.api.accounts()
+
+        completed = []
+
+        for mo_account in mo_accounts:
+            if 'monzoflexbackingloan' in mo_account.description:
+                continue
+
+            if mo_account.account_id not in Config().accounts:
+                continue
+
+            if account is None or account.account_id == mo_account.account_id:
+                if not self.backfill_account(mo_account, since):
+                    return
+
+                completed.append(mo_account.account_id)
+
+        self.clear_backfill_checkpoint(completed)
+
+
+    def backfill_account(self, mo_account, since=None):
+        Log().info(f"backfilling account: {Config().accounts[mo_account.account_id]['name']}")
+
+        account = self.get_or_create_account(mo_account, Config().accounts[mo_account.account_id])
+
+        pot_lookup = self.sync_account_pots(account)
+
+        checkpoint = self.load_backfill_checkpoint()
+
+        if mo_account.account_id not in checkpoint['pot_account_ids']:
+            checkpoint['pot_account_ids'][mo_account.account_id] = {}
+
+        pot_account_ids = checkpoint['pot_account_ids'][mo_account.account_id]
+
+        if since is None:
+            since = mo_account.created
+
+        total = self.backfill_transactions(account, mo_account.account_id, since, pot_account_ids, checkpoint)
+
+        if total is None:
+            return False
+
+        for pot_account_id in list(pot_account_ids.keys()):
+            if pot_account_ids[pot_account_id] not in pot_lookup or pot_lookup[pot_account_ids[pot_account_id]].deleted:
+                continue
+
+            pot = pot_lookup[pot_account_ids[pot_account_id]]
+
+            Log().info(f"backfilling transactions for pot: {pot.name}")
+
+            pot_total = self.backfill_transactions(account, pot_account_id, since, pot_account_ids, checkpoint, pot.id)
+
+            if pot_total is None:
+                return False
+
+            total += pot_total
+
+        Log().info(f"account {account.name} backfilled {total} transactions")
+
+        return True
+
+
+    def backfill_transactions(self, account, api_account_id, since, pot_account_ids, checkpoint, pot_id=None):
+        if api_account_id in checkpoint['cursors']:
+            cursor = checkpoint['cursors'][api_account_id]
+        else:
+            cursor = since
+
+        total = 0
+
+        while 1:
+            try:
+                mo_transactions = self.api.transactions(api_account_id, since=cursor, limit=BACKFILL_PAGE_SIZE)
+            except MonzoPermissionsError as e:
+                Log().error(f"permissions error during backfill, history older than 90 days can only be fetched shortly after authenticating: {str(e)}")
+                return None
+            except (MonzoRateError, MonzoServerError) as e:
+                Log().error(f"backfill interrupted, re-run to resume from the last checkpoint: {str(e)}")
+                return None
+
+            if len(mo_transactions) == 0:
+                break
+
+            DB().begin()
+
+            try:
+                for mo_transaction in mo_transactions:
+                    self.add_transaction(account, mo_transaction, pot_account_ids, pot_id)
+
+                DB().commit()
+            except:
+                DB().rollback()
+                raise
+
+            total += len(mo_transactions)
+
+            checkpoint['cursors'][api_account_id] = mo_transactions[-1].transaction_id
+
+            self.save_backfill_checkpoint(checkpoint)
+
+            Log().info(f"backfilled {total} transactions up to {mo_transactions[-1].created.strftime('%Y-%m-%d')}")
+
+            if len(mo_transactions) < BACKFILL_PAGE_SIZE:
+                break
+
+            cursor = mo_transactions[-1].transaction_id
+
+        return total
+
+
+    def load_backfill_checkpoint(self):
+        if os.path.exists(self.backfill_file):
+            return json.loads(open(self.backfill_file).read())
+
+        return {
+            'cursors': {},
+            'pot_account_ids': {}
+        }
+
+
+    # the cursors are kept until the whole backfill has completed so that
+    # re-running after an interruption doesn't fetch finished accounts again.
+    # once it has, they're dropped so the next backfill starts from its since
+    # date rather than where this one ended
+    def clear_backfill_checkpoint(self, account_ids):
+        checkpoint = self.load_backfill_checkpoint()
+
+        for account_id in account_ids:
+            checkpoint['cursors'].pop(account_id, None)
+
+            if account_id in checkpoint['pot_account_ids']:
+                for pot_account_id in checkpoint['pot_account_ids'][account_id]:
+                    checkpoint['cursors'].pop(pot_account_id, None)
+
+        self.save_backfill_checkpoint(checkpoint)
+
+
+    def save_backfill_checkpoint(self, checkpoint):
+        with open(self.backfill_file + '.new', 'w') as f:
+            f.write(json.dumps(checkpoint))
+
+        os.rename(self.backfill_file + '.new', self.backfill_file)
+
+
     def get_or_create_account(self, mo_account, account_config):
         account = Account.one("select * from account where provider_id = %s and account_id = %s", [self.provider.id, mo_account.account_id])
 
         if not account:
             account = Account()
+            account.active = 1
 
         account.provider_id = self.provider.id
         account.name = account_config['name']
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import json
+import random
+import signal
+import socket
+import threading
+import socketserver
+from monzo_utils.lib.config import Config
+from monzo_utils.lib.db import DB
+from monzo_utils.lib.log import Log
+from monzo_utils.lib.monzo_sync import MonzoSync
+from monzo_utils.model.account import Account
+
+DEFAULT_INTERVAL = 300
+DEFAULT_JITTER = 30
+DEFAULT_DAYS = 3
+
+class StatusRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        self.wfile.write(json.dumps(self.server.sync_daemon.status(), indent=4).encode('utf-8') + b"\n")
+
+
+class StatusServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+
+class MonzoSyncDaemon:
+
+    def __init__(self):
+        self.monzo_sync = MonzoSync()
+        self.monzo_sync.account_metrics = {}
+
+        if 'daemon' in Config().keys and Config().daemon:
+            config = Config().daemon
+        else:
+            config = {}
+
+        self.interval = config['interval'] if 'interval' in config else DEFAULT_INTERVAL
+        self.jitter = config['jitter'] if 'jitter' in config else DEFAULT_JITTER
+        self.days = config['days'] if 'days' in config else DEFAULT_DAYS
+
+        if 'status_socket' in config:
+            self.status_socket = config['status_socket']
+        else:
+            self.status_socket = f"{self.monzo_sync.monzo_dir}/daemon.sock"
+
+        account_intervals = config['accounts'] if 'accounts' in config and config['accounts'] else {}
+
+        self.started_at = time.time()
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.server = None
+        self.jobs = {}
+
+        for account_id in Config().accounts:
+            name = Config().accounts[account_id]['name']
+
+            self.jobs[account_id] = {
+                'name': name,
+                'interval': account_intervals[name] if name in account_intervals else self.interval,
+                'next_run': self.started_at + random.uniform(0, self.jitter),
+                'last_run': None,
+                'last_duration': None,
+                'last_error': None,
+                'runs': 0,
+                'failures': 0
+            }
+
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.handle_signal)
+        signal.signal(signal.SIGINT, self.handle_signal)
+
+        self.start_status_server()
+
+        Log().info(f"sync daemon started with {len(self.jobs)} account(s)")
+
+        try:
+            while not self.stop_event.is_set():
+                account_id = self.next_job()
+
+                if account_id is None:
+                    self.stop_event.wait(self.interval)
+                    continue
+
+                delay = self.jobs[account_id]['next_run'] - time.time()
+
+                if delay > 0:
+                    self.stop_event.wait(delay)
+                    continue
+
+                self.run_job(account_id)
+        finally:
+            self.stop_status_server()
+
+        Log().info("sync daemon stopped")
+
+
+    def handle_signal(self, signum, frame):
+        self.stop_event.set()
+
+
+    def next_job(self):
+        next_account_id = None
+
+        for account_id in self.jobs:
+            if next_account_id is None or self.jobs[account_id]['next_run'] < self.jobs[next_account_id]['next_run']:
+                next_account_id = account_id
+
+        return next_account_id
+
+
+    def run_job(self, account_id):
+        job = self.jobs[account_id]
+
+        start = time.time()
+        error = None
+
+        try:
+            DB().ping()
+
+            self.monzo_sync.sync(self.days, Account({'account_id': account_id}))
+
+        except (Exception, SystemExit) as e:
+            error = str(e) if str(e) else type(e).__name__
+
+            Log().error(f"sync failed for account {job['name']}: {error}")
+
+        with self.lock:
+            job['last_run'] = start
+            job['last_duration'] = round(time.time() - start, 3)
+            job['last_error'] = error
+            job['runs'] += 1
+
+            if error:
+                job['failures'] += 1
+
+            job['next_run'] = self.schedule(job['interval'])
+
+
+    def schedule(self, interval):
+        return time.time() + max(1, interval + random.uniform(0 - self.jitter, self.jitter))
+
+
+    def status(self):
+        with self.lock:
+            jobs = {}
+
+            for account_id in self.jobs:
+                jobs[self.jobs[account_id]['name']] = self.jobs[account_id].copy()
+                jobs[self.jobs[account_id]['name']].pop('name')
+
+            return {
+                'pid': os.getpid(),
+                'uptime': round(time.time() - self.started_at, 3),
+                'accounts': jobs
+            }
+
+
+    def start_status_server(self):
+        if os.path.exists(self.status_socket):
+            os.remove(self.status_socket)
+
+        self.server = StatusServer(self.status_socket, StatusRequestHandler)
+        self.server.sync_daemon = self
+
+        os.chmod(self.status_socket, 0o600)
+
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+
+
+    def stop_status_server(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+        if os.path.exists(self.status_socket):
+            os.remove(self.status_socket)
+
+
+    @staticmethod
+    def query_status(status_socket):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(status_socket)
+
+        data = b''
+
+        while 1:
+            chunk = sock.recv(4096)
+
+            if not chunk:
+                break
+
+            data += chunk
+
+        sock.close()
+
+        return json.loads(data.decode('utf-8'))
@@ -0,0 +1,325 @@
+import re
+import datetime
+from monzo_utils.lib.description_matcher import DescriptionMatcher
+from monzo_utils.model.provider import Provider
+from monzo_utils.model.account import Account
+from monzo_utils.model.transaction import Transaction
+from monzo_utils.model.transaction_metadata import TransactionMetadata
+from monzo_utils.lib.metadata_pivot import MetadataPivot
+
+# transactions older than this aren't loaded unless the config sets
+# lookback_days, 0 loads the full history
+DEFAULT_LOOKBACK_DAYS = 800
+
+class PaymentMatcher:
+
+    def __init__(self, since=None, descriptions=None):
+        self.since = since
+
+        if descriptions is None:
+            self.descriptions = DescriptionMatcher()
+        else:
+            self.descriptions = descriptions
+
+        self.transactions = []
+        self.loaded_accounts = []
+        self.metadata = {}
+        self.metadata_accounts = []
+        self.other_accounts = {}
+        self.candidates = {}
+        self.patterns = {}
+
+
+    # the date to load transactions from for a payments config, None for the
+    # full history
+    @staticmethod
+    def lookback(config):
+        days = config['lookback_days'] if 'lookback_days' in config else DEFAULT_LOOKBACK_DAYS
+
+        if not days:
+            return None
+
+        return datetime.date.today() - datetime.timedelta(days=days)
+
+
+    # whether the loaded transactions go back far enough to hold every
+    # transaction of a payment since its start_date
+    def covers(self, payment):
+        if self.since is None:
+            return True
+
+        return 'start_date' in payment.payment_config and payment.payment_config['start_date'] >= self.since
+
+
+    # loads every non-declined transaction for the given accounts in a single
+    # query, newest first, instead of one query per payment
+    def load(self, account_ids):
+        missing = [account_id for account_id in account_ids if account_id not in self.loaded_accounts]
+
+        if len(missing) == 0:
+            return
+
+        sql = "select * from `transaction` where account_id in (" + ",".join(["%s"] * len(missing)) + ") and declined = %s"
+        params = missing + [0]
+
+        if self.since:
+            sql += " and `date` >= %s"
+            params.append(self.since.strftime('%Y-%m-%d'))
+
+        transactions = Transaction.find(f"{sql} order by created_at desc", params)
+
+        if len(self.transactions) == 0:
+            self.transactions = transactions
+        else:
+            self.transactions = sorted(self.transactions + transactions, key=lambda t: t.created_at, reverse=True)
+
+        self.loaded_accounts += missing
+
+        # candidate lists built before this load are missing the new accounts
+        self.candidates = {}
+
+
+    def load_metadata(self, account_ids):
+        missing = [account_id for account_id in account_ids if account_id not in self.metadata_accounts]
+
+        if len(missing) == 0:
+            return
+
+        # with the pivot table each transaction's metadata is a single dict
+        if MetadataPivot().enabled():
+            self.metadata.update(MetadataPivot().load(missing, self.since))
+            self.metadata_accounts += missing
+            return
+
+        sql = "select transaction_metadata.* from transaction_metadata join `transaction` on `transaction`.id = transaction_metadata.transaction_id where `transaction`.account_id in (" + ",".join(["%s"] * len(missing)) + ")"
+        params = list(missing)
+
+        if self.since:
+            sql += " and `transaction`.`date` >= %s"
+            params.append(self.since.strftime('%Y-%m-%d'))
+
+        for row in TransactionMetadata.find(sql, params):
+            if row.transaction_id not in self.metadata:
+                self.metadata[row.transaction_id] = []
+
+            self.metadata[row.transaction_id].append(row)
+
+        self.metadata_accounts += missing
+
+
+    def account_ids(self, payment):
+        account_ids = [payment.account.id]
+
+        if 'other_accounts' in payment.payment_config:
+            for other_account in payment.payment_config['other_accounts']:
+                key = (other_account['provider'], other_account['name'])
+
+                if key not in self.other_accounts:
+                    provider = Provider.one("select * from provider where name = %s", [other_account['provider']])
+                    account = Account.one("select * from account where provider_id = %s and name = %s", [provider.id, other_account['name']])
+
+                    self.other_accounts[key] = account.id
+
+                account_ids.append(self.other_accounts[key])
+
+        return tuple(account_ids)
+
+
+    # the parts of a payment config that decide which transactions can match,
+    # payments that share a rule share the same candidate list
+    def rule(self, payment):
+        payment_config = payment.payment_config
+
+        if 'desc' not in payment_config:
+            payment_config['desc'] = type(payment).__name__
+
+        if type(payment_config['desc']) == list:
+            desc_list = payment_config['desc']
+        else:
+            desc_list = [payment_config['desc']]
+
+        desc_ids = tuple([self.descriptions.add(desc) for desc in desc_list])
+
+        if 'metadata' in payment_config:
+            metadata = tuple(sorted(payment_config['metadata'].items()))
+        else:
+            metadata = None
+
+        return (self.account_ids(payment), payment.transaction_type, desc_ids, metadata)
+
+
+    # resolves the candidates for every payment in one pass over the loaded
+    # transactions
+    def prepare(self, payments):
+        rules = []
+
+        for payment in payments:
+            rule = self.rule(payment)
+
+            self.load(rule[0])
+
+            if rule[3] is not None:
+                self.load_metadata(rule[0])
+
+            if rule not in rules:
+                rules.append(rule)
+
+        rules = [rule for rule in rules if rule not in self.candidates]
+
+        for rule in rules:
+            self.candidates[rule] = []
+
+        if len(rules) == 0:
+            return
+
+        for transaction in self.transactions:
+            for rule in rules:
+                if self.matches(rule, transaction):
+                    self.candidates[rule].append(transaction)
+
+
+    def matches(self, rule, transaction):
+        account_ids, transaction_type, desc_ids, metadata = rule
+
+        if transaction.account_id not in account_ids:
+            return False
+
+        amount = getattr(transaction, transaction_type)
+
+        if amount is None or amount <= 0:
+            return False
+
+        # the sql version inner joins the metadata table
+        if metadata is not None and transaction.id not in self.metadata:
+            return False
+
+        tags = self.descriptions.match(transaction.description)
+
+        for desc_id in desc_ids:
+            if desc_id in tags:
+                return True
+
+        if metadata is not None and type(self.metadata[transaction.id]) == dict:
+            values = self.metadata[transaction.id]
+
+            for key, value in metadata:
+                if key not in values or not self.like(value, values[key]):
+                    return False
+
+            return True
+
+        if metadata is not None:
+            for row in self.metadata[transaction.id]:
+                matched = True
+
+                for key, value in metadata:
+                    if row.key != key or not self.like(value, row.value):
+                        matched = False
+                        break
+
+                if matched:
+                    return True
+
+        return False
+
+
+    # sql LIKE semantics, case-insensitive with % and _ wildcards
+    def like(self, pattern, value):
+        if value is None:
+            return False
+
+        if pattern not in self.patterns:
+            regex = ''
+
+            for char in pattern:
+                if char == '%':
+                    regex += '.*'
+                elif char == '_':
+                    regex += '.'
+                else:
+                    regex += re.escape(char)
+
+            self.patterns[pattern] = re.compile(regex, re.IGNORECASE | re.DOTALL)
+
+        return self.patterns[pattern].fullmatch(str(value)) is not None
+
+
+    # same result as Account.last_salary_transaction. the loaded transactions
+    # are searched first, and if the salary isn't in the lookback window the
+    # older credits are queried so that a late or missed salary is still found
+    def last_salary_transaction(self, account, description, salary_minimum, salary_payment_day):
+        if type(description) == list:
+            salary_desc = description
+        else:
+            salary_desc = [description]
+
+        desc_ids = [self.descriptions.add(desc) for desc in salary_desc]
+
+        self.load((account.id,))
+
+        for transaction in self.transactions:
+            if transaction.account_id != account.id or transaction.money_in is None or transaction.money_in < salary_minimum:
+                continue
+
+            if self.is_salary(transaction, desc_ids, salary_payment_day):
+                return transaction.attributes
+
+        if self.since is None:
+            return None
+
+        for transaction in Transaction.find(
+            "select * from `transaction` where account_id = %s and declined = %s and money_in >= %s and `date` < %s order by created_at desc",
+            [account.id, 0, salary_minimum, self.since.strftime('%Y-%m-%d')]
+        ):
+            if self.is_salary(transaction, desc_ids, salary_payment_day):
+                return transaction.attributes
+
+        return None
+
+
+    def is_salary(self, transaction, desc_ids, salary_payment_day):
+        tags = self.descriptions.match(transaction.description)
+
+        if len([desc_id for desc_id in desc_ids if desc_id in tags]) == 0:
+            return False
+
+        return transaction.date.day >= salary_payment_day - 4 and transaction.date.day <= salary_payment_day
+
+
+    def find(self, payment, amounts=True, order='desc'):
+        rule = self.rule(payment)
+
+        if rule not in self.candidates:
+            self.prepare([payment])
+
+        payment_config = payment.payment_config
+
+        if amounts is True and (payment.always_fixed or ('fixed' in payment_config and payment_config['fixed'])):
+            amounts = [payment_config['amount']]
+        elif amounts is not False and amounts is not True and amounts is not None:
+            if type(amounts) != list:
+                amounts = [amounts]
+        else:
+            amounts = None
+
+        if amounts is not None:
+            amounts = [float(amount) for amount in amounts]
+
+        transactions = []
+
+        for transaction in self.candidates[rule]:
+            if 'start_date' in payment_config and transaction.date < payment_config['start_date']:
+                continue
+
+            if amounts is not None and float(getattr(transaction, payment.transaction_type)) not in amounts:
+                continue
+
+            if 'monthly_day' in payment_config and transaction.date.day != int(payment_config['monthly_day']):
+                continue
+
+            transactions.append(transaction)
+
+        if order == 'asc':
+            transactions.reverse()
+
+        return transactions
@@ -0,0 +1,229 @@
+import os
+import pickle
+import datetime
+import importlib
+import yaml
+
+# bump when the compiled format changes so that old caches are ignored
+COMPILED_VERSION = 1
+
+DATE_KEYS = ['start_date', 'renew_date', 'due_after']
+
+class PaymentsConfigError(Exception):
+    pass
+
+
+# a payment from the config along with the things that are otherwise worked
+# out from it on every run
+class PaymentRule:
+
+    def __init__(self, payment_list, payment_config):
+        self.payment_list = payment_list
+        self.payment_config = payment_config
+
+        self.library = payment_list['type'].lower().replace(' ','_')
+        self.class_name = payment_list['type'].title().replace(' ','')
+
+        self.annual = ('yearly_month' in payment_config and 'yearly_day' in payment_config) or \
+            ('is_yearly' in payment_config and bool(payment_config['is_yearly']))
+
+        if 'desc' not in payment_config:
+            self.desc = []
+        elif type(payment_config['desc']) == list:
+            self.desc = payment_config['desc']
+        else:
+            self.desc = [payment_config['desc']]
+
+
+# the account config parsed, validated and compiled into payment rules. the
+# result is cached keyed on the config file's path, mtime and size so that
+# unchanged configs aren't parsed or validated again
+class PaymentsConfig:
+
+    def __init__(self, config_file, config, key=None):
+        self.config_file = config_file
+        self.config = config
+        self.key = key
+        self.rules = []
+
+        self.validate()
+
+        if 'payments' in config:
+            for payment_list in config['payments']:
+                if payment_list['payments']:
+                    for payment_config in payment_list['payments']:
+                        self.rules.append(PaymentRule(payment_list, payment_config))
+
+        if 'refunds_due' in config and config['refunds_due']:
+            refunds = {'type': 'Refund', 'payments': config['refunds_due']}
+
+            for payment_config in config['refunds_due']:
+                self.rules.append(PaymentRule(refunds, payment_config))
+
+        self.patterns = []
+
+        if 'salary_description' in config:
+            self.patterns += config['salary_description'] if type(config['salary_description']) == list else [config['salary_description']]
+
+        for rule in self.rules:
+            self.patterns += rule.desc
+
+        self.index_rules()
+
+
+    # rules are looked up by the identity of their payment config dict, which
+    # survives pickling as the rules and the config are pickled together
+    def index_rules(self):
+        self.index = {}
+
+        for rule in self.rules:
+            self.index[id(rule.payment_config)] = rule
+
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('index')
+
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+        self.index_rules()
+
+
+    def rule(self, payment_config):
+        if id(payment_config) in self.index:
+            return self.index[id(payment_config)]
+
+        return None
+
+
+    @staticmethod
+    def file_key(config_file):
+        try:
+            stat = os.stat(config_file)
+        except Exception:
+            return None
+
+        return [os.path.abspath(config_file), stat.st_mtime_ns, stat.st_size, COMPILED_VERSION]
+
+
+    @staticmethod
+    def cache_file(config_file, cache_path):
+        return f"{cache_path}/{os.path.basename(config_file)}.compiled"
+
+
+    # the compiled config if the cache is up to date, otherwise None
+    @classmethod
+    def load(cls, config_file, cache_file):
+        key = cls.file_key(config_file)
+
+        if key is None or not os.path.exists(cache_file):
+            return None
+
+        try:
+            compiled = pickle.loads(open(cache_file, 'rb').read())
+        except Exception:
+            return None
+
+        if not isinstance(compiled, cls) or compiled.key != key:
+            return None
+
+        return compiled
+
+
+    @classmethod
+    def compile(cls, config_file, config=None):
+        key = cls.file_key(config_file)
+
+        if config is None:
+            config = yaml.safe_load(open(config_file).read())
+
+        return cls(config_file, config, key)
+
+
+    def save(self, cache_file):
+        if self.key is None:
+            return False
+
+        try:
+            with open(cache_file + '.new', 'wb') as f:
+                f.write(pickle.dumps(self))
+
+            os.rename(cache_file + '.new', cache_file)
+        except Exception:
+            return False
+
+        return True
+
+
+    def validate(self):
+        config = self.config
+
+        if type(config) != dict:
+            raise PaymentsConfigError("config is not a dictionary")
+
+        if 'payments' in config and config['payments']:
+            if type(config['payments']) != list:
+                raise PaymentsConfigError("payments must be a list")
+
+            for payment_list in config['payments']:
+                if type(payment_list) != dict or 'type' not in payment_list or 'payments' not in payment_list:
+                    raise PaymentsConfigError("each payment list needs a type and payments")
+
+                self.validate_type(payment_list['type'])
+
+                for payment_config in payment_list['payments'] or []:
+                    self.validate_payment(payment_list['type'], payment_config)
+
+        if 'refunds_due' in config and config['refunds_due']:
+            for payment_config in config['refunds_due']:
+                self.validate_payment('Refund', payment_config)
+
+
+    def validate_type(self, payment_type):
+        library = payment_type.lower().replace(' ','_')
+        class_name = payment_type.title().replace(' ','')
+
+        try:
+            getattr(importlib.import_module(f"monzo_utils.model.{library}"), class_name)
+        except Exception:
+            raise PaymentsConfigError(f"unknown payment type: {payment_type}")
+
+
+    def validate_payment(self, payment_type, payment_config):
+        if type(payment_config) != dict or 'name' not in payment_config:
+            raise PaymentsConfigError(f"{payment_type} payment is missing a name")
+
+        name = payment_config['name']
+
+        if 'desc' in payment_config:
+            desc = payment_config['desc'] if type(payment_config['desc']) == list else [payment_config['desc']]
+
+            for item in desc:
+                if type(item) != str:
+                    raise PaymentsConfigError(f"{name}: desc must be a string or a list of strings")
+
+        for key in DATE_KEYS:
+            if key in payment_config and not isinstance(payment_config[key], datetime.date):
+                raise PaymentsConfigError(f"{name}: {key} must be a date (YYYY-MM-DD)")
+
+        if 'yearly_month' in payment_config and payment_config['yearly_month'] not in range(1, 13):
+            raise PaymentsConfigError(f"{name}: yearly_month must be 1-12")
+
+        if 'yearly_day' in payment_config and payment_config['yearly_day'] not in range(1, 32):
+            raise PaymentsConfigError(f"{name}: yearly_day must be 1-31")
+
+        if 'exclude_months' in payment_config:
+            for month in payment_config['exclude_months']:
+                if month not in range(1, 13):
+                    raise PaymentsConfigError(f"{name}: exclude_months must be 1-12")
+
+        if 'renewal' in payment_config:
+            if 'date' not in payment_config['renewal'] or not isinstance(payment_config['renewal']['date'], datetime.date):
+                raise PaymentsConfigError(f"{name}: renewal needs a date (YYYY-MM-DD)")
+
+            if 'amount' not in payment_config['renewal']:
+                raise PaymentsConfigError(f"{name}: renewal needs an amount")
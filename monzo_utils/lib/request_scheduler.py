@@ -0,0 +1,161 @@
+import time
+import random
+import datetime
+import threading
+import email.utils
+from urllib.error import URLError
+from monzo.exceptions import MonzoServerError, MonzoRateError, MonzoGeneralError
+from monzo_utils.lib.singleton import Singleton
+from monzo_utils.lib.log import Log
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BASE_DELAY = 1
+DEFAULT_MAX_DELAY = 60
+
+# requests per second and burst size for each endpoint
+DEFAULT_ENDPOINTS = {
+    'accounts': {'rate': 1, 'burst': 5},
+    'pots': {'rate': 2, 'burst': 5},
+    'transactions': {'rate': 5, 'burst': 10},
+    'pot_transfers': {'rate': 1, 'burst': 2}
+}
+
+RETRYABLE_ERRORS = (MonzoServerError, MonzoRateError, MonzoGeneralError, TimeoutError, ConnectionError, URLError)
+
+class TokenBucket:
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+
+            self.tokens = min(self.burst, self.tokens + max(0, now - self.updated) * self.rate)
+            self.updated = now
+
+            # tokens may go negative, callers queue up behind each other by
+            # sleeping for the time it takes to pay off the deficit
+            self.tokens -= 1
+
+            wait = max(0, self.paused_until - now)
+
+            if self.tokens < 0:
+                wait = max(wait, (0 - self.tokens) / self.rate)
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RequestScheduler(metaclass=Singleton):
+
+    def __init__(self, config=None):
+        self.configure(config)
+
+
+    # the scheduler is shared by everything in the process so the config is
+    # applied explicitly rather than only when the first instance is created
+    def configure(self, config=None):
+        if config is None:
+            config = {}
+
+        self.max_attempts = config['max_attempts'] if 'max_attempts' in config else DEFAULT_MAX_ATTEMPTS
+        self.base_delay = config['base_delay'] if 'base_delay' in config else DEFAULT_BASE_DELAY
+        self.max_delay = config['max_delay'] if 'max_delay' in config else DEFAULT_MAX_DELAY
+
+        self.endpoints = {}
+
+        for endpoint in DEFAULT_ENDPOINTS:
+            self.endpoints[endpoint] = DEFAULT_ENDPOINTS[endpoint].copy()
+
+        if 'endpoints' in config and config['endpoints']:
+            for endpoint in config['endpoints']:
+                if endpoint not in self.endpoints:
+                    self.endpoints[endpoint] = DEFAULT_ENDPOINTS['transactions'].copy()
+
+                self.endpoints[endpoint].update(config['endpoints'][endpoint])
+
+        self.semaphore = threading.BoundedSemaphore(config['concurrency'] if 'concurrency' in config else DEFAULT_CONCURRENCY)
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+
+    def bucket(self, endpoint):
+        with self.lock:
+            if endpoint not in self.buckets:
+                if endpoint in self.endpoints:
+                    limits = self.endpoints[endpoint]
+                else:
+                    limits = DEFAULT_ENDPOINTS['transactions']
+
+                self.buckets[endpoint] = TokenBucket(limits['rate'], limits['burst'])
+
+            return self.buckets[endpoint]
+
+
+    def call(self, endpoint, func, *args, **kwargs):
+        for attempt in range(0, self.max_attempts):
+            self.bucket(endpoint).acquire()
+
+            try:
+                with self.semaphore:
+                    return func(*args, **kwargs)
+
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_attempts - 1:
+                    raise
+
+                retry_after = self.retry_after(e)
+
+                if retry_after is not None:
+                    delay = retry_after
+
+                    self.bucket(endpoint).pause(delay)
+                else:
+                    delay = self.backoff(attempt)
+
+                Log().warning(f"{endpoint} request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+
+                time.sleep(delay)
+
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+    def retry_after(self, exception):
+        # the monzo-api exceptions wrap the original HTTPError which carries
+        # the response headers
+        headers = getattr(exception.__cause__, 'headers', None)
+
+        if headers is None:
+            return None
+
+        value = headers.get('Retry-After')
+
+        if value is None:
+            return None
+
+        try:
+            return max(0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        return max(0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
@@ -0,0 +1,150 @@
+import os
+import time
+import json
+import datetime
+from calendar import monthrange
+
+BANK_HOLIDAYS_FILE = 'bank_holidays.json'
+BANK_HOLIDAYS_TTL_DAYS = 7
+
+# 2024-04-01 (Easter Monday) is treated as a non-working day even though
+# it isn't common to all UK divisions
+EXTRA_HOLIDAYS = [datetime.date(2024,4,1)]
+
+class SalaryCalendar:
+
+    # bank holidays by cache file, loaded once per process
+    bank_holidays_cache = {}
+
+    # calendars by payment day and whether bank holidays are used
+    calendars = {}
+
+    def __init__(self, payment_day, holidays=None, start_year=None, years=6):
+        self.payment_day = payment_day
+        self.holidays = holidays
+        self.pay_dates = {}
+
+        if start_year is None:
+            start_year = datetime.date.today().year - 2
+
+        for index in range(start_year * 12, (start_year + years) * 12):
+            self.pay_date(index)
+
+
+    @classmethod
+    def get(cls, payment_day, holidays=None):
+        key = (payment_day, holidays is not None)
+
+        if key not in cls.calendars or cls.calendars[key].holidays != holidays:
+            cls.calendars[key] = cls(payment_day, holidays)
+
+        return cls.calendars[key]
+
+
+    @classmethod
+    def load_bank_holidays(cls, cache_file=None, ttl_days=BANK_HOLIDAYS_TTL_DAYS):
+        if cache_file in cls.bank_holidays_cache:
+            return cls.bank_holidays_cache[cache_file]
+
+        holidays = None
+
+        if cache_file and os.path.exists(cache_file) and time.time() - os.stat(cache_file).st_mtime < ttl_days * 86400:
+            holidays = cls.read_bank_holidays(cache_file)
+
+        if holidays is None:
+            from govuk_bank_holidays.bank_holidays import BankHolidays
+
+            try:
+                holidays = set([holiday['date'] for holiday in BankHolidays().get_holidays()])
+
+                if cache_file:
+                    cls.write_bank_holidays(cache_file, holidays)
+
+            except Exception:
+                # an expired cache is still better than the bundled data
+                if cache_file and os.path.exists(cache_file):
+                    holidays = cls.read_bank_holidays(cache_file)
+
+                if holidays is None:
+                    holidays = set([holiday['date'] for holiday in BankHolidays(use_cached_holidays=True).get_holidays()])
+
+        cls.bank_holidays_cache[cache_file] = holidays
+
+        return holidays
+
+
+    @classmethod
+    def read_bank_holidays(cls, cache_file):
+        try:
+            return set([datetime.datetime.strptime(date, '%Y-%m-%d').date() for date in json.loads(open(cache_file).read())])
+        except Exception:
+            return None
+
+
+    @classmethod
+    def write_bank_holidays(cls, cache_file, holidays):
+        with open(cache_file + '.new', 'w') as f:
+            f.write(json.dumps(sorted([date.strftime('%Y-%m-%d') for date in holidays])))
+
+        os.rename(cache_file + '.new', cache_file)
+
+
+    @staticmethod
+    def month_index(date):
+        return date.year * 12 + date.month - 1
+
+
+    # the unadjusted pay date for a month, None if the month is too short
+    def nominal_date(self, index):
+        year = index // 12
+        month = index % 12 + 1
+
+        if self.payment_day > monthrange(year, month)[1]:
+            return None
+
+        return datetime.date(year, month, self.payment_day)
+
+
+    # the first month from index that has the payment day
+    def next_index(self, index):
+        while self.nominal_date(index) is None:
+            index += 1
+
+        return index
+
+
+    def is_working_day(self, date):
+        if date.weekday() in [5,6]:
+            return False
+
+        if self.holidays is not None and (date in self.holidays or date in EXTRA_HOLIDAYS):
+            return False
+
+        return True
+
+
+    # the pay date for a month, moved back to the previous working day
+    def pay_date(self, index):
+        if index not in self.pay_dates:
+            date = self.nominal_date(index)
+
+            if date is not None:
+                while not self.is_working_day(date):
+                    date -= datetime.timedelta(days=1)
+
+            self.pay_dates[index] = date
+
+        return self.pay_dates[index]
+
+
+    # the pay date following a salary paid on last_salary_date, which may
+    # itself have been moved back from the nominal payment day
+    def next_salary_date(self, last_salary_date):
+        index = self.month_index(last_salary_date)
+
+        if last_salary_date.day > self.payment_day:
+            index += 1
+
+        index = self.next_index(index)
+
+        return self.pay_date(self.next_index(index + 1))
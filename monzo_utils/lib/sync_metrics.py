@@ -0,0 +1,237 @@
+import os
+import time
+import json
+from contextlib import contextmanager
+
+PHASES = ['account_fetch', 'pot_sync', 'transaction_fetch', 'pot_transactions', 'db_upsert', 'metadata_diff']
+ROW_RESULTS = ['inserted', 'updated', 'unchanged']
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+PROMETHEUS_FILE = 'monzo_sync.prom'
+JSON_FILE = 'monzo_sync.json'
+
+# name, type and help text of each metric family in the order they're written
+FAMILIES = [
+    ['monzo_sync_duration_seconds', 'gauge', 'Duration of the last sync.'],
+    ['monzo_sync_last_run_timestamp_seconds', 'gauge', 'Time the last sync finished.'],
+    ['monzo_sync_accounts', 'gauge', 'Accounts synced by the last sync.'],
+    ['monzo_sync_phase_seconds', 'gauge', 'Time spent in each phase of the last sync.'],
+    ['monzo_sync_phase_runs', 'gauge', 'Number of times each phase ran in the last sync.'],
+    ['monzo_sync_rows', 'gauge', 'Transaction rows written by the last sync.'],
+    ['monzo_sync_api_latency_seconds', 'histogram', 'Latency of Monzo API calls in the last sync.']
+]
+
+class SyncMetrics:
+
+    # account is the name of the account for syncs of a single account, eg by
+    # the daemon, and None for a sync of every account
+    def __init__(self, account=None):
+        self.account = account
+        self.started = time.time()
+        self.finished = None
+        self.accounts = 0
+        self.phases = {}
+        self.rows = {}
+        self.latency = {}
+        self.stack = []
+
+        for phase in PHASES:
+            self.phases[phase] = {'seconds': 0, 'count': 0}
+
+        for result in ROW_RESULTS:
+            self.rows[result] = 0
+
+
+    # phases nest (eg db_upsert inside pot_transactions) but each phase is only
+    # charged for its own time so that the phase totals add up to the sync time
+    @contextmanager
+    def phase(self, name):
+        start = time.monotonic()
+
+        if len(self.stack) >0:
+            parent = self.stack[-1]
+            self.phases[parent[0]]['seconds'] += start - parent[1]
+
+        entry = [name, start]
+        self.stack.append(entry)
+
+        try:
+            yield
+        finally:
+            now = time.monotonic()
+
+            self.phases[name]['seconds'] += now - entry[1]
+            self.phases[name]['count'] += 1
+
+            self.stack.pop()
+
+            if len(self.stack) >0:
+                self.stack[-1][1] = now
+
+
+    @contextmanager
+    def api_call(self, endpoint):
+        start = time.monotonic()
+
+        try:
+            yield
+        finally:
+            self.observe(endpoint, time.monotonic() - start)
+
+
+    def observe(self, endpoint, seconds):
+        if endpoint not in self.latency:
+            self.latency[endpoint] = {
+                'buckets': [0] * len(LATENCY_BUCKETS),
+                'sum': 0,
+                'count': 0
+            }
+
+        histogram = self.latency[endpoint]
+
+        for i in range(0, len(LATENCY_BUCKETS)):
+            if seconds <= LATENCY_BUCKETS[i]:
+                histogram['buckets'][i] += 1
+
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+
+
+    def row(self, result):
+        self.rows[result] += 1
+
+
+    def finish(self):
+        self.finished = time.time()
+
+
+    def duration(self):
+        return (self.finished or time.time()) - self.started
+
+
+    def to_dict(self):
+        latency = {}
+
+        for endpoint in self.latency:
+            histogram = self.latency[endpoint]
+
+            latency[endpoint] = {
+                'buckets': dict(zip([str(le) for le in LATENCY_BUCKETS], histogram['buckets'])),
+                'sum': round(histogram['sum'], 6),
+                'count': histogram['count']
+            }
+
+        phases = {}
+
+        for phase in self.phases:
+            phases[phase] = {
+                'seconds': round(self.phases[phase]['seconds'], 6),
+                'count': self.phases[phase]['count']
+            }
+
+        return {
+            'started': self.started,
+            'finished': self.finished,
+            'duration': round(self.duration(), 6),
+            'accounts': self.accounts,
+            'phases': phases,
+            'rows': dict(self.rows),
+            'api_latency': latency
+        }
+
+
+    # [sample name, labels, value] for every sample keyed by metric family
+    def samples(self):
+        samples = {}
+
+        for family in FAMILIES:
+            samples[family[0]] = []
+
+        samples['monzo_sync_duration_seconds'].append(['monzo_sync_duration_seconds', [], f"{self.duration():.6f}"])
+        samples['monzo_sync_last_run_timestamp_seconds'].append(['monzo_sync_last_run_timestamp_seconds', [], f"{self.finished or time.time():.3f}"])
+        samples['monzo_sync_accounts'].append(['monzo_sync_accounts', [], f"{self.accounts}"])
+
+        for phase in self.phases:
+            samples['monzo_sync_phase_seconds'].append(['monzo_sync_phase_seconds', [['phase', phase]], f"{self.phases[phase]['seconds']:.6f}"])
+            samples['monzo_sync_phase_runs'].append(['monzo_sync_phase_runs', [['phase', phase]], f"{self.phases[phase]['count']}"])
+
+        for result in self.rows:
+            samples['monzo_sync_rows'].append(['monzo_sync_rows', [['result', result]], f"{self.rows[result]}"])
+
+        for endpoint in sorted(self.latency.keys()):
+            histogram = self.latency[endpoint]
+            family = samples['monzo_sync_api_latency_seconds']
+
+            for i in range(0, len(LATENCY_BUCKETS)):
+                family.append(['monzo_sync_api_latency_seconds_bucket', [['endpoint', endpoint], ['le', str(LATENCY_BUCKETS[i])]], f"{histogram['buckets'][i]}"])
+
+            family.append(['monzo_sync_api_latency_seconds_bucket', [['endpoint', endpoint], ['le', '+Inf']], f"{histogram['count']}"])
+            family.append(['monzo_sync_api_latency_seconds_sum', [['endpoint', endpoint]], f"{histogram['sum']:.6f}"])
+            family.append(['monzo_sync_api_latency_seconds_count', [['endpoint', endpoint]], f"{histogram['count']}"])
+
+        return samples
+
+
+    def to_prometheus(self):
+        return SyncMetrics.prometheus([self])
+
+
+    # the metrics of several syncs in one file, each labelled with its account
+    @staticmethod
+    def prometheus(metrics):
+        lines = []
+
+        all_samples = [[m.account, m.samples()] for m in metrics]
+
+        for name, metric_type, help_text in FAMILIES:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+            for account, samples in all_samples:
+                for sample, labels, value in samples[name]:
+                    if account is not None:
+                        labels = [['account', account]] + labels
+
+                    if len(labels) >0:
+                        sample += '{' + ','.join([f"{key}=\"{SyncMetrics.escape(label)}\"" for key, label in labels]) + '}'
+
+                    lines.append(f"{sample} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+    @staticmethod
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+    def write(self, prometheus_file=None, json_file=None):
+        SyncMetrics.write_all([self], prometheus_file, json_file)
+
+
+    # a sync of every account is written as it is, the syncs of single
+    # accounts are written keyed by account
+    @staticmethod
+    def write_all(metrics, prometheus_file=None, json_file=None):
+        if prometheus_file:
+            SyncMetrics.write_file(prometheus_file, SyncMetrics.prometheus(metrics))
+
+        if json_file:
+            if len(metrics) == 1 and metrics[0].account is None:
+                data = metrics[0].to_dict()
+            else:
+                data = {'accounts': {}}
+
+                for m in metrics:
+                    data['accounts'][m.account] = m.to_dict()
+
+            SyncMetrics.write_file(json_file, json.dumps(data, indent=4))
+
+
+    # the textfile collector can read the file at any moment so it must never
+    # see a partially written file
+    @staticmethod
+    def write_file(path, content):
+        with open(path + '.new', 'w') as f:
+            f.write(content)
+
+        os.rename(path + '.new', path)
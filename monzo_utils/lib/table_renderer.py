@@ -0,0 +1,89 @@
+import sys
+import itertools
+
+# rows read before the column widths are fixed
+SAMPLE_SIZE = 500
+
+# rows formatted before each write to the output
+CHUNK_SIZE = 100
+
+# renders rows from an iterator as a text table without holding them all in
+# memory. column widths are taken from the headers and the first sample_size
+# rows; a longer value further down pushes the rest of its line along
+class TableRenderer:
+
+    def __init__(self, columns, align=None, out=None, sample_size=SAMPLE_SIZE, chunk_size=CHUNK_SIZE):
+        self.columns = columns
+        self.align = align or {}
+        self.out = out or sys.stdout
+        self.sample_size = sample_size
+        self.chunk_size = chunk_size
+
+
+    def column_widths(self, rows):
+        widths = {}
+
+        for key in self.columns:
+            widths[key] = len(key)
+
+        for row in rows:
+            for key in self.columns:
+                if len(str(row[key])) > widths[key]:
+                    widths[key] = len(str(row[key]))
+
+        return widths
+
+
+    def header(self, widths):
+        line = ''
+
+        for key in self.columns:
+            line += key.ljust(widths[key]+2)
+
+        line += "\n"
+
+        for key in self.columns:
+            line += '-' * (widths[key]+2)
+
+        return line + "\n"
+
+
+    def format_row(self, row, widths):
+        line = ''
+
+        for key in self.columns:
+            if key in self.align and self.align[key] == 'right':
+                line += str(row[key]).rjust(widths[key]) + '  '
+            else:
+                line += str(row[key]).ljust(widths[key]) + '  '
+
+        return line + "\n"
+
+
+    # writes the table and returns the number of rows written
+    def render(self, rows):
+        rows = iter(rows)
+        sample = list(itertools.islice(rows, self.sample_size))
+
+        widths = self.column_widths(sample)
+
+        chunk = [self.header(widths)]
+        count = 0
+
+        for row in itertools.chain(sample, rows):
+            chunk.append(self.format_row(row, widths))
+            count += 1
+
+            if len(chunk) >= self.chunk_size:
+                self.write(chunk)
+                chunk = []
+
+        self.write(chunk)
+
+        return count
+
+
+    def write(self, chunk):
+        if chunk:
+            self.out.write(''.join(chunk))
+            self.out.flush()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import queue
+import multiprocessing
+
+DEFAULT_PROCESSES = 4
+DEFAULT_TIMEOUT = 600
+DEFAULT_DAYS = 3
+
+def sync_tenant(config_path, days):
+    # imported here so that nothing is initialised until we're inside the
+    # tenant's own process
+    from monzo_utils.lib.config import Config
+    from monzo_utils.lib.log import Log
+    from monzo_utils.lib.monzo_sync import MonzoSync
+
+    # there's nobody to complete an interactive oauth flow
+    os.environ['NO_AUTH'] = '1'
+
+    Log(config_path)
+    Config(None, config_path)
+
+    MonzoSync(config_path=config_path).sync(days)
+
+
+def run_tenant(config_path, days, results):
+    start = time.time()
+
+    try:
+        sync_tenant(config_path, days)
+
+        error = None
+    except (Exception, SystemExit) as e:
+        error = f"{type(e).__name__}: {str(e)}"
+
+    results.put({
+        'tenant': config_path,
+        'status': 'ok' if error is None else 'failed',
+        'duration': time.time() - start,
+        'error': error
+    })
+
+
+class TenantOrchestrator:
+
+    def __init__(self, config_paths, processes=DEFAULT_PROCESSES, timeout=DEFAULT_TIMEOUT, days=DEFAULT_DAYS):
+        self.config_paths = []
+
+        for config_path in config_paths:
+            config_path = os.path.realpath(config_path)
+
+            if config_path not in self.config_paths:
+                self.config_paths.append(config_path)
+
+        self.processes = max(1, processes)
+        self.timeout = timeout
+        self.days = days
+
+
+    def validate(self):
+        errors = []
+
+        for config_path in self.config_paths:
+            if not os.path.exists(f"{config_path}/config.yaml"):
+                errors.append(f"config file not found: {config_path}/config.yaml")
+
+        return errors
+
+
+    def run(self):
+        pending = list(self.config_paths)
+        running = {}
+        results = {}
+        result_queue = multiprocessing.Queue()
+
+        start = time.time()
+
+        while len(pending) >0 or len(running) >0:
+            # each tenant gets a fresh process so that the Config, DB, Log and
+            # TransactionsSeen singletons are never shared between tenants
+            while len(pending) >0 and len(running) < self.processes:
+                config_path = pending.pop(0)
+
+                process = multiprocessing.Process(target=run_tenant, args=(config_path, self.days, result_queue))
+                process.start()
+
+                running[config_path] = {
+                    'process': process,
+                    'start': time.time()
+                }
+
+            self.collect(result_queue, results)
+
+            for config_path in list(running.keys()):
+                process = running[config_path]['process']
+                duration = time.time() - running[config_path]['start']
+
+                if not process.is_alive():
+                    process.join()
+                    self.collect(result_queue, results)
+
+                    if config_path not in results:
+                        results[config_path] = {
+                            'tenant': config_path,
+                            'status': 'failed',
+                            'duration': duration,
+                            'error': f"sync process exited with code {process.exitcode}"
+                        }
+
+                    running.pop(config_path)
+
+                elif self.timeout and duration > self.timeout:
+                    process.terminate()
+                    process.join()
+
+                    results[config_path] = {
+                        'tenant': config_path,
+                        'status': 'timeout',
+                        'duration': duration,
+                        'error': f"sync timed out after {self.timeout} seconds"
+                    }
+
+                    running.pop(config_path)
+
+            if len(running) >0:
+                time.sleep(0.1)
+
+        return self.report([results[config_path] for config_path in self.config_paths], time.time() - start)
+
+
+    def collect(self, result_queue, results):
+        while 1:
+            try:
+                result = result_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            results[result['tenant']] = result
+
+
+    def report(self, results, duration):
+        failed = [r for r in results if r['status'] != 'ok']
+        durations = [r['duration'] for r in results]
+
+        return {
+            'tenants': len(results),
+            'succeeded': len(results) - len(failed),
+            'failed': len(failed),
+            'processes': self.processes,
+            'wall_time': duration,
+            'total_sync_time': sum(durations),
+            'max_sync_time': max(durations) if len(durations) >0 else 0,
+            'results': results
+        }
+
+
+    def display(self, report):
+        width = max([len('tenant')] + [len(r['tenant']) for r in report['results']])
+
+        print(f"{'tenant':<{width}}  {'status':<8} {'seconds':>8}  error")
+
+        for result in report['results']:
+            print(f"{result['tenant']:<{width}}  {result['status']:<8} {result['duration']:>8.2f}  {result['error'] or ''}")
+
+        print()
+        print(f"{report['tenants']} tenants, {report['succeeded']} succeeded, {report['failed']} failed")
+        print(f"wall time: {report['wall_time']:.2f}s, total sync time: {report['total_sync_time']:.2f}s, slowest tenant: {report['max_sync_time']:.2f}s")
@@ -0,0 +1,75 @@
+import os
+import json
+import fcntl
+import threading
+from contextlib import contextmanager
+
+class TokenStore:
+
+    stores = {}
+    stores_lock = threading.Lock()
+
+    # one store per token file so that every MonzoAPI instance in the process
+    # shares the same in-memory copy of the tokens
+    @classmethod
+    def get(cls, token_file):
+        with cls.stores_lock:
+            if token_file not in cls.stores:
+                cls.stores[token_file] = cls(token_file)
+
+            return cls.stores[token_file]
+
+
+    def __init__(self, token_file):
+        self.token_file = token_file
+        self.lock_file = f"{token_file}.lock"
+        self.tokens = None
+        self.signature = None
+        self.thread_lock = threading.RLock()
+
+
+    @contextmanager
+    def lock(self):
+        with self.thread_lock:
+            with open(self.lock_file, 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+    def file_signature(self):
+        try:
+            stat = os.stat(self.token_file)
+        except OSError:
+            return None
+
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+    def load(self):
+        if not os.path.exists(self.token_file):
+            return None
+
+        signature = self.file_signature()
+
+        # only re-read the file if another process has written to it
+        if self.tokens is not None and signature is not None and signature == self.signature:
+            return self.tokens
+
+        self.tokens = json.loads(open(self.token_file).read())
+        self.signature = signature
+
+        return self.tokens
+
+
+    def save(self, tokens):
+        with open(self.token_file + '.new', 'w') as f:
+            f.write(json.dumps(tokens))
+
+        os.rename(self.token_file + '.new', self.token_file)
+
+        self.tokens = tokens
+        self.signature = self.file_signature()
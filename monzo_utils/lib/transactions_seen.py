@@ -1,4 +1,7 @@
 from monzo_utils.lib.singleton import Singleton
+from monzo_utils.lib.claim_registry import ClaimRegistry
 
-class TransactionsSeen(metaclass=Singleton):
+# the process-wide registry, used by payments that aren't part of a
+# MonzoPayments run
+class TransactionsSeen(ClaimRegistry, metaclass=Singleton):
     seen = {}
@@ -0,0 +1,132 @@
+import re
+import math
+from monzo_utils.lib.singleton import Singleton
+from monzo_utils.lib.db import DB
+
+TABLE = 'search_trigram'
+
+WORD = re.compile(r'\w+')
+
+# the share of the search term's trigrams that a name or description must
+# contain to be returned
+THRESHOLD = 0.5
+
+# rows per insert statement, kept well under sqlite's limit on the number of
+# parameters in a query
+INSERT_BATCH_SIZE = 200
+
+# posting lists of the trigrams in merchant names and transaction descriptions
+# for fuzzy searching. each row is one trigram of one record along with the
+# number of distinct trigrams in that record, so matches can be scored from the
+# posting lists alone without reading the merchant or transaction tables
+class TrigramIndex(metaclass=Singleton):
+
+    available = None
+
+    # the index is optional so it's only maintained if the table exists
+    def enabled(self):
+        if self.available is None:
+            self.available = DB().table_exists(TABLE)
+
+        return self.available
+
+
+    # lower-cased words padded with two spaces in front and one behind, so that
+    # the starts of words weigh more than their ends
+    def trigrams(self, text):
+        trigrams = set()
+
+        for word in WORD.findall(str(text or '').lower()):
+            padded = '  ' + word + ' '
+
+            for i in range(0, len(padded) - 2):
+                trigrams.add(padded[i:i+3])
+
+        return trigrams
+
+
+    # reindexes a record if its text has changed. before is None for new
+    # records
+    def update(self, record_type, record_id, before, after):
+        if not self.enabled() or before == after:
+            return
+
+        if before is not None:
+            DB().query(f"delete from {TABLE} where record_type = %s and record_id = %s", [record_type, record_id])
+
+        self.insert([[record_type, record_id, after]])
+
+
+    def insert(self, records):
+        rows = []
+
+        for record_type, record_id, text in records:
+            trigrams = self.trigrams(text)
+
+            for trigram in sorted(trigrams):
+                rows.append([record_type, record_id, trigram, len(trigrams)])
+
+        for i in range(0, len(rows), INSERT_BATCH_SIZE):
+            batch = rows[i:i+INSERT_BATCH_SIZE]
+            params = []
+
+            for row in batch:
+                params += row
+
+            DB().query(f"insert into {TABLE} (record_type, record_id, trigram, trigrams) values " + ",".join(["(%s, %s, %s, %s)"] * len(batch)), params)
+
+
+    # merchants and transactions whose text contains at least the threshold
+    # share of the term's trigrams, best first. score is that share and
+    # similarity is the overlap of the two trigram sets, which ranks the closer
+    # of two equally scored matches first
+    def search(self, term, threshold=THRESHOLD):
+        trigrams = sorted(self.trigrams(term))
+
+        if len(trigrams) == 0:
+            return []
+
+        matches = []
+
+        for row in DB().query(
+            f"select record_type, record_id, count(*) as shared, max(trigrams) as trigrams from {TABLE} where trigram in (" + ",".join(["%s"] * len(trigrams)) + ") group by record_type, record_id having count(*) >= %s",
+            trigrams + [max(1, math.ceil(threshold * len(trigrams)))]
+        ):
+            shared = int(row['shared'])
+
+            matches.append({
+                'record_type': row['record_type'],
+                'record_id': row['record_id'],
+                'score': shared / len(trigrams),
+                'similarity': shared / (len(trigrams) + int(row['trigrams']) - shared)
+            })
+
+        return sorted(matches, key=lambda match: (0 - match['score'], 0 - match['similarity'], match['record_type'], match['record_id']))
+
+
+    # recreates the index from the merchant and transaction tables. returns the
+    # number of records indexed
+    def rebuild(self):
+        records = []
+
+        for row in DB().stream("select id, name from merchant"):
+            records.append(['merchant', row['id'], row['name']])
+
+        for row in DB().stream("select id, description from `transaction`"):
+            records.append(['transaction', row['id'], row['description']])
+
+        DB().begin()
+
+        try:
+            DB().query(f"delete from {TABLE}")
+
+            self.insert(records)
+
+            DB().commit()
+        except Exception:
+            DB().rollback()
+            raise
+
+        self.available = True
+
+        return len(records)
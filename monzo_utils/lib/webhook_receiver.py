@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import json
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import monzo.endpoints.transaction
+from monzo_utils.lib.config import Config
+from monzo_utils.lib.db import DB
+from monzo_utils.lib.log import Log
+from monzo_utils.lib.monzo_sync import MonzoSync
+from monzo_utils.model.account import Account
+
+DEFAULT_LISTEN = '127.0.0.1'
+DEFAULT_PORT = 8045
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_BATCH_INTERVAL = 2
+DEFAULT_RECONCILE_INTERVAL = 3600
+MAX_PAYLOAD_SIZE = 1024 * 1024
+
+REQUIRED_FIELDS = ['id', 'account_id', 'amount', 'created', 'currency', 'description']
+
+# fields that the monzo-api Transaction object requires but that are not
+# always present in webhook payloads
+TRANSACTION_DEFAULTS = {
+    'amount_is_pending': False,
+    'atm_fees_detailed': None,
+    'attachments': None,
+    'can_add_to_tab': False,
+    'can_be_excluded_from_breakdown': False,
+    'can_be_made_subscription': False,
+    'can_match_transactions_in_categorization': False,
+    'can_split_the_bill': False,
+    'categories': None,
+    'category': None,
+    'counterparty': {},
+    'dedupe_id': None,
+    'decline_reason': '',
+    'fees': {},
+    'include_in_spending': True,
+    'international': None,
+    'is_load': False,
+    'labels': None,
+    'local_amount': None,
+    'local_currency': None,
+    'merchant': None,
+    'metadata': {},
+    'notes': '',
+    'originator': False,
+    'scheme': None,
+    'settled': None,
+    'updated': None,
+    'user_id': None
+}
+
+class WebhookError(Exception):
+    pass
+
+
+class WebhookRequestHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        receiver = self.server.receiver
+
+        if receiver.secret is not None and self.path.rstrip('/') != f"/webhook/{receiver.secret}":
+            return self.respond(403, 'forbidden')
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            return self.respond(400, 'invalid content length')
+
+        if length <= 0 or length > MAX_PAYLOAD_SIZE:
+            return self.respond(413 if length > 0 else 400, 'invalid payload size')
+
+        try:
+            payload = json.loads(self.rfile.read(length).decode('utf-8'))
+
+            receiver.enqueue(payload)
+
+        except (ValueError, WebhookError) as e:
+            return self.respond(400, str(e))
+
+        self.respond(200, 'queued')
+
+
+    def respond(self, code, message):
+        body = json.dumps({'status': message}).encode('utf-8')
+
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WebhookReceiver:
+
+    def __init__(self):
+        if 'webhook' in Config().keys and Config().webhook:
+            config = Config().webhook
+        else:
+            config = {}
+
+        self.listen = config['listen'] if 'listen' in config else DEFAULT_LISTEN
+        self.port = config['port'] if 'port' in config else DEFAULT_PORT
+        self.secret = config['secret'] if 'secret' in config else None
+        self.batch_size = config['batch_size'] if 'batch_size' in config else DEFAULT_BATCH_SIZE
+        self.batch_interval = config['batch_interval'] if 'batch_interval' in config else DEFAULT_BATCH_INTERVAL
+        self.reconcile_interval = config['reconcile_interval'] if 'reconcile_interval' in config else DEFAULT_RECONCILE_INTERVAL
+
+        self.queue = queue.Queue()
+        self.stop_event = threading.Event()
+        self.monzo_sync = None
+        self.accounts = {}
+        self.last_reconcile = time.time()
+
+
+    def validate(self, payload):
+        if type(payload) != dict:
+            raise WebhookError('payload must be an object')
+
+        if payload.get('type') != 'transaction.created':
+            raise WebhookError(f"unsupported event type: {payload.get('type')}")
+
+        if type(payload.get('data')) != dict:
+            raise WebhookError('payload data must be an object')
+
+        for field in REQUIRED_FIELDS:
+            if field not in payload['data']:
+                raise WebhookError(f"payload data is missing field: {field}")
+
+        if payload['data']['account_id'] not in Config().accounts:
+            raise WebhookError(f"unknown account: {payload['data']['account_id']}")
+
+        return payload['data']
+
+
+    def enqueue(self, payload):
+        self.queue.put(self.validate(payload))
+
+
+    def build_transaction(self, data):
+        transaction_data = TRANSACTION_DEFAULTS.copy()
+        transaction_data.update(data)
+
+        if transaction_data['updated'] is None:
+            transaction_data['updated'] = transaction_data['created']
+
+        for key in ['counterparty', 'fees', 'metadata']:
+            if transaction_data[key] is None:
+                transaction_data[key] = {}
+
+        if transaction_data['decline_reason'] is None:
+            transaction_data['decline_reason'] = ''
+
+        if type(transaction_data['merchant']) != dict:
+            transaction_data['merchant'] = None
+
+        return monzo.endpoints.transaction.Transaction(self.monzo_sync.api.client, transaction_data)
+
+
+    # only accounts that exist are cached so that one which hasn't been synced
+    # yet is picked up as soon as a reconcile has created it
+    def get_account(self, account_id):
+        if account_id in self.accounts:
+            return self.accounts[account_id]
+
+        account = Account.one("select * from account where provider_id = %s and account_id = %s", [self.monzo_sync.provider.id, account_id])
+
+        if account is not None:
+            self.accounts[account_id] = account
+
+        return account
+
+
+    def apply_batch(self, batch):
+        applied = 0
+        pot_account_ids = {}
+
+        DB().begin()
+
+        try:
+            for data in batch:
+                account = self.get_account(data['account_id'])
+
+                # Account truthiness loads its pots, None means not synced yet
+                if account is None:
+                    Log().warning(f"account {data['account_id']} has not been synced yet, leaving transaction {data['id']} for reconciliation")
+                    continue
+
+                self.monzo_sync.add_transaction(account, self.build_transaction(data), pot_account_ids)
+
+                applied += 1
+
+            DB().commit()
+        except:
+            DB().rollback()
+            raise
+
+        return applied
+
+
+    def next_batch(self):
+        batch = []
+
+        try:
+            batch.append(self.queue.get(timeout=self.batch_interval))
+        except queue.Empty:
+            return batch
+
+        deadline = time.time() + self.batch_interval
+
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+
+            if remaining <= 0:
+                break
+
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+
+    def reconcile(self):
+        Log().info("running reconciliation sync")
+
+        try:
+            self.monzo_sync.sync()
+        except (Exception, SystemExit) as e:
+            Log().error(f"reconciliation sync failed: {str(e)}")
+
+        self.last_reconcile = time.time()
+
+
+    def worker(self):
+        # the database connection must be created on the thread that uses it
+        self.monzo_sync = MonzoSync()
+
+        while not self.stop_event.is_set() or not self.queue.empty():
+            batch = self.next_batch()
+
+            if len(batch) >0:
+                try:
+                    applied = self.apply_batch(batch)
+
+                    Log().info(f"applied {applied} webhook transaction(s)")
+                except Exception as e:
+                    Log().error(f"failed to apply webhook batch: {str(e)}")
+
+            if self.reconcile_interval and time.time() - self.last_reconcile >= self.reconcile_interval:
+                self.reconcile()
+
+
+    def run(self):
+        worker = threading.Thread(target=self.worker)
+        worker.start()
+
+        server = ThreadingHTTPServer((self.listen, self.port), WebhookRequestHandler)
+        server.receiver = self
+
+        Log().info(f"webhook receiver listening on {self.listen}:{self.port}")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stop_event.set()
+            worker.join()
+
+
+    def replay(self, paths):
+        self.monzo_sync = MonzoSync()
+
+        batch = []
+
+        for path in paths:
+            payloads = json.loads(open(path).read())
+
+            if type(payloads) != list:
+                payloads = [payloads]
+
+            for payload in payloads:
+                batch.append(self.validate(payload))
+
+        return self.apply_batch(batch)
@@ -1,9 +1,10 @@
 import datetime
 from monzo_utils.model.finance import Finance
+from monzo_utils.lib.memoised import memoised
 
 class AmazonPayments(Finance):
 
-    @property
+    @memoised('all_finance_transactions')
     def due_date(self):
         if len(self.all_finance_transactions) == self.payment_config['months']:
             return None
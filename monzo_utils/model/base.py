@@ -198,12 +198,26 @@ class BaseModel:
         return self
 
 
+    def limit(self, limit, offset=None):
+        self.factory()
+
+        DB().limit(limit, offset)
+
+        return self
+
+
     def getall(self):
         self.factory()
 
         return DB().getall()        
 
 
+    def iterate(self):
+        self.factory()
+
+        return DB().iterate()
+
+
     def getone(self):
         self.factory()
 
@@ -1,35 +1,26 @@
 from monzo_utils.lib.config import Config
 from monzo_utils.model.payment import Payment
 from monzo_utils.model.transaction import Transaction
+from monzo_utils.lib.memoised import memoised
 
 class Finance(Payment):
 
-    @property
+    @memoised('last_payment')
     def display_amount(self):
-        if 'display_amount' in self.cache:
-            return self.cache['display_amount']
-
         if 'last_amount_overrides' in self.config and \
             self.payment_config['name'] in self.config['last_amount_overrides'] and \
             self.last_salary_date in self.config['last_amount_overrides'][self.payment_config['name']]:
 
-            self.cache['display_amount'] = self.config['last_amount_overrides'][self.payment_config['name']][self.last_salary_date]
-
-            return self.cache['display_amount']
+            return self.config['last_amount_overrides'][self.payment_config['name']][self.last_salary_date]
 
         if self.last_payment:
-            self.cache['display_amount'] = float(self.last_payment.money_out)
-
-            return self.cache['display_amount']
+            return float(self.last_payment.money_out)
 
         return int(round(self.payment_config['amount'] / self.payment_config['months'], 2) * 100) / 100
 
 
-    @property
+    @memoised()
     def all_finance_transactions(self):
-        if 'all_finance_transactions' in self.cache:
-            return self.cache['all_finance_transactions']
-
         total = int(self.payment_config['amount'] * 100)
 
         if 'round' in self.payment_config and self.payment_config['round'] == 'up':
@@ -57,45 +48,41 @@ class Finance(Payment):
         if final_payment not in amounts:
             amounts.append(final_payment)
 
+        # every payment since the start of the plan is counted, so the sql is
+        # used if it started before the matcher's lookback window
+        if self.matcher and self.matcher.covers(self):
+            if 'single_payment' in self.payment_config and self.payment_config['single_payment']:
+                return self.matcher.find(self, False, 'asc')
+
+            return self.matcher.find(self, amounts, 'asc')
+
         if 'single_payment' in self.payment_config and self.payment_config['single_payment']:
             where, params = self.get_transaction_where_condition(amounts=False)
-
-            self.cache['all_finance_transactions'] = Transaction.find(
-                f"select * from transaction where {where} order by created_at asc",
-                params
-            )
         else:
             where, params = self.get_transaction_where_condition(amounts)
 
-            self.cache['all_finance_transactions'] = Transaction.find(
-                f"select * from transaction where {where} order by created_at asc",
-                params
-            )
-
-        return self.cache['all_finance_transactions']
+        return Transaction.find(
+            f"{self.transaction_select()} where {where} order by created_at asc",
+            params
+        )
 
 
-    @property
+    @memoised('all_finance_transactions')
     def total_paid(self):
-        if 'total_paid' in self.cache:
-            return self.cache['total_paid']
-
         total = 0
 
         for row in self.all_finance_transactions:
             total += row.money_out
 
-        self.cache['total_paid'] = total
-
         return total
 
 
-    @property
+    @memoised('all_finance_transactions')
     def num_paid(self):
         return len(self.all_finance_transactions)
 
 
-    @property
+    @memoised('all_finance_transactions')
     def remaining(self):
         remaining = self.payment_config['amount']
 
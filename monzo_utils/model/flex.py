@@ -1,9 +1,9 @@
 import datetime
-import math
 from monzo_utils.model.payment import Payment
 from monzo_utils.model.account import Account
 from monzo_utils.model.transaction import Transaction
-from monzo_utils.lib.transactions_seen import TransactionsSeen
+from monzo_utils.lib.flex_schedule import FlexSchedule
+from monzo_utils.lib.memoised import memoised
 
 class Flex(Payment):
 
@@ -18,156 +18,53 @@ class Flex(Payment):
         return '- ' + self.payment_config['name']
 
 
-    @property
-    def due_date(self):
-        date_due = self.today + datetime.timedelta(days=1)
-
+    @memoised()
+    def schedule(self):
         if 'start_date' in self.payment_config:
-            date_due = self.payment_config['start_date']
+            start_date = self.payment_config['start_date']
+        else:
+            start_date = self.today + datetime.timedelta(days=1)
 
-        for i in range(0, self.payment_config['months']):
-            while date_due.day != self.config['flex_payment_date']:
-                date_due += datetime.timedelta(days=1)
+        if 'amount' in self.payment_config:
+            amount = self.payment_config['amount']
+        else:
+            amount = None
 
-            if datetime.date(date_due.year, date_due.month, date_due.day) > datetime.date(self.today.year, self.today.month, self.today.day):
-                return datetime.date(date_due.year, date_due.month, date_due.day)
+        return FlexSchedule.get(start_date, self.config['flex_payment_date'], self.payment_config['months'], amount)
 
-            date_due += datetime.timedelta(days=1)
 
-        return None
+    @memoised('schedule')
+    def due_date(self):
+        return self.schedule.due_date(self.today)
 
 
-    @property
+    @memoised('schedule')
     def num_paid(self):
-        date = self.payment_config['start_date']
-        num_paid = 0
+        return self.schedule.num_paid(self.today)
 
-        for i in range(0, self.payment_config['months']):
-            while date.day != self.config['flex_payment_date']:
-                date += datetime.timedelta(days=1)
 
-            if date <= datetime.date(self.today.year, self.today.month, self.today.day):
-                num_paid += 1
-
-            date += datetime.timedelta(days=1)
-
-        return num_paid
-
-
-    @property
+    @memoised('schedule')
     def display_amount(self):
-        date = self.payment_config['start_date']
-
-        total_paid = 0
+        return self.schedule.display_amount(self.today)
 
-        for i in range(0, self.payment_config['months']):
-            amount = int(math.ceil(self.payment_config['amount'] / self.payment_config['months']))
 
-            if total_paid + amount > self.payment_config['amount']:
-                amount = self.payment_config['amount'] - total_paid
-
-            while date.day != self.config['flex_payment_date']:
-                date += datetime.timedelta(days=1)
-
-            if date <= datetime.date(self.today.year, self.today.month, self.today.day):
-                total_paid += amount
-            else:
-                break
-
-            date += datetime.timedelta(days=1)
-
-        return amount
-
-
-    @property
+    @memoised('schedule')
     def remaining(self):
-        date = self.payment_config['start_date']
-
-        total_paid = 0
-
-        for i in range(0, self.payment_config['months']):
-            amount = int(math.ceil(self.payment_config['amount'] / self.payment_config['months']))
-
-            if total_paid + amount > self.payment_config['amount']:
-                amount = self.payment_config['amount'] - total_paid
-
-            while date.day != self.config['flex_payment_date']:
-                date += datetime.timedelta(days=1)
-
-            if date <= datetime.date(self.today.year, self.today.month, self.today.day):
-                total_paid += amount
-            else:
-                break
-
-            date += datetime.timedelta(days=1)
-
-        return self.payment_config['amount'] - total_paid
+        return self.schedule.remaining(self.today)
 
 
     def amount_for_period(self, salary_from_date, salary_to_date):
-        total = self.payment_config['amount']
-
-        date = self.payment_config['start_date']
-
-        if date >= salary_to_date:
-            return 0
-
-        paid = 0
-        found = False
-
-        for i in range(0, self.payment_config['months']):
-            while date.day != self.config['flex_payment_date']:
-                date += datetime.timedelta(days=1)
-
-            amount = int(math.ceil(self.payment_config['amount'] / self.payment_config['months']))
-
-            if paid + amount > total:
-                amount = total - paid
-
-            paid += amount
-
-            if salary_from_date < date:
-                found = True
-                break
-
-            date += datetime.timedelta(days=1)
-
-        if not found:
-            return 0
-
-        return amount
+        return self.schedule.amount_for_period(salary_from_date, salary_to_date)
 
 
     # older last payment, may be before start_date
-    @property
+    @memoised('candidates')
     def older_last_payment(self):
-        if 'older_last_payment' in self.cache:
-            return self.cache['older_last_payment']
-
-        where, params = self.get_transaction_where_condition()
-
-        sql = "select * from transaction"
-
-        if 'metadata' in self.payment_config:
-            for i in range(0, len(self.payment_config['metadata'])):
-                sql += " join transaction_metadata meta%d on transaction.id = meta%d.transaction_id" % (i+1, i+1)
-
-        transactions = Transaction.find(
-            f"{sql} where {where} order by created_at desc",
-            params
-        )
-
-        for transaction in transactions:
-            if transaction.date.day != self.config['flex_payment_date']:
+        for transaction in self.candidates:
+            if transaction.date.day != self.config['flex_payment_date'] or self.is_last_payment(transaction):
                 continue
 
-            if transaction.id not in TransactionsSeen().seen:
-                TransactionsSeen().seen[transaction.id] = 1
-
-                self.cache['older_last_payment'] = transaction
-
-                return self.cache['older_last_payment']
+            if self.claim_registry.claim(transaction.id, self.claim_owner):
+                return transaction
 
-        self.cache['older_last_payment'] = None
-
-        return self.cache['older_last_payment']
+        return None
@@ -3,7 +3,8 @@ import math
 from monzo_utils.model.payment import Payment
 from monzo_utils.model.account import Account
 from monzo_utils.model.transaction import Transaction
-from monzo_utils.lib.transactions_seen import TransactionsSeen
+from monzo_utils.lib.flex_schedule import FlexSchedule
+from monzo_utils.lib.memoised import memoised
 
 class FlexSummary(Payment):
 
@@ -29,7 +30,7 @@ class FlexSummary(Payment):
         return 'Flex Payment'
 
 
-    @property
+    @memoised('last_payment')
     def display_amount(self):
         if self.last_payment:
             return self.last_payment.money_in
@@ -37,30 +38,14 @@ class FlexSummary(Payment):
         return self.flex_total
 
 
-    @property
+    @memoised('last_payment')
     def due_date(self):
-        if 'due_date' in self.cache:
-            return self.cache['due_date']
-
         if self.last_payment:
-            due_date = self.last_payment.date
-
-            while due_date.day != self.config['flex_payment_date']:
-                due_date += datetime.timedelta(days=1)
-
-            due_date += datetime.timedelta(days=1)
-
-            while due_date.day != self.config['flex_payment_date']:
-                due_date += datetime.timedelta(days=1)
-
-            return due_date
+            return FlexSchedule.payment_dates(self.last_payment.date, self.config['flex_payment_date'], 2)[1]
 
         date = datetime.datetime.now() + datetime.timedelta(days=1)
 
-        while date.day != self.config['flex_payment_date']:
-            date += datetime.timedelta(days=1)
-
-        return datetime.date(date.year, date.month, date.day)
+        return FlexSchedule.payment_dates(date, self.config['flex_payment_date'], 1)[0]
 
 
     @property
@@ -68,11 +53,8 @@ class FlexSummary(Payment):
         return self.flex_remaining
 
 
-    @property
+    @memoised()
     def last_payment(self):
-        if 'last_payment' in self.cache:
-            return self.cache['last_payment']
-
         account = Account.one("select * from account where name = %s", [self.config['flex_account']])
 
         transactions_by_diff = {}
@@ -96,41 +78,17 @@ class FlexSummary(Payment):
         else:
             transaction = None
 
-        self.cache['last_payment'] = transaction
-
         return transaction
 
 
     # older last payment, may be before start_date
-    @property
+    @memoised('candidates')
     def older_last_payment(self):
-        if 'older_last_payment' in self.cache:
-            return self.cache['older_last_payment']
-
-        where, params = self.get_transaction_where_condition()
-
-        sql = "select * from transaction"
-
-        if 'metadata' in self.payment_config:
-            for i in range(0, len(self.payment_config['metadata'])):
-                sql += " join transaction_metadata meta%d on transaction.id = meta%d.transaction_id" % (i+1, i+1)
-
-        transactions = Transaction.find(
-            f"{sql} where {where} order by created_at desc",
-            params
-        )
-
-        for transaction in transactions:
-            if transaction.date.day != self.config['flex_payment_date']:
+        for transaction in self.candidates:
+            if transaction.date.day != self.config['flex_payment_date'] or self.is_last_payment(transaction):
                 continue
 
-            if transaction.id not in TransactionsSeen().seen:
-                TransactionsSeen().seen[transaction.id] = 1
-
-                self.cache['older_last_payment'] = transaction
-
-                return self.cache['older_last_payment']
-
-        self.cache['older_last_payment'] = None
+            if self.claim_registry.claim(transaction.id, self.claim_owner):
+                return transaction
 
-        return self.cache['older_last_payment']
+        return None
@@ -5,12 +5,16 @@ from monzo_utils.model.transaction import Transaction
 from monzo_utils.model.provider import Provider
 from monzo_utils.model.account import Account
 from monzo_utils.lib.transactions_seen import TransactionsSeen
-from currency_converter import CurrencyConverter
+from monzo_utils.lib.currency_rates import CurrencyRates
+from monzo_utils.lib.memoised import memoised, invalidate
+from monzo_utils.lib.metadata_pivot import MetadataPivot
 
 class Payment:
 
     transaction_type = 'money_out'
     always_fixed = False
+    matcher = None
+    claims = None
 
     def __init__(self, config, account, payment_list_config, payment_config, last_salary_date, next_salary_date, following_salary_date):
         self.config = config
@@ -26,6 +30,17 @@ class Payment:
         self.cache = {}
 
 
+    # replaces a cached value, dropping anything that was derived from it
+    def set_cached(self, name, value):
+        invalidate(self, name)
+
+        self.cache[name] = value
+
+
+    def invalidate(self, *names):
+        return invalidate(self, *names)
+
+
     def data(self, abbreviate=False):
         if self.num_paid is not None:
             suffix = '%d/%d' % (
@@ -117,7 +132,7 @@ class Payment:
         return self.payment_config['name']
 
 
-    @property
+    @memoised('last_date', 'due_date')
     def status(self):
         if 'start_date' in self.payment_config and self.payment_config['start_date'] >= self.next_salary_date:
             return 'SKIPPED'
@@ -164,14 +179,9 @@ class Payment:
         pass
 
 
-    @property
+    @memoised('status', 'last_payment')
     def display_amount(self):
-        if 'display_amount' in self.cache:
-            return self.cache['display_amount']
-
         if self.status == 'DUE' and 'reserve_amount' in self.payment_config:
-            self.cache['display_amount'] = self.payment_config['reserve_amount']
-
             return self.payment_config['reserve_amount']
 
         today = datetime.datetime.now()
@@ -181,11 +191,7 @@ class Payment:
             self.payment_config['name'] in Config().last_amount_overrides and \
             self.last_salary_date in Config().last_amount_overrides[self.payment_config['name']]:
 
-            amount = Config().last_amount_overrides[self.payment_config['name']][self.last_salary_date]
-
-            self.cache['display_amount'] = amount
-
-            return amount
+            return Config().last_amount_overrides[self.payment_config['name']][self.last_salary_date]
 
         elif 'renewal' in self.payment_config and ((self.payment_config['renewal']['date'] < self.next_salary_date and self.payment_config['renewal']['date'] > self.last_salary_date) or self.status == 'PAID'):
             if 'first_payment' in self.payment_config['renewal'] and self.payment_config['renewal']['date'] >= self.last_salary_date:
@@ -199,8 +205,6 @@ class Payment:
             if self.transaction_type == 'money_in':
                 return 0 - amount
 
-            self.cache['display_amount'] = amount
-
             return amount
         else:
             amount = self.payment_config['amount']
@@ -211,18 +215,14 @@ class Payment:
         if 'currency' in self.payment_config and self.payment_config['currency'] != 'GBP':
             amount = self.convert_currency(amount, self.payment_config['currency'])
 
-        self.cache['display_amount'] = amount
-
         return amount
 
 
     def convert_currency(self, amount, currency):
-        c = CurrencyConverter()
+        return CurrencyRates().convert(amount, currency, 'GBP')
 
-        return c.convert(amount, currency, 'GBP')
 
-
-    @property
+    @memoised('display_amount')
     def next_month_amount(self):
         if 'renewal' not in self.payment_config:
 
@@ -244,33 +244,24 @@ class Payment:
         return amount
 
 
-    @property
+    @memoised('last_payment', 'older_last_payment')
     def last_date(self):
-        if 'last_date' in self.cache:
-            return self.cache['last_date']
-
         if 'last_date_overrides' in self.config and \
             self.payment_config['name'] in self.config['last_date_overrides'] and \
             self.last_salary_date in self.config['last_date_overrides'][self.payment_config['name']]:
 
-            self.cache['last_date'] = self.config['last_date_overrides'][self.payment_config['name']][self.last_salary_date]
-
-            return self.cache['last_date']
+            return self.config['last_date_overrides'][self.payment_config['name']][self.last_salary_date]
 
         if 'desc' not in self.payment_config:
-            self.cache['last_date'] = None
-
-            return self.cache['last_date']
+            return None
 
         if self.last_payment:
-            self.cache['last_date'] = self.last_payment.date
-        else:
-            if self.older_last_payment is not None:
-                self.cache['last_date'] = self.older_last_payment.date
-            else:
-                self.cache['last_date'] = None
+            return self.last_payment.date
 
-        return self.cache['last_date']
+        if self.older_last_payment is not None:
+            return self.older_last_payment.date
+
+        return None
 
 
     def get_transaction_where_condition(self, amounts=True):
@@ -309,12 +300,21 @@ class Payment:
 
             keys = list(sorted(list(self.payment_config['metadata'].keys())))
 
+            pivot = MetadataPivot().enabled()
+
             for i in range(0, len(keys)):
                 if i >0:
                     where += " and "
 
-                where += " meta1.key = %s and meta1.value like %s"
-                params.append(keys[i])
+                if pivot:
+                    expression, expression_params = MetadataPivot().expression(keys[i])
+
+                    where += f" {expression} like %s"
+                    params += expression_params
+                else:
+                    where += " meta1.key = %s and meta1.value like %s"
+                    params.append(keys[i])
+
                 params.append(self.payment_config['metadata'][keys[i]])
 
             where += " ) "
@@ -349,70 +349,87 @@ class Payment:
         return where, params
 
 
-    @property
-    def last_payment(self):
-        if 'last_payment' in self.cache:
-            return self.cache['last_payment']
+    def find_transactions(self):
+        if self.matcher:
+            return self.matcher.find(self)
 
         where, params = self.get_transaction_where_condition()
 
-        sql = "select * from transaction"
+        return Transaction.find(f"{self.transaction_select()} where {where} order by created_at desc", params)
 
-        if 'metadata' in self.payment_config:
-            for i in range(0, len(self.payment_config['metadata'])):
-                sql += " join transaction_metadata meta%d on transaction.id = meta%d.transaction_id" % (i+1, i+1)
 
-        transactions = Transaction.find(f"{sql} where {where} order by created_at desc", params)
+    # the select for the where condition from get_transaction_where_condition,
+    # with the joins that its metadata conditions need
+    def transaction_select(self):
+        if 'metadata' not in self.payment_config:
+            return "select * from transaction"
 
-        for transaction in transactions:
-            if 'start_date' in self.payment_config and transaction.date < self.payment_config['start_date']:
-                continue
+        if MetadataPivot().enabled():
+            return "select `transaction`.* from `transaction` join transaction_metadata_pivot pivot on `transaction`.id = pivot.transaction_id"
 
-            if transaction.id not in TransactionsSeen().seen:
-                TransactionsSeen().seen[transaction.id] = 1
+        sql = "select * from transaction"
+
+        for i in range(0, len(self.payment_config['metadata'])):
+            sql += " join transaction_metadata meta%d on transaction.id = meta%d.transaction_id" % (i+1, i+1)
 
-                self.cache['last_payment'] = transaction
+        return sql
 
-                return self.cache['last_payment']
 
-        self.cache['last_payment'] = None
+    # the registry of the MonzoPayments run, or the process-wide one
+    @property
+    def claim_registry(self):
+        if self.claims is not None:
+            return self.claims
 
-        return self.cache['last_payment']
+        return TransactionsSeen()
 
 
-    # older last payment, may be before start_date
+    # claims are owned by the config entry rather than its name, which needn't
+    # be unique. the entry is the same object when the payment is rebuilt
     @property
-    def older_last_payment(self):
-        if 'older_last_payment' in self.cache:
-            return self.cache['older_last_payment']
+    def claim_owner(self):
+        return id(self.payment_config)
 
-        where, params = self.get_transaction_where_condition()
 
-        sql = "select * from transaction"
+    # the transactions that could be this payment, newest first. these don't
+    # depend on what other payments have claimed
+    @memoised()
+    def candidates(self):
+        return self.find_transactions()
 
-        if 'metadata' in self.payment_config:
-            for i in range(0, len(self.payment_config['metadata'])):
-                sql += " join transaction_metadata meta%d on transaction.id = meta%d.transaction_id" % (i+1, i+1)
 
-        transactions = Transaction.find(
-            f"{sql} where {where} order by created_at desc",
-            params
-        )
+    @memoised('candidates')
+    def last_payment(self):
+        for transaction in self.candidates:
+            if 'start_date' in self.payment_config and transaction.date < self.payment_config['start_date']:
+                continue
+
+            if self.claim_registry.claim(transaction.id, self.claim_owner):
+                return transaction
+
+        return None
+
 
-        for transaction in transactions:
-            if transaction.id not in TransactionsSeen().seen:
-                TransactionsSeen().seen[transaction.id] = 1
+    # the last payment is claimed by this payment too, so it has to be skipped
+    # explicitly when looking for an older one
+    def is_last_payment(self, transaction):
+        return self.cache.get('last_payment') is not None and self.cache['last_payment'].id == transaction.id
 
-                self.cache['older_last_payment'] = transaction
 
-                return self.cache['older_last_payment']
+    # older last payment, may be before start_date
+    @memoised('candidates')
+    def older_last_payment(self):
+        for transaction in self.candidates:
+            if self.is_last_payment(transaction):
+                continue
 
-        self.cache['older_last_payment'] = None
+            if self.claim_registry.claim(transaction.id, self.claim_owner):
+                return transaction
 
-        return self.cache['older_last_payment']
+        return None
 
 
-    @property
+    @memoised('last_date')
     def due_date(self):
         if 'yearly_month' in self.payment_config:
             day = self.last_salary_date
@@ -465,7 +482,7 @@ class Payment:
         return due_date
 
 
-    @property
+    @memoised('due_date')
     def due_next_month(self):
         if 'renew_date' in self.payment_config:
             return self.payment_config['renew_date'] < self.following_salary_date
@@ -2,13 +2,14 @@ import datetime
 import math
 from monzo_utils.model.payment import Payment
 from monzo_utils.model.transaction import Transaction
+from monzo_utils.lib.memoised import memoised
 
 class Refund(Payment):
 
     transaction_type = 'money_in'
     always_fixed = True
 
-    @property
+    @memoised('last_payment', 'due_date')
     def status(self):
         if self.last_payment:
             return 'PAID'
@@ -6,5 +6,6 @@ class Transaction(BaseModel):
     RELATIONSHIPS = {
         'account': ['`transaction`.account_id', 'account.id'],
         'transaction_metadata': ['`transaction`.id', 'transaction_metadata.transaction_id'],
+        'transaction_metadata_pivot': ['`transaction`.id', 'transaction_metadata_pivot.transaction_id'],
         'pot': ['`transaction`.pot_id', 'pot.id']
     }
@@ -0,0 +1,5 @@
+from monzo_utils.model.base import BaseModel
+
+class TransactionSummary(BaseModel):
+
+    pass
@@ -162,6 +162,25 @@ CREATE TABLE `provider` (
 ) ENGINE=InnoDB AUTO_INCREMENT=8 DEFAULT CHARSET=utf8mb3 COLLATE=utf8mb3_unicode_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `search_trigram`
+--
+
+DROP TABLE IF EXISTS `search_trigram`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `search_trigram` (
+  `id` bigint(20) unsigned NOT NULL AUTO_INCREMENT,
+  `record_type` varchar(16) NOT NULL,
+  `record_id` bigint(20) unsigned NOT NULL,
+  `trigram` varchar(3) CHARACTER SET utf8mb3 COLLATE utf8mb3_bin NOT NULL,
+  `trigrams` smallint(5) unsigned NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `search_trigram_posting` (`trigram`,`record_type`,`record_id`,`trigrams`),
+  KEY `search_trigram_record` (`record_type`,`record_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3 COLLATE=utf8mb3_general_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `transaction`
 --
@@ -221,6 +240,52 @@ CREATE TABLE `transaction_metadata` (
   CONSTRAINT `metadata_transaction_id_foreign` FOREIGN KEY (`transaction_id`) REFERENCES `transaction` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=26287 DEFAULT CHARSET=utf8mb3 COLLATE=utf8mb3_general_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `transaction_metadata_pivot`
+--
+
+DROP TABLE IF EXISTS `transaction_metadata_pivot`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `transaction_metadata_pivot` (
+  `id` bigint(20) unsigned NOT NULL AUTO_INCREMENT,
+  `transaction_id` bigint(20) unsigned NOT NULL,
+  `metadata` json NOT NULL,
+  `metadata_mastercard_lifecycle_id` varchar(255) GENERATED ALWAYS AS (json_unquote(json_extract(`metadata`,'$.metadata_mastercard_lifecycle_id'))) STORED,
+  `metadata_external_id` varchar(255) GENERATED ALWAYS AS (json_unquote(json_extract(`metadata`,'$.metadata_external_id'))) STORED,
+  `metadata_pot_id` varchar(255) GENERATED ALWAYS AS (json_unquote(json_extract(`metadata`,'$.metadata_pot_id'))) STORED,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `transaction_metadata_pivot_transaction_id` (`transaction_id`),
+  KEY `transaction_metadata_pivot_mastercard_lifecycle_id` (`metadata_mastercard_lifecycle_id`),
+  KEY `transaction_metadata_pivot_external_id` (`metadata_external_id`),
+  KEY `transaction_metadata_pivot_pot_id` (`metadata_pot_id`),
+  CONSTRAINT `transaction_metadata_pivot_transaction_id_foreign` FOREIGN KEY (`transaction_id`) REFERENCES `transaction` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3 COLLATE=utf8mb3_general_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `transaction_summary`
+--
+
+DROP TABLE IF EXISTS `transaction_summary`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `transaction_summary` (
+  `id` bigint(20) unsigned NOT NULL AUTO_INCREMENT,
+  `account_id` bigint(20) unsigned NOT NULL,
+  `pot_id` bigint(20) unsigned NOT NULL DEFAULT 0,
+  `month` char(7) NOT NULL,
+  `merchant_id` bigint(20) unsigned NOT NULL DEFAULT 0,
+  `pot_transfer` tinyint(1) unsigned NOT NULL DEFAULT 0,
+  `count` int(10) unsigned NOT NULL DEFAULT 0,
+  `money_in` decimal(12,2) NOT NULL DEFAULT 0.00,
+  `money_out` decimal(12,2) NOT NULL DEFAULT 0.00,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `transaction_summary_bucket` (`account_id`,`pot_id`,`month`,`merchant_id`,`pot_transfer`),
+  KEY `transaction_summary_month` (`month`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb3 COLLATE=utf8mb3_general_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
 
 /*!40101 SET SQL_MODE=@OLD_SQL_MODE */;
@@ -110,6 +110,33 @@ CREATE TABLE "transaction_metadata" (
   "value" varchar(255) DEFAULT NULL,
   CONSTRAINT "metadata_transaction_id_foreign" FOREIGN KEY ("transaction_id") REFERENCES "transaction" ("id")
 );
+CREATE TABLE "transaction_metadata_pivot" (
+  "id" integer primary key autoincrement NOT NULL ,
+  "transaction_id" bigint(20)  NOT NULL,
+  "metadata" text NOT NULL,
+  "metadata_mastercard_lifecycle_id" varchar(255) GENERATED ALWAYS AS (json_extract("metadata", '$.metadata_mastercard_lifecycle_id')) VIRTUAL,
+  "metadata_external_id" varchar(255) GENERATED ALWAYS AS (json_extract("metadata", '$.metadata_external_id')) VIRTUAL,
+  "metadata_pot_id" varchar(255) GENERATED ALWAYS AS (json_extract("metadata", '$.metadata_pot_id')) VIRTUAL,
+  CONSTRAINT "metadata_pivot_transaction_id_foreign" FOREIGN KEY ("transaction_id") REFERENCES "transaction" ("id")
+);
+CREATE TABLE "search_trigram" (
+  "id" integer primary key autoincrement NOT NULL ,
+  "record_type" varchar(16) NOT NULL,
+  "record_id" bigint(20)  NOT NULL,
+  "trigram" varchar(3) NOT NULL,
+  "trigrams" smallint(5)  NOT NULL
+);
+CREATE TABLE "transaction_summary" (
+  "id" integer primary key autoincrement NOT NULL ,
+  "account_id" bigint(20)  NOT NULL,
+  "pot_id" bigint(20)  NOT NULL DEFAULT '0',
+  "month" char(7) NOT NULL,
+  "merchant_id" bigint(20)  NOT NULL DEFAULT '0',
+  "pot_transfer" tinyint(1)  NOT NULL DEFAULT '0',
+  "count" integer NOT NULL DEFAULT '0',
+  "money_in" decimal(12,2) NOT NULL DEFAULT '0.00',
+  "money_out" decimal(12,2) NOT NULL DEFAULT '0.00'
+);
 CREATE INDEX "merchant_metadata_merchant_metadata_id_foreign" ON "merchant_metadata" ("merchant_id");
 CREATE INDEX "transaction_metadata_metadata_transaction_id_foreign" ON "transaction_metadata" ("transaction_id");
 CREATE INDEX "transaction_transaction_account_id_foreign" ON "transaction" ("account_id");
@@ -118,4 +145,12 @@ CREATE INDEX "transaction_counterparty_id" ON "transaction" ("counterparty_id");
 CREATE INDEX "account_account_provider_id_foreign" ON "account" ("provider_id");
 CREATE INDEX "pot_pot_account_id_foreign" ON "pot" ("account_id");
 CREATE INDEX "merchant_address_merchant_address_merchant_id" ON "merchant_address" ("merchant_id");
+CREATE UNIQUE INDEX "transaction_metadata_pivot_transaction_id" ON "transaction_metadata_pivot" ("transaction_id");
+CREATE INDEX "transaction_metadata_pivot_mastercard_lifecycle_id" ON "transaction_metadata_pivot" ("metadata_mastercard_lifecycle_id");
+CREATE INDEX "transaction_metadata_pivot_external_id" ON "transaction_metadata_pivot" ("metadata_external_id");
+CREATE INDEX "transaction_metadata_pivot_pot_id" ON "transaction_metadata_pivot" ("metadata_pot_id");
+CREATE UNIQUE INDEX "search_trigram_posting" ON "search_trigram" ("trigram","record_type","record_id","trigrams");
+CREATE INDEX "search_trigram_record" ON "search_trigram" ("record_type","record_id");
+CREATE UNIQUE INDEX "transaction_summary_bucket" ON "transaction_summary" ("account_id","pot_id","month","merchant_id","pot_transfer");
+CREATE INDEX "transaction_summary_month" ON "transaction_summary" ("month");
 END TRANSACTION;
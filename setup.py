@@ -13,7 +13,8 @@ setup(name='monzo-utils',
         'monzo-sync',
         'monzo-status',
         'monzo-search',
-        'monzo-payments'
+        'monzo-payments',
+        'monzo-webhook'
     ],
     install_requires=[
         'mysqlclient==2.1.1',
@@ -421,6 +421,8 @@ class TestAmazonPayments(BaseTest):
 
             mock_due_this_month.return_value = True
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'DUE')
 
 
@@ -455,6 +457,8 @@ class TestAmazonPayments(BaseTest):
 
             p.payment_config['renew_date'] = datetime.date(2024,3,1)
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'SKIPPED')
 
 
@@ -489,6 +493,8 @@ class TestAmazonPayments(BaseTest):
 
             p.payment_config['exclude_months'] = [1]
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'SKIPPED')
 
 
@@ -525,6 +531,8 @@ class TestAmazonPayments(BaseTest):
 
             mock_last_date.return_value = datetime.date(2024,2,1)
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'PAID')
 
 
@@ -561,6 +569,8 @@ class TestAmazonPayments(BaseTest):
 
             mock_due_date.return_value = datetime.date(2024,3,1)
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'SKIPPED')
 
 
@@ -2171,6 +2181,8 @@ class TestAmazonPayments(BaseTest):
 
         p.payment_config['renew_date'] = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -2208,6 +2220,8 @@ class TestAmazonPayments(BaseTest):
 
         p.payment_config['start_date'] = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -2276,6 +2290,8 @@ class TestAmazonPayments(BaseTest):
 
         mock_due_date.return_value = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -403,6 +403,37 @@ class TestBaseModel(BaseTest):
         mock_getall.assert_called_with()
 
 
+    @patch('monzo_utils.lib.db.DB.__init__')
+    @patch('monzo_utils.lib.db.DB.iterate')
+    @patch('monzo_utils.model.base.BaseModel.factory')
+    def test_iterate(self, mock_factory, mock_iterate, mock_init):
+        mock_init.return_value = None
+        mock_iterate.return_value = iter(['data'])
+
+        mp = BaseModel()
+        resp = mp.iterate()
+
+        self.assertEqual(list(resp), ['data'])
+
+        mock_factory.assert_called()
+        mock_iterate.assert_called_with()
+
+
+    @patch('monzo_utils.lib.db.DB.__init__')
+    @patch('monzo_utils.lib.db.DB.limit')
+    @patch('monzo_utils.model.base.BaseModel.factory')
+    def test_limit(self, mock_factory, mock_limit, mock_init):
+        mock_init.return_value = None
+
+        mp = BaseModel()
+        resp = mp.limit(10, 20)
+
+        self.assertEqual(resp, mp)
+
+        mock_factory.assert_called()
+        mock_limit.assert_called_with(10, 20)
+
+
     @patch('monzo_utils.lib.db.DB.__init__')
     @patch('monzo_utils.lib.db.DB.getone')
     @patch('monzo_utils.model.base.BaseModel.factory')
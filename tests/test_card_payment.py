@@ -391,6 +391,8 @@ class TestCardPayment(BaseTest):
 
             mock_due_this_month.return_value = True
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'DUE')
 
 
@@ -422,6 +424,8 @@ class TestCardPayment(BaseTest):
 
             p.payment_config['renew_date'] = datetime.date(2024,3,1)
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'SKIPPED')
 
 
@@ -453,6 +457,8 @@ class TestCardPayment(BaseTest):
 
             p.payment_config['exclude_months'] = [1]
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'SKIPPED')
 
 
@@ -486,6 +492,8 @@ class TestCardPayment(BaseTest):
 
             mock_last_date.return_value = datetime.date(2024,2,1)
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'PAID')
 
 
@@ -519,6 +527,8 @@ class TestCardPayment(BaseTest):
 
             mock_due_date.return_value = datetime.date(2024,3,1)
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'SKIPPED')
 
 
@@ -1921,6 +1931,8 @@ class TestCardPayment(BaseTest):
 
         mock_last_date.return_value = datetime.date(2023,12,28)
 
+        p.invalidate('due_date')
+
         self.assertEqual(p.due_date, datetime.date(2024,1,28))
 
 
@@ -1989,6 +2001,8 @@ class TestCardPayment(BaseTest):
 
         p.payment_config['exclude_months'] = [12]
 
+        p.invalidate('due_date')
+
         self.assertEqual(p.due_date, datetime.date(2024,1,28))
 
 
@@ -2021,6 +2035,8 @@ class TestCardPayment(BaseTest):
 
         p.payment_config['renew_date'] = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -2055,6 +2071,8 @@ class TestCardPayment(BaseTest):
 
         p.payment_config['start_date'] = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -2117,6 +2135,8 @@ class TestCardPayment(BaseTest):
 
         mock_due_date.return_value = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -0,0 +1,46 @@
+from base_test import BaseTest
+from monzo_utils.lib.claim_registry import ClaimRegistry
+from monzo_utils.lib.transactions_seen import TransactionsSeen
+
+class TestClaimRegistry(BaseTest):
+
+    def test_claim(self):
+        claims = ClaimRegistry()
+
+        self.assertFalse(claims.is_claimed(1))
+        self.assertTrue(claims.claim(1, 'Netflix'))
+        self.assertFalse(claims.claim(1, 'Spotify'))
+        self.assertTrue(claims.claim(1, 'Netflix'))
+        self.assertTrue(claims.is_claimed(1))
+        self.assertEqual(claims.owner(1), 'Netflix')
+        self.assertEqual(claims.owner(2), None)
+
+
+    def test_reset(self):
+        claims = ClaimRegistry()
+        claims.claim(1)
+
+        claims.reset()
+
+        self.assertEqual(claims.seen, {})
+        self.assertTrue(claims.claim(1))
+
+
+    def test_registries_are_separate(self):
+        TransactionsSeen().seen = {}
+
+        a = ClaimRegistry()
+        b = ClaimRegistry()
+
+        a.claim(1)
+
+        self.assertTrue(b.claim(1))
+        self.assertEqual(TransactionsSeen().seen, {})
+
+
+    def test_transactions_seen(self):
+        TransactionsSeen().seen = {}
+
+        self.assertTrue(TransactionsSeen().claim(5))
+        self.assertEqual(TransactionsSeen().seen, {5: 1})
+        self.assertFalse(TransactionsSeen().claim(5, 'Netflix'))
@@ -0,0 +1,123 @@
+from base_test import BaseTest
+from unittest.mock import patch
+from monzo_utils.lib.currency_rates import CurrencyRates
+from currency_converter import RateNotFoundError
+import os
+import math
+import datetime
+import tempfile
+import pytest
+
+RATES = """Date,USD,GBP,BGN,
+2024-01-03,1.0919,0.8631,1.9558,
+2024-01-02,1.0956,0.8680,N/A,
+2023-12-29,1.1050,0.8691,,
+"""
+
+class TestCurrencyRates(BaseTest):
+
+    def setUp(self):
+        CurrencyRates._instances = {}
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.currency_file = f"{self.tmpdir.name}/eurofxref-hist.csv"
+
+        with open(self.currency_file, 'w') as f:
+            f.write(RATES)
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_singleton(self):
+        rates = CurrencyRates(None, self.currency_file)
+
+        self.assertEqual(CurrencyRates(), rates)
+        self.assertFalse(rates.loaded)
+
+
+    def test_parse(self):
+        data = CurrencyRates(None, self.currency_file).parse(self.currency_file)
+
+        self.assertEqual(data['currencies'], ['USD', 'GBP', 'BGN'])
+        self.assertEqual(data['dates'], [
+            datetime.date(2023,12,29).toordinal(),
+            datetime.date(2024,1,2).toordinal(),
+            datetime.date(2024,1,3).toordinal()
+        ])
+        self.assertEqual(list(data['rates'])[0:2], [1.1050, 0.8691])
+        self.assertEqual(list(data['rates'])[3:5], [1.0956, 0.8680])
+        self.assertEqual(list(data['rates'])[6:9], [1.0919, 0.8631, 1.9558])
+        self.assertTrue(math.isnan(data['rates'][2]))
+        self.assertTrue(math.isnan(data['rates'][5]))
+
+
+    def test_load(self):
+        rates = CurrencyRates(None, self.currency_file)
+        rates.load()
+
+        self.assertTrue(rates.loaded)
+        self.assertEqual(rates.last_date['BGN'], datetime.date(2024,1,3).toordinal())
+        self.assertEqual(rates.last_date['EUR'], datetime.date(2024,1,3).toordinal())
+
+
+    def test_convert(self):
+        rates = CurrencyRates(None, self.currency_file)
+
+        self.assertEqual(rates.convert(10, 'USD'), 10 / 1.0919 * 0.8631)
+        self.assertEqual(rates.convert(10, 'USD', 'EUR'), 10 / 1.0919)
+        self.assertEqual(rates.convert(10, 'EUR'), 10 * 0.8631)
+        self.assertEqual(rates.convert(10, 'USD', date=datetime.datetime(2024,1,2,12,0,0)), 10 / 1.0956 * 0.8680)
+
+
+    def test_convert_many(self):
+        rates = CurrencyRates(None, self.currency_file)
+
+        self.assertEqual(rates.convert_many([10, 20], 'USD'), [10 / 1.0919 * 0.8631, 20 / 1.0919 * 0.8631])
+
+
+    def test_convert_missing_rate(self):
+        rates = CurrencyRates(None, self.currency_file)
+
+        with pytest.raises(RateNotFoundError):
+            rates.convert(10, 'BGN', date=datetime.date(2024,1,2))
+
+        with pytest.raises(RateNotFoundError):
+            rates.convert(10, 'USD', date=datetime.date(2024,1,1))
+
+        with pytest.raises(ValueError):
+            rates.convert(10, 'XXX')
+
+
+    def test_cache_file(self):
+        cache_file = f"{self.tmpdir.name}/currency_rates.cache"
+
+        CurrencyRates(cache_file, self.currency_file).load()
+
+        self.assertTrue(os.path.exists(cache_file))
+
+        CurrencyRates._instances = {}
+
+        with patch('monzo_utils.lib.currency_rates.CurrencyRates.parse') as mock_parse:
+            rates = CurrencyRates(cache_file, self.currency_file)
+            rates.load()
+
+            mock_parse.assert_not_called()
+
+        self.assertEqual(rates.convert(10, 'USD'), 10 / 1.0919 * 0.8631)
+
+
+    def test_cache_file_stale(self):
+        cache_file = f"{self.tmpdir.name}/currency_rates.cache"
+
+        CurrencyRates(cache_file, self.currency_file).load()
+
+        CurrencyRates._instances = {}
+
+        with open(self.currency_file, 'w') as f:
+            f.write("Date,USD,GBP,\n2024-01-04,1.1,0.9,\n")
+
+        rates = CurrencyRates(cache_file, self.currency_file)
+
+        self.assertEqual(rates.convert(10, 'USD'), 10 / 1.1 * 0.9)
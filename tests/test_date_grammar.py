@@ -0,0 +1,49 @@
+from base_test import BaseTest
+from monzo_utils.lib.date_grammar import DateGrammar
+import datetime
+
+class TestDateGrammar(BaseTest):
+
+    def setUp(self):
+        # a sunday
+        self.now = datetime.datetime(2024,3,31,14,30,0)
+
+
+    def parse(self, value):
+        return DateGrammar().parse(value, self.now)
+
+
+    def test_iso(self):
+        self.assertEqual(self.parse('2023-11-05'), datetime.datetime(2023,11,5))
+        self.assertEqual(self.parse('2023-1-5'), datetime.datetime(2023,1,5))
+        self.assertEqual(self.parse('2023-11-05 09:15'), datetime.datetime(2023,11,5,9,15))
+        self.assertEqual(self.parse('2023-11-05T09:15:30'), datetime.datetime(2023,11,5,9,15,30))
+        self.assertEqual(self.parse('2023-11'), datetime.datetime(2023,11,1))
+        self.assertEqual(self.parse('2023'), datetime.datetime(2023,1,1))
+
+
+    def test_invalid_iso(self):
+        self.assertEqual(self.parse('2023-02-30'), None)
+        self.assertEqual(self.parse('2023-13'), None)
+
+
+    def test_relative(self):
+        self.assertEqual(self.parse('today'), datetime.datetime(2024,3,31))
+        self.assertEqual(self.parse(' Yesterday '), datetime.datetime(2024,3,30))
+        self.assertEqual(self.parse('3 days ago'), datetime.datetime(2024,3,28))
+        self.assertEqual(self.parse('a week ago'), datetime.datetime(2024,3,24))
+        self.assertEqual(self.parse('2 weeks ago'), datetime.datetime(2024,3,17))
+        self.assertEqual(self.parse('1 month ago'), datetime.datetime(2024,2,29))
+        self.assertEqual(self.parse('14 months ago'), datetime.datetime(2023,1,31))
+        self.assertEqual(self.parse('1 year ago'), datetime.datetime(2023,3,31))
+
+
+    def test_weekday(self):
+        self.assertEqual(self.parse('sunday'), datetime.datetime(2024,3,31))
+        self.assertEqual(self.parse('Monday'), datetime.datetime(2024,3,25))
+        self.assertEqual(self.parse('saturday'), datetime.datetime(2024,3,30))
+
+
+    def test_unknown(self):
+        self.assertEqual(self.parse('5th of november'), None)
+        self.assertEqual(self.parse('next tuesday'), None)
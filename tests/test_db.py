@@ -4,6 +4,7 @@ from unittest.mock import MagicMock
 from monzo_utils.lib.config import Config
 from monzo_utils.lib.db import DB
 from monzo_utils.lib.db_driver.mysql import mysql
+from monzo_utils.lib.db_driver.sqlite import sqlite
 import datetime
 
 class TestDB(BaseTest):
@@ -100,6 +101,20 @@ class TestDB(BaseTest):
         self.assertEqual(resp[0]['key3'], 'blah')
 
 
+    @patch('monzo_utils.lib.db.DB.__init__')
+    def test_query_count(self, mock_init):
+        mock_init.return_value = None
+
+        db = DB()
+        db.driver = MagicMock()
+        db.driver.query.return_value = None
+
+        db.query('select * from blah')
+        db.query('select * from blah')
+
+        self.assertEqual(db.query_count, 2)
+
+
     @patch('monzo_utils.lib.db.DB.__init__')
     def test_fix_dates_date(self, mock_init):
         mock_init.return_value = None
@@ -508,6 +523,105 @@ class TestDB(BaseTest):
         mock_query.assert_called_with('select select clause from `mytable`', [123])
 
 
+    @patch('monzo_utils.lib.db.DB.__init__')
+    def test_limit(self, mock_init):
+        mock_init.return_value = None
+
+        db = DB()
+
+        db.find('mytable').orderBy('field', 'desc').limit(10)
+
+        self.assertEqual(db.prepare(), 'select * from `mytable` order by  `field` desc limit 10')
+
+        db.find('mytable').limit(10, 20)
+
+        self.assertEqual(db.prepare(), 'select * from `mytable` limit 10 offset 20')
+
+        db.find('mytable')
+
+        self.assertEqual(db.prepare(), 'select * from `mytable`')
+
+
+    @patch('monzo_utils.lib.db.DB.__init__')
+    @patch('monzo_utils.lib.db.DB.one')
+    def test_getone_limit(self, mock_one, mock_init):
+        mock_init.return_value = None
+
+        db = DB()
+
+        db.find('mytable').limit(1, 5)
+        db.getone()
+
+        mock_one.assert_called_with('select * from `mytable` limit 1 offset 5', [])
+
+
+    @patch('monzo_utils.lib.db.DB.__init__')
+    def test_iterate(self, mock_init):
+        mock_init.return_value = None
+
+        db = DB()
+        db.driver = MagicMock()
+        db.driver.iterate.return_value = iter([
+            {'key1': '2024-01-01'},
+            {'key1': 'blah'}
+        ])
+
+        db.find('mytable').andWhere('where clause', [123])
+
+        rows = db.iterate()
+
+        db.driver.iterate.assert_not_called()
+
+        self.assertEqual(list(rows), [
+            {'key1': datetime.date(2024,1,1)},
+            {'key1': 'blah'}
+        ])
+
+        db.driver.iterate.assert_called_with('select * from `mytable`', [123])
+        self.assertEqual(db.query_count, 1)
+
+
+    def test_sqlite_iterate(self):
+        driver = sqlite({'path': ':memory:'})
+
+        driver.query('create table blah (id integer, name varchar(10))')
+
+        for i in range(0, 5):
+            driver.query('insert into blah (id, name) values (%s, %s)', [i, f"name{i}"])
+
+        rows = driver.iterate('select * from blah where id >= %s order by id', [2], batch_size=2)
+
+        self.assertEqual(next(rows), {'id': 2, 'name': 'name2'})
+
+        # other queries can run while the rows are being consumed
+        self.assertEqual(driver.query('select count(*) as n from blah'), [{'n': 5}])
+
+        self.assertEqual(list(rows), [
+            {'id': 3, 'name': 'name3'},
+            {'id': 4, 'name': 'name4'}
+        ])
+
+
+    @patch('monzo_utils.lib.db.DB.__init__')
+    def test_table_exists(self, mock_init):
+        mock_init.return_value = None
+
+        db = DB()
+        db.columns = {}
+        db.driver = MagicMock()
+        db.driver.get_columns.return_value = []
+
+        self.assertFalse(db.table_exists('mytable'))
+        self.assertNotIn('mytable', db.columns)
+
+        db.driver.get_columns.return_value = ['one', 'two']
+
+        self.assertTrue(db.table_exists('mytable'))
+        self.assertEqual(db.columns['mytable'], ['one', 'two'])
+
+        db.driver.get_columns.assert_called_with('mytable', exclude=['id'])
+
+
     @patch('monzo_utils.lib.db.DB.__init__')
     def test_get_raw_query(self, mock_init):
         mock_init.return_value = None
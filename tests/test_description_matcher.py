@@ -0,0 +1,88 @@
+from base_test import BaseTest
+from unittest.mock import patch
+from monzo_utils.lib.description_matcher import DescriptionMatcher
+import os
+import tempfile
+
+class TestDescriptionMatcher(BaseTest):
+
+    def setUp(self):
+        DescriptionMatcher.cache = {}
+
+
+    def test_add(self):
+        m = DescriptionMatcher()
+
+        self.assertEqual(m.add('Netflix'), 0)
+        self.assertEqual(m.add('TESCO'), 1)
+        self.assertEqual(m.add('netflix'), 0)
+
+        self.assertEqual(m.patterns, ['netflix', 'tesco'])
+        self.assertEqual(m.keywords, {'netflix': [0], 'tesco': [1]})
+        self.assertFalse(m.compiled)
+
+
+    def test_match(self):
+        m = DescriptionMatcher(['netflix', 'flix', 'tesco', 'stores 12'])
+
+        self.assertEqual(m.match('NETFLIX.COM'), frozenset([0, 1]))
+        self.assertEqual(m.match('Tesco Stores 1234'), frozenset([2, 3]))
+        self.assertEqual(m.match('Sainsburys'), frozenset())
+        self.assertEqual(m.match(None), frozenset())
+        self.assertTrue(m.compiled)
+
+
+    def test_match_overlapping(self):
+        m = DescriptionMatcher(['she', 'he', 'hers', 'his'])
+
+        self.assertEqual(m.match('ushers'), frozenset([0, 1, 2]))
+        self.assertEqual(m.match('this'), frozenset([3]))
+
+
+    def test_match_wildcards(self):
+        m = DescriptionMatcher(['tesco%1234', 'net_lix', 'amazon.co', '%', ''])
+
+        self.assertEqual(m.match('Tesco Stores 1234'), frozenset([0, 3, 4]))
+        self.assertEqual(m.match('Tesco Stores 999'), frozenset([3, 4]))
+        self.assertEqual(m.match('netflix'), frozenset([1, 3, 4]))
+        self.assertEqual(m.match('amazonXco'), frozenset([3, 4]))
+        self.assertEqual(m.match('AMAZON.CO.UK'), frozenset([2, 3, 4]))
+
+
+    def test_match_remembers_results(self):
+        m = DescriptionMatcher(['netflix'])
+
+        m.match('NETFLIX.COM')
+
+        self.assertEqual(m.results, {'NETFLIX.COM': frozenset([0])})
+
+        m.add('com')
+
+        self.assertEqual(m.match('NETFLIX.COM'), frozenset([0, 1]))
+
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config_file = f"{tmpdir}/Current.yaml"
+
+            with open(config_file, 'w') as f:
+                f.write("account: Current\n")
+
+            m = DescriptionMatcher.load(config_file, ['netflix'])
+
+            self.assertEqual(DescriptionMatcher.load(config_file, ['tesco']), m)
+            self.assertEqual(m.patterns, ['netflix', 'tesco'])
+
+            os.utime(config_file, (0, 0))
+
+            m2 = DescriptionMatcher.load(config_file, ['tesco'])
+
+            self.assertNotEqual(m2, m)
+            self.assertEqual(m2.patterns, ['tesco'])
+
+
+    def test_load_without_config_file(self):
+        m = DescriptionMatcher.load(None, ['netflix'])
+
+        self.assertEqual(m.patterns, ['netflix'])
+        self.assertEqual(DescriptionMatcher.cache, {})
@@ -0,0 +1,108 @@
+from base_test import BaseTest
+from monzo_utils.lib.fake_monzo_api import FakeMonzoData, FakeMonzoServer
+from monzo.exceptions import MonzoAuthenticationError
+import monzo.endpoints.account
+import monzo.endpoints.pot
+import monzo.endpoints.transaction
+import pytest
+
+class TestFakeMonzoAPI(BaseTest):
+
+    def setUp(self):
+        self.data = FakeMonzoData(accounts=2, pots=2, transactions=150, days=30)
+
+
+    def test_data(self):
+        self.assertEqual(len(self.data.accounts), 2)
+        self.assertEqual(len(self.data.pots[self.data.accounts[0]['id']]), 2)
+        self.assertEqual(len(self.data.transactions[self.data.accounts[0]['id']]), 150)
+
+        pot_transactions = 0
+
+        for pot in self.data.pots[self.data.accounts[0]['id']]:
+            pot_transactions += len(self.data.transactions[pot['pot_account_id']])
+
+        self.assertGreater(pot_transactions, 0)
+
+
+    def test_data_deterministic(self):
+        data = FakeMonzoData(accounts=2, pots=2, transactions=150, days=30)
+
+        account_id = self.data.accounts[0]['id']
+
+        self.assertEqual(
+            [t['amount'] for t in data.transactions[account_id]],
+            [t['amount'] for t in self.data.transactions[account_id]]
+        )
+
+
+    def test_get_transactions_paging(self):
+        account_id = self.data.accounts[0]['id']
+
+        page1 = self.data.get_transactions(account_id, limit=100)
+        page2 = self.data.get_transactions(account_id, since=page1[-1]['id'], limit=100)
+
+        self.assertEqual(len(page1), 100)
+        self.assertEqual(len(page2), 50)
+        self.assertEqual(page1 + page2, self.data.transactions[account_id])
+
+
+    def test_get_transactions_since_date(self):
+        account_id = self.data.accounts[0]['id']
+
+        since = self.data.transactions[account_id][-10]['created']
+
+        transactions = self.data.get_transactions(account_id, since=since)
+
+        self.assertGreaterEqual(len(transactions), 10)
+
+        for transaction in transactions:
+            self.assertGreaterEqual(transaction['created'], since)
+
+
+    def test_get_transactions_unknown_account(self):
+        self.assertEqual(self.data.get_transactions('acc_blah'), None)
+
+
+    def test_server(self):
+        server = FakeMonzoServer(self.data).start()
+
+        try:
+            client = server.client()
+
+            accounts = monzo.endpoints.account.Account.fetch(client)
+
+            self.assertEqual(len(accounts), 2)
+            self.assertEqual(accounts[0].balance.balance, self.data.balances[accounts[0].account_id])
+
+            pots = monzo.endpoints.pot.Pot.fetch(client, account_id=accounts[0].account_id)
+
+            self.assertEqual(len(pots), 2)
+
+            transactions = monzo.endpoints.transaction.Transaction.fetch(client, account_id=accounts[0].account_id, expand=['merchant'], since=accounts[0].created, limit=100)
+
+            self.assertEqual(len(transactions), 100)
+
+            balance = pots[0].balance
+
+            pot = monzo.endpoints.pot.Pot.deposit(client, pot=pots[0], account_id=accounts[0].account_id, amount=100, dedupe_id='blah')
+
+            self.assertEqual(pot.balance, balance + 100)
+            self.assertEqual(self.data.balances[accounts[0].account_id], accounts[0].balance.balance - 100)
+
+            # deposits check the account balance first
+            self.assertEqual(server.requests, 6)
+        finally:
+            server.stop()
+
+
+    def test_server_unauthorised(self):
+        server = FakeMonzoServer(self.data).start()
+
+        try:
+            client = server.client()
+
+            with pytest.raises(MonzoAuthenticationError):
+                client.make_request(path='/accounts', authenticated=False)
+        finally:
+            server.stop()
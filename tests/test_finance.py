@@ -398,6 +398,8 @@ class TestFinance(BaseTest):
 
             mock_due_this_month.return_value = True
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'DUE')
 
 
@@ -430,6 +432,8 @@ class TestFinance(BaseTest):
 
             p.payment_config['renew_date'] = datetime.date(2024,3,1)
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'SKIPPED')
 
 
@@ -462,6 +466,8 @@ class TestFinance(BaseTest):
 
             p.payment_config['exclude_months'] = [1]
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'SKIPPED')
 
 
@@ -496,6 +502,8 @@ class TestFinance(BaseTest):
 
             mock_last_date.return_value = datetime.date(2024,2,1)
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'PAID')
 
 
@@ -530,6 +538,8 @@ class TestFinance(BaseTest):
 
             mock_due_date.return_value = datetime.date(2024,3,1)
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'SKIPPED')
 
 
@@ -1947,6 +1957,8 @@ class TestFinance(BaseTest):
 
         mock_last_date.return_value = datetime.date(2023,12,28)
 
+        p.invalidate('due_date')
+
         self.assertEqual(p.due_date, datetime.date(2024,1,28))
 
 
@@ -2017,6 +2029,8 @@ class TestFinance(BaseTest):
 
         p.payment_config['exclude_months'] = [12]
 
+        p.invalidate('due_date')
+
         self.assertEqual(p.due_date, datetime.date(2024,1,28))
 
 
@@ -2050,6 +2064,8 @@ class TestFinance(BaseTest):
 
         p.payment_config['renew_date'] = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -2085,6 +2101,8 @@ class TestFinance(BaseTest):
 
         p.payment_config['start_date'] = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -2149,6 +2167,8 @@ class TestFinance(BaseTest):
 
         mock_due_date.return_value = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -1773,6 +1773,8 @@ class TestFlex(BaseTest):
 
         p.payment_config['start_date'] = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -1843,6 +1845,8 @@ class TestFlex(BaseTest):
 
         mock_due_date.return_value = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -0,0 +1,108 @@
+from base_test import BaseTest
+from monzo_utils.lib.flex_schedule import FlexSchedule
+import datetime
+
+class TestFlexSchedule(BaseTest):
+
+    def setUp(self):
+        FlexSchedule.cache = {}
+
+
+    def test_payment_dates(self):
+        self.assertEqual(FlexSchedule.payment_dates(datetime.date(2024,1,10), 16, 3), [
+            datetime.date(2024,1,16),
+            datetime.date(2024,2,16),
+            datetime.date(2024,3,16)
+        ])
+
+
+    def test_payment_dates_start_on_payment_day(self):
+        self.assertEqual(FlexSchedule.payment_dates(datetime.date(2024,1,16), 16, 1), [datetime.date(2024,1,16)])
+
+
+    def test_payment_dates_start_after_payment_day(self):
+        self.assertEqual(FlexSchedule.payment_dates(datetime.date(2024,11,20), 16, 3), [
+            datetime.date(2024,12,16),
+            datetime.date(2025,1,16),
+            datetime.date(2025,2,16)
+        ])
+
+
+    def test_payment_dates_skips_short_months(self):
+        self.assertEqual(FlexSchedule.payment_dates(datetime.date(2024,1,31), 31, 3), [
+            datetime.date(2024,1,31),
+            datetime.date(2024,3,31),
+            datetime.date(2024,5,31)
+        ])
+
+        self.assertEqual(FlexSchedule.payment_dates(datetime.datetime(2023,2,1,12,0,0), 29, 2), [
+            datetime.date(2023,3,29),
+            datetime.date(2023,4,29)
+        ])
+
+
+    def test_amounts(self):
+        schedule = FlexSchedule(datetime.date(2024,1,1), 16, 3, 100)
+
+        self.assertEqual(schedule.amounts, [34, 34, 32])
+        self.assertEqual(schedule.paid, [0, 34, 68, 100])
+
+        schedule = FlexSchedule(datetime.date(2024,1,1), 16, 6, 10)
+
+        self.assertEqual(schedule.amounts, [2, 2, 2, 2, 2, 0])
+
+
+    def test_get(self):
+        schedule = FlexSchedule.get(datetime.date(2024,1,1), 16, 3, 100)
+
+        self.assertEqual(FlexSchedule.get(datetime.datetime(2024,1,1,9,0,0), 16, 3, 100), schedule)
+        self.assertNotEqual(FlexSchedule.get(datetime.date(2024,1,1), 16, 3, 101), schedule)
+        self.assertEqual(len(FlexSchedule.cache), 2)
+
+
+    def test_num_paid(self):
+        schedule = FlexSchedule(datetime.date(2024,1,1), 16, 3, 100)
+
+        self.assertEqual(schedule.num_paid(datetime.datetime(2024,1,15,12,0,0)), 0)
+        self.assertEqual(schedule.num_paid(datetime.datetime(2024,1,16,12,0,0)), 1)
+        self.assertEqual(schedule.num_paid(datetime.datetime(2024,3,20,12,0,0)), 3)
+
+
+    def test_due_date(self):
+        schedule = FlexSchedule(datetime.date(2024,1,1), 16, 3, 100)
+
+        self.assertEqual(schedule.due_date(datetime.datetime(2024,1,16,12,0,0)), datetime.date(2024,2,16))
+        self.assertEqual(schedule.due_date(datetime.datetime(2024,3,16,12,0,0)), None)
+
+
+    def test_display_amount(self):
+        schedule = FlexSchedule(datetime.date(2024,1,1), 16, 3, 100)
+
+        self.assertEqual(schedule.display_amount(datetime.datetime(2024,1,1,12,0,0)), 34)
+        self.assertEqual(schedule.display_amount(datetime.datetime(2024,2,16,12,0,0)), 32)
+        self.assertEqual(schedule.display_amount(datetime.datetime(2024,6,1,12,0,0)), 32)
+
+
+    def test_remaining(self):
+        schedule = FlexSchedule(datetime.date(2024,1,1), 16, 3, 100)
+
+        self.assertEqual(schedule.remaining(datetime.datetime(2024,1,1,12,0,0)), 100)
+        self.assertEqual(schedule.remaining(datetime.datetime(2024,2,16,12,0,0)), 32)
+        self.assertEqual(schedule.remaining(datetime.datetime(2024,6,1,12,0,0)), 0)
+
+
+    def test_amount_for_period(self):
+        schedule = FlexSchedule(datetime.date(2024,1,1), 16, 3, 100)
+
+        self.assertEqual(schedule.amount_for_period(datetime.date(2023,12,15), datetime.date(2024,1,1)), 0)
+        self.assertEqual(schedule.amount_for_period(datetime.date(2023,12,15), datetime.date(2024,1,15)), 34)
+        self.assertEqual(schedule.amount_for_period(datetime.date(2024,1,16), datetime.date(2024,2,15)), 34)
+        self.assertEqual(schedule.amount_for_period(datetime.date(2024,2,16), datetime.date(2024,3,15)), 32)
+        self.assertEqual(schedule.amount_for_period(datetime.date(2024,3,16), datetime.date(2024,4,15)), 0)
+
+
+    def test_without_amount(self):
+        schedule = FlexSchedule(datetime.date(2024,1,1), 16, 3, None)
+
+        self.assertEqual(schedule.amounts, [])
+        self.assertEqual(schedule.due_date(datetime.datetime(2024,1,1,12,0,0)), datetime.date(2024,1,16))
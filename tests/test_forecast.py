@@ -0,0 +1,214 @@
+from base_test import BaseTest
+from unittest.mock import MagicMock
+from monzo_utils.lib.forecast import Forecast
+from monzo_utils.lib.flex_schedule import FlexSchedule
+from monzo_utils.model.payment import Payment
+from monzo_utils.model.flex import Flex
+from monzo_utils.model.finance import Finance
+from monzo_utils.model.refund import Refund
+import datetime
+import time
+
+class TestForecast(BaseTest):
+
+    def setUp(self):
+        self.start = datetime.date(2024,1,10)
+
+
+    def payment(self, cls, payment_config, **attributes):
+        payment = MagicMock(spec=cls)
+        payment.payment_config = payment_config
+        payment.last_date = None
+
+        for key in attributes:
+            setattr(payment, key, attributes[key])
+
+        return payment
+
+
+    def test_parse_horizon(self):
+        self.assertEqual(Forecast.parse_horizon('90d', self.start), datetime.date(2024,4,9))
+        self.assertEqual(Forecast.parse_horizon('90', self.start), datetime.date(2024,4,9))
+        self.assertEqual(Forecast.parse_horizon('2w', self.start), datetime.date(2024,1,24))
+        self.assertEqual(Forecast.parse_horizon('12m', self.start), datetime.date(2025,1,10))
+        self.assertEqual(Forecast.parse_horizon('1y', datetime.date(2024,2,29)), datetime.date(2025,2,28))
+
+
+    def test_parse_horizon_invalid(self):
+        with self.assertRaises(ValueError):
+            Forecast.parse_horizon('12x', self.start)
+
+
+    def test_add_months(self):
+        self.assertEqual(Forecast.add_months(datetime.date(2024,1,31), 1), datetime.date(2024,2,29))
+        self.assertEqual(Forecast.add_months(datetime.date(2024,2,29), 1, 31), datetime.date(2024,3,31))
+        self.assertEqual(Forecast.add_months(datetime.date(2024,11,5), 3), datetime.date(2025,2,5))
+
+
+    def test_add(self):
+        f = Forecast(self.start, datetime.date(2024,1,20))
+        f.add_ledger('Current', 100)
+
+        self.assertTrue(f.add('Current', datetime.date(2024,1,1), -10))
+        self.assertTrue(f.add('Current', datetime.date(2024,1,12), -20))
+        self.assertFalse(f.add('Current', datetime.date(2024,1,21), -30))
+
+        self.assertEqual(f.ledgers['Current']['flows'][0], -10)
+        self.assertEqual(f.ledgers['Current']['flows'][2], -20)
+        self.assertEqual(f.balance_on('Current', datetime.date(2024,1,11)), 90)
+        self.assertEqual(f.balances('Current')[-1], 70)
+
+
+    def test_outgoings(self):
+        f = Forecast(self.start, datetime.date(2024,2,10))
+        f.add_ledger('Bills', 50)
+        f.add_ledger('Current', 500)
+
+        f.add('Bills', datetime.date(2024,1,1), -10)
+        f.add('Bills', datetime.date(2024,1,15), -60)
+        f.add('Bills', datetime.date(2024,1,20), 25)
+        f.add('Bills', datetime.date(2024,2,1), -100)
+
+        self.assertEqual(f.outgoings('Bills', self.start, datetime.date(2024,1,29)), 70)
+        self.assertEqual(f.outgoings('Bills', datetime.date(2024,1,29), datetime.date(2024,2,11)), 100)
+        self.assertEqual(f.outgoings('Bills', datetime.date(2024,1,29), datetime.date(2024,2,1)), 0)
+
+        f.transfer('Current', 'Bills', datetime.date(2024,1,29), 90)
+        f.transfer('Current', 'Bills', datetime.date(2024,2,11), 90)
+
+        self.assertEqual(f.balances('Current')[-1], 410)
+        self.assertEqual(f.balances('Bills')[-1], -5)
+
+
+    def test_summary(self):
+        f = Forecast(self.start, datetime.date(2024,2,10))
+        f.add_ledger('Bills', 50)
+
+        f.add('Bills', datetime.date(2024,1,15), -60)
+        f.add('Bills', datetime.date(2024,1,25), 100)
+        f.add('Bills', datetime.date(2024,2,1), -100)
+
+        summary = f.summary()['Bills']
+
+        self.assertEqual(summary['balance'], 50)
+        self.assertEqual(summary['end_balance'], -10)
+        self.assertEqual(summary['minimum_balance'], -10)
+        self.assertEqual(summary['minimum_date'], datetime.date(2024,1,15))
+        self.assertEqual(summary['shortfall_dates'], [datetime.date(2024,1,15), datetime.date(2024,2,1)])
+        self.assertEqual(summary['months'], {
+            '2024-01': {'in': 100, 'out': 60},
+            '2024-02': {'in': 0, 'out': 100}
+        })
+
+
+    def test_monthly_occurrences(self):
+        f = Forecast(self.start, datetime.date(2024,5,10))
+
+        payment = self.payment(Payment, {'amount': 10, 'exclude_months': [3]}, due_date=datetime.date(2024,1,31), display_amount=10, next_month_amount=12)
+
+        self.assertEqual(f.payment_occurrences(payment), [
+            (datetime.date(2024,1,31), 10),
+            (datetime.date(2024,2,29), 12),
+            (datetime.date(2024,4,30), 12)
+        ])
+
+
+    def test_monthly_occurrences_start_date(self):
+        f = Forecast(self.start, datetime.date(2024,4,10))
+
+        payment = self.payment(Payment, {'amount': 10, 'start_date': datetime.date(2024,3,1)}, due_date=None, display_amount=10, next_month_amount=10)
+
+        self.assertEqual(f.payment_occurrences(payment), [
+            (datetime.date(2024,3,1), 10),
+            (datetime.date(2024,4,1), 10)
+        ])
+
+
+    def test_yearly_occurrences(self):
+        f = Forecast(self.start, datetime.date(2026,1,10))
+
+        payment = self.payment(Payment, {'amount': 100, 'yearly_month': 2, 'yearly_day': 29}, due_date=datetime.date(2024,2,29), display_amount=100, next_month_amount=100)
+
+        self.assertEqual(f.payment_occurrences(payment), [
+            (datetime.date(2024,2,29), 100),
+            (datetime.date(2025,2,28), 100)
+        ])
+
+
+    def test_renewal(self):
+        f = Forecast(self.start, datetime.date(2024,5,10))
+
+        payment = self.payment(Payment, {
+            'amount': 10,
+            'renewal': {
+                'date': datetime.date(2024,3,1),
+                'amount': 15,
+                'first_payment': 30
+            }
+        }, due_date=datetime.date(2024,1,15), display_amount=10, next_month_amount=10)
+
+        self.assertEqual(f.payment_occurrences(payment), [
+            (datetime.date(2024,1,15), 10),
+            (datetime.date(2024,2,15), 10),
+            (datetime.date(2024,3,15), 30),
+            (datetime.date(2024,4,15), 15)
+        ])
+
+
+    def test_renew_date(self):
+        f = Forecast(self.start, datetime.date(2024,5,10))
+
+        payment = self.payment(Payment, {'amount': 10, 'renew_date': datetime.date(2024,3,3)}, due_date=datetime.date(2024,3,3), display_amount=10, next_month_amount=10)
+
+        self.assertEqual(f.payment_occurrences(payment), [(datetime.date(2024,3,3), 10)])
+
+
+    def test_finance(self):
+        f = Forecast(self.start, datetime.date(2025,1,10))
+
+        payment = self.payment(Finance, {'amount': 100, 'months': 12}, due_date=datetime.date(2024,1,20), remaining=25, num_paid=10, display_amount=20)
+
+        self.assertEqual(f.payment_occurrences(payment), [
+            (datetime.date(2024,1,20), 20),
+            (datetime.date(2024,2,20), 5)
+        ])
+
+
+    def test_flex(self):
+        f = Forecast(self.start, datetime.date(2025,1,10))
+
+        payment = self.payment(Flex, {'amount': 100, 'months': 3}, schedule=FlexSchedule(datetime.date(2023,12,1), 16, 3, 100))
+
+        self.assertEqual(f.payment_occurrences(payment), [
+            (datetime.date(2024,1,16), 34),
+            (datetime.date(2024,2,16), 32)
+        ])
+
+
+    def test_refund(self):
+        f = Forecast(self.start, datetime.date(2024,5,10))
+
+        payment = self.payment(Refund, {'amount': 20, 'due_after': datetime.date(2024,2,1)}, status='DUE', due_date=None, display_amount=-20)
+
+        self.assertEqual(f.payment_occurrences(payment), [(datetime.date(2024,2,1), -20)])
+
+        payment.status = 'PAID'
+
+        self.assertEqual(f.payment_occurrences(payment), [])
+
+
+    def test_performance(self):
+        start = time.time()
+
+        f = Forecast(self.start, Forecast.parse_horizon('12m', self.start))
+        f.add_ledger('Bills', 1000)
+
+        for i in range(0, 50):
+            payment = self.payment(Payment, {'amount': i}, due_date=datetime.date(2024,1,1 + (i % 28)), display_amount=i, next_month_amount=i)
+
+            for date, amount in f.payment_occurrences(payment):
+                f.add('Bills', date, 0 - amount)
+
+        f.summary()
+
+        self.assertLess(time.time() - start, 1)
@@ -0,0 +1,137 @@
+from base_test import BaseTest
+from unittest.mock import patch
+from monzo_utils.lib.memoised import memoised, invalidate, dependents, MemoStats, MemoisedProperty
+
+class Example:
+
+    def __init__(self):
+        self.cache = {}
+        self.calls = []
+        self.value = 1
+
+
+    @memoised()
+    def base(self):
+        self.calls.append('base')
+
+        return self.value
+
+
+    @memoised('base')
+    def double(self):
+        self.calls.append('double')
+
+        return self.base * 2
+
+
+    @memoised('double')
+    def quad(self):
+        self.calls.append('quad')
+
+        return self.double * 2
+
+
+    @memoised()
+    def other(self):
+        self.calls.append('other')
+
+        return 'other'
+
+
+class TestMemoised(BaseTest):
+
+    def setUp(self):
+        MemoStats().reset()
+
+
+    def test_computed_once(self):
+        e = Example()
+
+        self.assertEqual(e.quad, 4)
+        self.assertEqual(e.quad, 4)
+        self.assertEqual(e.double, 2)
+
+        self.assertEqual(e.calls, ['quad', 'double', 'base'])
+        self.assertEqual(e.cache, {'base': 1, 'double': 2, 'quad': 4})
+
+
+    def test_is_property(self):
+        self.assertIsInstance(Example.quad, property)
+        self.assertIsInstance(Example.quad, MemoisedProperty)
+        self.assertEqual(Example.quad.depends, ('double',))
+
+
+    def test_cached_value(self):
+        e = Example()
+        e.cache['double'] = 10
+
+        self.assertEqual(e.quad, 20)
+        self.assertEqual(e.calls, ['quad'])
+
+
+    def test_dependents(self):
+        self.assertEqual(dependents(Example), {
+            'base': set(['double']),
+            'double': set(['quad']),
+            'quad': set(),
+            'other': set()
+        })
+
+
+    def test_invalidate(self):
+        e = Example()
+
+        e.quad
+        e.other
+
+        self.assertEqual(invalidate(e, 'base'), set(['base', 'double', 'quad']))
+        self.assertEqual(e.cache, {'other': 'other'})
+
+        e.value = 2
+
+        self.assertEqual(e.quad, 8)
+        self.assertEqual(e.calls, ['quad', 'double', 'base', 'other', 'quad', 'double', 'base'])
+
+
+    def test_invalidate_leaf(self):
+        e = Example()
+
+        e.quad
+
+        invalidate(e, 'quad')
+
+        self.assertEqual(e.cache, {'base': 1, 'double': 2})
+
+
+    def test_stats(self):
+        e = Example()
+
+        e.quad
+        e.quad
+        e.double
+
+        self.assertEqual(MemoStats().summary(), {
+            'Example.base': {'hits': 0, 'misses': 1},
+            'Example.double': {'hits': 1, 'misses': 1},
+            'Example.quad': {'hits': 1, 'misses': 1}
+        })
+
+        MemoStats().reset()
+
+        self.assertEqual(MemoStats().summary(), {})
+
+
+    @patch('sys.stderr.write')
+    def test_display(self, mock_write):
+        e = Example()
+
+        e.double
+        e.double
+        e.double
+
+        MemoStats().display()
+
+        self.assertEqual([c[0][0] for c in mock_write.call_args_list], [
+            "Example.base: 0 hits, 1 misses (0% hit rate)\n",
+            "Example.double: 2 hits, 1 misses (67% hit rate)\n"
+        ])
@@ -0,0 +1,140 @@
+from base_test import BaseTest
+from monzo_utils.lib.config import Config
+from monzo_utils.lib.db import DB
+from monzo_utils.lib.metadata_pivot import MetadataPivot
+import os
+import json
+import datetime
+import tempfile
+
+SCHEMA = os.path.realpath(os.path.dirname(__file__) + "/../schema_sqlite3.sql")
+
+class TestMetadataPivot(BaseTest):
+
+    def setUp(self):
+        Config._instances = {}
+        DB._instances = {}
+        MetadataPivot._instances = {}
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        DB({'driver': 'sqlite', 'path': f"{self.tmpdir.name}/data.db"})
+        DB().driver.db.executescript(open(SCHEMA).read())
+
+        DB().query("insert into provider (name) values (%s)", ['Monzo'])
+
+        for name in ['Current', 'Joint']:
+            DB().query("insert into account (provider_id, name, type, account_id, balance, available, active, sortcode, account_no) values (%s, %s, %s, %s, %s, %s, %s, %s, %s)", [1, name, 'uk_retail', name, 0, 0, 1, '', ''])
+
+        for i in range(1, 5):
+            DB().create('transaction', {
+                'id': i,
+                'account_id': 1 if i <4 else 2,
+                'date': '2024-01-15',
+                'type': 'debit',
+                'description': f"TRANSACTION {i}",
+                'money_out': 10,
+                'pending': 0,
+                'created_at': '2024-01-15 12:00:00',
+                'updated_at': '2024-01-15 12:00:00',
+                'declined': 0
+            })
+
+
+    def tearDown(self):
+        DB._instances = {}
+        self.tmpdir.cleanup()
+
+
+    def pivot(self):
+        rows = DB().query("select transaction_id, metadata from transaction_metadata_pivot order by transaction_id")
+
+        return {row['transaction_id']: json.loads(row['metadata']) for row in rows}
+
+
+    def test_enabled(self):
+        self.assertTrue(MetadataPivot().enabled())
+
+        DB().query("drop table transaction_metadata_pivot")
+
+        MetadataPivot._instances = {}
+        DB().columns = {}
+
+        self.assertFalse(MetadataPivot().enabled())
+
+
+    def test_write(self):
+        MetadataPivot().write(1, {'metadata_notes': 'weekly shop', 'metadata_mastercard_lifecycle_id': 'L1', 'metadata_count': 3})
+        MetadataPivot().write(2, {})
+
+        self.assertEqual(self.pivot(), {
+            1: {'metadata_count': '3', 'metadata_mastercard_lifecycle_id': 'L1', 'metadata_notes': 'weekly shop'}
+        })
+
+        MetadataPivot().write(1, {'metadata_notes': 'telly'})
+
+        self.assertEqual(self.pivot(), {1: {'metadata_notes': 'telly'}})
+
+        # transactions that lose their metadata lose their pivot row
+        MetadataPivot().write(1, {})
+
+        self.assertEqual(self.pivot(), {})
+
+
+    def test_write_disabled(self):
+        MetadataPivot().available = False
+
+        MetadataPivot().write(1, {'metadata_notes': 'telly'})
+
+        self.assertEqual(self.pivot(), {})
+
+
+    def test_expression(self):
+        MetadataPivot().write(1, {'metadata_mastercard_lifecycle_id': 'L1', 'metadata_notes': 'weekly shop'})
+        MetadataPivot().write(2, {'metadata_mastercard_lifecycle_id': 'L2', 'metadata_notes': 'telly'})
+
+        self.assertEqual(MetadataPivot().expression('metadata_mastercard_lifecycle_id'), ('pivot.`metadata_mastercard_lifecycle_id`', []))
+
+        for key, value, expected in [
+            ['metadata_mastercard_lifecycle_id', 'L2', [2]],
+            ['metadata_notes', 'weekly%', [1]],
+            ['metadata_missing', '%', []]
+        ]:
+            expression, params = MetadataPivot().expression(key)
+
+            rows = DB().query(f"select transaction_id from transaction_metadata_pivot pivot where {expression} like %s", params + [value])
+
+            self.assertEqual([row['transaction_id'] for row in rows], expected)
+
+
+    def test_load(self):
+        MetadataPivot().write(1, {'metadata_notes': 'weekly shop'})
+        MetadataPivot().write(4, {'metadata_notes': 'telly'})
+
+        self.assertEqual(MetadataPivot().load([1]), {1: {'metadata_notes': 'weekly shop'}})
+        self.assertEqual(MetadataPivot().load([1, 2]), {1: {'metadata_notes': 'weekly shop'}, 4: {'metadata_notes': 'telly'}})
+        self.assertEqual(MetadataPivot().load([]), {})
+
+        self.assertEqual(MetadataPivot().load([1], datetime.date(2024,1,15)), {1: {'metadata_notes': 'weekly shop'}})
+        self.assertEqual(MetadataPivot().load([1], datetime.date(2024,1,16)), {})
+
+
+    def test_rebuild(self):
+        for transaction_id, key, value in [
+            [1, 'metadata_notes', 'weekly shop'],
+            [1, 'metadata_pot_id', 'pot_1'],
+            [3, 'metadata_notes', 'telly']
+        ]:
+            DB().query("insert into transaction_metadata (transaction_id, `key`, value) values (%s, %s, %s)", [transaction_id, key, value])
+
+        MetadataPivot().write(2, {'metadata_notes': 'stale'})
+
+        self.assertEqual(MetadataPivot().rebuild(), 2)
+        self.assertEqual(self.pivot(), {
+            1: {'metadata_notes': 'weekly shop', 'metadata_pot_id': 'pot_1'},
+            3: {'metadata_notes': 'telly'}
+        })
+
+        rows = DB().query("select transaction_id from transaction_metadata_pivot where metadata_pot_id = %s", ['pot_1'])
+
+        self.assertEqual([row['transaction_id'] for row in rows], [1])
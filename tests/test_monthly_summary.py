@@ -0,0 +1,222 @@
+from base_test import BaseTest
+from monzo_utils.lib.config import Config
+from monzo_utils.lib.db import DB
+from monzo_utils.lib.monthly_summary import MonthlySummary
+import os
+import datetime
+import tempfile
+
+SCHEMA = os.path.realpath(os.path.dirname(__file__) + "/../schema_sqlite3.sql")
+
+class TestMonthlySummary(BaseTest):
+
+    def setUp(self):
+        Config._instances = {}
+        DB._instances = {}
+        MonthlySummary._instances = {}
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        DB({'driver': 'sqlite', 'path': f"{self.tmpdir.name}/data.db"})
+        DB().driver.db.executescript(open(SCHEMA).read())
+
+        DB().query("insert into provider (name) values (%s)", ['Monzo'])
+
+        for name in ['Current', 'Joint']:
+            DB().query("insert into account (provider_id, name, type, account_id, balance, available, active, sortcode, account_no) values (%s, %s, %s, %s, %s, %s, %s, %s, %s)", [1, name, 'uk_retail', name, 0, 0, 1, '', ''])
+
+        DB().query("insert into merchant (merchant_id, group_id, name, logo, category, online, atm, disable_feedback) values (%s, %s, %s, %s, %s, %s, %s, %s)", ['m1', 'g1', 'Tesco', '', 'groceries', 0, 0, 0])
+        DB().query("insert into merchant (merchant_id, group_id, name, logo, category, online, atm, disable_feedback) values (%s, %s, %s, %s, %s, %s, %s, %s)", ['m2', 'g2', 'Trainline', '', 'transport', 1, 0, 0])
+
+        self.id = 0
+
+
+    def tearDown(self):
+        DB._instances = {}
+        self.tmpdir.cleanup()
+
+
+    def transaction(self, **attributes):
+        self.id += 1
+
+        row = {
+            'id': self.id,
+            'account_id': 1,
+            'pot_id': None,
+            'date': '2024-01-15',
+            'type': 'debit',
+            'description': 'TESCO',
+            'money_in': None,
+            'money_out': 10,
+            'pending': 0,
+            'created_at': '2024-01-15 12:00:00',
+            'updated_at': '2024-01-15 12:00:00',
+            'merchant_id': 1,
+            'declined': 0
+        }
+
+        row.update(attributes)
+
+        DB().create('transaction', row)
+
+        return row
+
+
+    def add(self, **attributes):
+        row = self.transaction(**attributes)
+
+        MonthlySummary().apply(None, row)
+
+        return row
+
+
+    def buckets(self):
+        rows = DB().query("select account_id, pot_id, month, merchant_id, pot_transfer, count, money_in, money_out from transaction_summary order by account_id, pot_id, month, merchant_id, pot_transfer")
+
+        return [[row[key] for key in row] for row in rows]
+
+
+    def test_enabled(self):
+        self.assertTrue(MonthlySummary().enabled())
+
+        DB().query("drop table transaction_summary")
+
+        MonthlySummary._instances = {}
+        DB().columns = {}
+
+        self.assertFalse(MonthlySummary().enabled())
+
+
+    def test_key(self):
+        row = {'account_id': 1, 'pot_id': None, 'date': datetime.date(2024,1,15), 'merchant_id': None, 'description': 'TESCO', 'declined': 0}
+
+        self.assertEqual(MonthlySummary().key(row), (1, 0, '2024-01', 0, 0))
+
+        row['description'] = 'pot_00001234'
+
+        self.assertEqual(MonthlySummary().key(row), (1, 0, '2024-01', 0, 1))
+
+        row['declined'] = 1
+
+        self.assertEqual(MonthlySummary().key(row), None)
+        self.assertEqual(MonthlySummary().key(None), None)
+
+
+    def test_apply(self):
+        self.add()
+        row = self.add(money_out=5.5)
+        self.add(date='2024-02-01', merchant_id=2, money_out=20)
+        self.add(money_in=100, money_out=None, merchant_id=None, description='SALARY')
+
+        self.assertEqual(self.buckets(), [
+            [1, 0, '2024-01', 0, 0, 1, 100, 0],
+            [1, 0, '2024-01', 1, 0, 2, 0, 15.5],
+            [1, 0, '2024-02', 2, 0, 1, 0, 20]
+        ])
+
+        # an amount changing moves the difference
+        after = dict(row)
+        after['money_out'] = 6
+
+        MonthlySummary().apply(row, after)
+
+        self.assertEqual(self.buckets()[1], [1, 0, '2024-01', 1, 0, 2, 0, 16])
+
+        # a transaction changing month moves between buckets
+        moved = dict(after)
+        moved['date'] = '2024-02-01'
+
+        MonthlySummary().apply(after, moved)
+
+        self.assertEqual(self.buckets(), [
+            [1, 0, '2024-01', 0, 0, 1, 100, 0],
+            [1, 0, '2024-01', 1, 0, 1, 0, 10],
+            [1, 0, '2024-02', 1, 0, 1, 0, 6],
+            [1, 0, '2024-02', 2, 0, 1, 0, 20]
+        ])
+
+        # declined transactions aren't counted and empty buckets are removed
+        declined = dict(moved)
+        declined['declined'] = 1
+
+        MonthlySummary().apply(moved, declined)
+
+        self.assertEqual(len(self.buckets()), 3)
+        self.assertNotIn([1, 0, '2024-02', 1, 0, 1, 0, 6], self.buckets())
+
+
+    def test_add_concurrent(self):
+        self.add()
+
+        # another process adding to the bucket in the meantime isn't lost
+        DB().query("update transaction_summary set count = count + 1, money_out = money_out + 5")
+
+        self.add(money_out=2.5)
+
+        self.assertEqual(self.buckets(), [[1, 0, '2024-01', 1, 0, 3, 0, 17.5]])
+
+        MonthlySummary().add((1, 0, '2024-01', 1, 0), -3, 0, -17.5)
+
+        self.assertEqual(self.buckets(), [])
+
+
+    def test_apply_unchanged(self):
+        row = self.add()
+
+        MonthlySummary().apply(dict(row), dict(row))
+
+        self.assertEqual(self.buckets(), [[1, 0, '2024-01', 1, 0, 1, 0, 10]])
+
+
+    def test_apply_disabled(self):
+        MonthlySummary().available = False
+
+        self.add()
+
+        self.assertEqual(self.buckets(), [])
+
+
+    def test_rebuild(self):
+        self.add()
+        self.add(pot_id=3, money_out=2)
+        self.add(date='2023-12-31', account_id=2, money_out=7)
+        self.add(description='pot_00001', merchant_id=None, money_out=50)
+        self.transaction(declined=1, money_out=99)
+
+        incremental = self.buckets()
+
+        DB().query("delete from transaction_summary")
+
+        self.assertEqual(MonthlySummary().rebuild(), 4)
+        self.assertEqual(self.buckets(), incremental)
+
+
+    def test_summarise(self):
+        self.add()
+        self.add(date='2024-02-01', merchant_id=2, money_out=20)
+        self.add(date='2024-02-03', money_out=5)
+        self.add(date='2024-02-03', description='pot_00001', merchant_id=None, money_out=50)
+        self.add(date='2024-03-01', account_id=2, money_out=30)
+
+        rows = MonthlySummary().summarise('month')
+
+        self.assertEqual([[row['month'], row['count'], row['money_out']] for row in rows], [
+            ['2024-01', 1, 10],
+            ['2024-02', 2, 25],
+            ['2024-03', 1, 30]
+        ])
+
+        rows = MonthlySummary().summarise('month', month_from='2024-02', month_to='2024-02', include_pots=True)
+
+        self.assertEqual([[row['month'], row['count'], row['money_out']] for row in rows], [['2024-02', 3, 75]])
+
+        rows = MonthlySummary().summarise('merchant', exclude_accounts=['Joint'])
+
+        self.assertEqual([[row['merchant'], row['count'], row['money_out']] for row in rows], [
+            ['Tesco', 2, 15],
+            ['Trainline', 1, 20]
+        ])
+
+        rows = MonthlySummary().summarise('category', merchant='train')
+
+        self.assertEqual([[row['category'], row['count'], row['money_out']] for row in rows], [['transport', 1, 20]])
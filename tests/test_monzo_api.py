@@ -4,13 +4,17 @@ from unittest.mock import MagicMock
 from unittest.mock import PropertyMock
 from monzo_utils.lib.db import DB
 from monzo_utils.lib.config import Config
-from monzo_utils.lib.monzo_api import MonzoAPI
+from monzo_utils.lib.monzo_api import MonzoAPI, MonzoClient, MonzoAPIError
+from monzo_utils.lib.request_scheduler import RequestScheduler
+from monzo_utils.lib.token_store import TokenStore
 from monzo_utils.model.pot import Pot
 from monzo.exceptions import MonzoAuthenticationError, MonzoServerError, MonzoHTTPError, MonzoPermissionsError
 import pytest
 import os
 import pwd
+import time
 import datetime
+import tempfile
 from freezegun import freeze_time
 
 class TestMonzoAPI(BaseTest):
@@ -18,6 +22,7 @@ class TestMonzoAPI(BaseTest):
     def setUp(self):
         Config._instances = {}
         DB._instances = {}
+        RequestScheduler._instances = {}
 
         if 'NO_AUTH' in os.environ:
             os.environ.pop('NO_AUTH')
@@ -28,16 +33,31 @@ class TestMonzoAPI(BaseTest):
     def test_constructor(self, mock_get_client, mock_load_tokens):
         mock_get_client.return_value = 'client'
 
+        Config._instances[Config] = Config({'rate_limits': {'concurrency': 2}})
+
         api = MonzoAPI()
 
         homedir = pwd.getpwuid(os.getuid()).pw_dir
 
         self.assertEqual(api.token_file, f"{homedir}/.monzo/tokens")
         self.assertEqual(api.client, 'client')
+        self.assertEqual(api.scheduler.semaphore._initial_value, 2)
 
         mock_load_tokens.assert_called()
 
 
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.load_tokens')
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.get_client')
+    def test_constructor_existing_scheduler(self, mock_get_client, mock_load_tokens):
+        RequestScheduler()
+
+        Config._instances[Config] = Config({'rate_limits': {'concurrency': 2}})
+
+        api = MonzoAPI()
+
+        self.assertEqual(api.scheduler.semaphore._initial_value, 2)
+
+
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.__init__')
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.authenticate')
     @patch('os.path.exists')
@@ -145,10 +165,17 @@ class TestMonzoAPI(BaseTest):
         mock_set_file_contents.assert_called_with('/tmp/blah', '{"access_token": "access token 123", "expiry": "access_token_expiry 123", "refresh_token": "refresh_token 123"}')
 
 
-    @patch('monzo_utils.lib.monzo_api.MonzoAPI.__init__')
+    def get_api(self, tmpdir):
+        client = MagicMock()
+        client.access_token = 'access token'
+        client.access_token_expiry = 'access token expiry'
+        client.refresh_token = 'refresh token'
+
+        return MonzoAPI(client=client, config_path=tmpdir)
+
+
     @patch('monzo.authentication.Authentication.__init__')
-    def test_get_client(self, mock_init_auth, mock_init):
-        mock_init.return_value = None
+    def test_get_client(self, mock_init_auth):
         mock_init_auth.return_value = None
 
         config = Config({
@@ -159,11 +186,12 @@ class TestMonzoAPI(BaseTest):
 
         Config._instances[Config] = config
 
-        api = MonzoAPI()
-        api.access_token = 'access token'
-        api.access_token_expiry = 'access token expiry'
-        api.refresh_token = 'refresh token'
-        api.get_client()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            api = self.get_api(tmpdir)
+
+            client = api.get_client()
+
+            self.assertEqual(client.token_store, TokenStore.get(f"{tmpdir}/tokens"))
 
         mock_init_auth.assert_called_with(
             client_id='test',
@@ -175,6 +203,125 @@ class TestMonzoAPI(BaseTest):
         )
 
 
+    def test_get_client_api_url(self):
+        Config._instances[Config] = Config({
+            'client_id': 'test',
+            'client_secret': 'test',
+            'redirect_url': 'test',
+            'api_url': 'http://127.0.0.1:8080'
+        })
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            api = self.get_api(tmpdir)
+            api.access_token_expiry = 0
+
+            client = api.get_client()
+
+        self.assertIsInstance(client, MonzoClient)
+        self.assertEqual(client.api_url, 'http://127.0.0.1:8080')
+
+
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.__init__')
+    def test_token_store_without_token_file(self, mock_init):
+        mock_init.return_value = None
+
+        self.assertEqual(MonzoAPI().token_store, None)
+
+
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.load_tokens')
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.get_client')
+    def test_constructor_with_client(self, mock_get_client, mock_load_tokens):
+        Config._instances[Config] = Config({'client_id': 'test'})
+
+        client = MagicMock()
+        client.access_token = 'access token'
+        client.access_token_expiry = 123
+        client.refresh_token = 'refresh token'
+
+        api = MonzoAPI(client)
+
+        self.assertEqual(api.client, client)
+        self.assertEqual(api.access_token, 'access token')
+        self.assertEqual(api.access_token_expiry, 123)
+        self.assertEqual(api.refresh_token, 'refresh token')
+
+        mock_load_tokens.assert_not_called()
+        mock_get_client.assert_not_called()
+
+
+    def get_refresh_client(self, token_store):
+        return MonzoClient(
+            token_store=token_store,
+            client_id='test',
+            client_secret='test',
+            redirect_url='test',
+            access_token='old access token',
+            access_token_expiry=int(time.time()) - 10,
+            refresh_token='old refresh token'
+        )
+
+
+    @patch('monzo_utils.lib.monzo_api.MonzoClient.refresh_tokens')
+    def test_client_refresh_access(self, mock_refresh_tokens):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            token_store = TokenStore(f"{tmpdir}/tokens")
+            token_store.save({'access_token': 'old access token', 'expiry': int(time.time()) - 10, 'refresh_token': 'old refresh token'})
+
+            client = self.get_refresh_client(token_store)
+
+            def refresh():
+                client.use_tokens({'access_token': 'new access token', 'expiry': int(time.time()) + 3600, 'refresh_token': 'new refresh token'})
+
+            mock_refresh_tokens.side_effect = refresh
+
+            client.refresh_access()
+
+            mock_refresh_tokens.assert_called()
+
+            self.assertEqual(TokenStore(f"{tmpdir}/tokens").load()['access_token'], 'new access token')
+
+
+    @patch('monzo_utils.lib.monzo_api.MonzoClient.refresh_tokens')
+    def test_client_refresh_access_refreshed_elsewhere(self, mock_refresh_tokens):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            token_store = TokenStore(f"{tmpdir}/tokens")
+            token_store.save({'access_token': 'new access token', 'expiry': int(time.time()) + 3600, 'refresh_token': 'new refresh token'})
+
+            client = self.get_refresh_client(token_store)
+            client.refresh_access()
+
+            mock_refresh_tokens.assert_not_called()
+
+            self.assertEqual(client.access_token, 'new access token')
+            self.assertEqual(client.refresh_token, 'new refresh token')
+
+
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.__init__')
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.get_client')
+    def test_reload_tokens(self, mock_get_client, mock_init):
+        mock_init.return_value = None
+        mock_get_client.return_value = 'new client'
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            api = MonzoAPI()
+            api.token_file = f"{tmpdir}/tokens"
+            api.client = MagicMock()
+            api.client.access_token = 'old access token'
+
+            self.assertFalse(api.reload_tokens())
+
+            api.token_store.save({'access_token': 'old access token', 'expiry': 123, 'refresh_token': 'refresh token'})
+
+            self.assertFalse(api.reload_tokens())
+
+            api.token_store.save({'access_token': 'new access token', 'expiry': 456, 'refresh_token': 'new refresh token'})
+
+            self.assertTrue(api.reload_tokens())
+            self.assertEqual(api.access_token, 'new access token')
+            self.assertEqual(api.access_token_expiry, 456)
+            self.assertEqual(api.client, 'new client')
+
+
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.__init__')
     @patch('monzo.endpoints.account.Account.fetch')
     def test_account(self, mock_fetch, mock_init):
@@ -250,9 +397,11 @@ class TestMonzoAPI(BaseTest):
 
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.__init__')
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.authenticate')
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.reload_tokens')
     @patch('monzo.endpoints.account.Account.fetch', new=raise_MonzoAuthenticationError)
-    def test_accounts_auth_error(self, mock_auth, mock_init):
+    def test_accounts_auth_error(self, mock_reload_tokens, mock_auth, mock_init):
         mock_init.return_value = None
+        mock_reload_tokens.return_value = False
 
         api = MonzoAPI()
         api.client = 'client'
@@ -260,6 +409,26 @@ class TestMonzoAPI(BaseTest):
         with pytest.raises(SystemExit) as e:
             api.accounts()
 
+        mock_auth.assert_called()
+
+
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.__init__')
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.authenticate')
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.update_tokens')
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.reload_tokens')
+    @patch('monzo.endpoints.account.Account.fetch')
+    def test_accounts_auth_error_tokens_refreshed_elsewhere(self, mock_fetch, mock_reload_tokens, mock_update_tokens, mock_auth, mock_init):
+        mock_init.return_value = None
+        mock_reload_tokens.return_value = True
+        mock_fetch.side_effect = [MonzoAuthenticationError('error'), ['returned accounts']]
+
+        api = MonzoAPI()
+        api.client = 'client'
+
+        self.assertEqual(api.accounts(), ['returned accounts'])
+
+        mock_auth.assert_not_called()
+
 
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.__init__')
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.authenticate')
@@ -271,9 +440,11 @@ class TestMonzoAPI(BaseTest):
         api = MonzoAPI()
         api.client = 'client'
 
-        with pytest.raises(SystemExit) as e:
+        with pytest.raises(MonzoAPIError) as e:
             api.accounts()
 
+        self.assertEqual(mock_sleep.call_count, 4)
+
 
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.__init__')
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.save_tokens')
@@ -386,6 +557,21 @@ class TestMonzoAPI(BaseTest):
         self.assertIsInstance(args_1['since'], datetime.datetime)
 
 
+    @patch('monzo.endpoints.transaction.Transaction.fetch')
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.__init__')
+    @patch('time.sleep')
+    def test_transactions_paginated(self, mock_sleep, mock_init, mock_fetch):
+        mock_init.return_value = None
+
+        mock_fetch.return_value = ['transaction']
+
+        api = MonzoAPI()
+        api.client = 'client'
+        api.transactions(123, since='tx_123', limit=100)
+
+        mock_fetch.assert_called_with('client', account_id=123, expand=['merchant'], since='tx_123', limit=100)
+
+
     def raise_MonzoPermissionsError(self, *args, **kwargs):
         raise MonzoPermissionsError("error")
 
@@ -456,8 +642,10 @@ class TestMonzoAPI(BaseTest):
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.authenticate')
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.get_client')
     @patch('monzo.endpoints.pot.Pot.fetch', new=raise_MonzoAuthenticationError)
-    def test_pots_auth_error(self, mock_get_client, mock_auth, mock_init):
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.reload_tokens')
+    def test_pots_auth_error(self, mock_reload_tokens, mock_get_client, mock_auth, mock_init):
         mock_init.return_value = None
+        mock_reload_tokens.return_value = False
 
         api = MonzoAPI()
         api.client = 'client'
@@ -477,16 +665,16 @@ class TestMonzoAPI(BaseTest):
         api = MonzoAPI()
         api.client = 'client'
 
-        with pytest.raises(SystemExit) as e:
+        with pytest.raises(MonzoAPIError) as e:
             api.pots(account_id=123)
 
 
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.__init__')
-    @patch('monzo_utils.lib.monzo_api.MonzoAPI.load_tokens')
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.reload_tokens')
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.get_client')
     @patch('monzo.endpoints.pot.Pot.fetch_single')
     @patch('monzo.endpoints.pot.Pot.withdraw')
-    def test_withdraw_from_pot_success(self, mock_withdraw, mock_fetch_single, mock_get_client, mock_load_tokens, mock_init):
+    def test_withdraw_from_pot_success(self, mock_withdraw, mock_fetch_single, mock_get_client, mock_reload_tokens, mock_init):
         mock_init.return_value = None
         mock_get_client.return_value = 'client'
 
@@ -497,26 +685,27 @@ class TestMonzoAPI(BaseTest):
         mock_fetch_single.return_value = pot
 
         api = MonzoAPI()
+        api.client = 'client'
 
         with freeze_time("2024-01-01"):
             resp = api.withdraw_from_pot(123, pot, 10010)
 
         self.assertEqual(resp, True)
 
-        mock_load_tokens.assert_called()
-        mock_get_client.assert_called()
+        mock_reload_tokens.assert_called()
+        mock_get_client.assert_not_called()
         mock_fetch_single.assert_called_with('client', account_id=123, pot_id=324142)
 
         mock_withdraw.assert_called_with('client', pot=pot, account_id=123, amount=1001000, dedupe_id='324142_2024010100')
 
 
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.__init__')
-    @patch('monzo_utils.lib.monzo_api.MonzoAPI.load_tokens')
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.reload_tokens')
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.get_client')
     @patch('monzo.endpoints.pot.Pot.fetch_single')
     @patch('monzo.endpoints.pot.Pot.withdraw', new=raise_Exception)
     @patch('time.sleep')
-    def test_withdraw_from_pot_exception(self, mock_sleep, mock_fetch_single, mock_get_client, mock_load_tokens, mock_init):
+    def test_withdraw_from_pot_exception(self, mock_sleep, mock_fetch_single, mock_get_client, mock_reload_tokens, mock_init):
         mock_init.return_value = None
         mock_get_client.return_value = 'client'
 
@@ -527,23 +716,24 @@ class TestMonzoAPI(BaseTest):
         mock_fetch_single.return_value = pot
 
         api = MonzoAPI()
+        api.client = 'client'
 
         with freeze_time("2024-01-01"):
             resp = api.withdraw_from_pot(123, pot, 10010)
 
         self.assertEqual(resp, False)
 
-        mock_load_tokens.assert_called()
-        mock_get_client.assert_called()
+        mock_reload_tokens.assert_called()
+        mock_get_client.assert_not_called()
         mock_fetch_single.assert_called_with('client', account_id=123, pot_id=324142)
 
 
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.__init__')
-    @patch('monzo_utils.lib.monzo_api.MonzoAPI.load_tokens')
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.reload_tokens')
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.get_client')
     @patch('monzo.endpoints.pot.Pot.fetch_single')
     @patch('monzo.endpoints.pot.Pot.deposit')
-    def test_deposit_to_pot_success(self, mock_withdraw, mock_fetch_single, mock_get_client, mock_load_tokens, mock_init):
+    def test_deposit_to_pot_success(self, mock_withdraw, mock_fetch_single, mock_get_client, mock_reload_tokens, mock_init):
         mock_init.return_value = None
         mock_get_client.return_value = 'client'
 
@@ -554,26 +744,27 @@ class TestMonzoAPI(BaseTest):
         mock_fetch_single.return_value = pot
 
         api = MonzoAPI()
+        api.client = 'client'
 
         with freeze_time("2024-01-01"):
             resp = api.deposit_to_pot(123, pot, 10010)
 
         self.assertEqual(resp, True)
 
-        mock_load_tokens.assert_called()
-        mock_get_client.assert_called()
+        mock_reload_tokens.assert_called()
+        mock_get_client.assert_not_called()
         mock_fetch_single.assert_called_with('client', account_id=123, pot_id=324142)
 
         mock_withdraw.assert_called_with('client', pot=pot, account_id=123, amount=1001000, dedupe_id='324142_2024010100')
 
 
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.__init__')
-    @patch('monzo_utils.lib.monzo_api.MonzoAPI.load_tokens')
+    @patch('monzo_utils.lib.monzo_api.MonzoAPI.reload_tokens')
     @patch('monzo_utils.lib.monzo_api.MonzoAPI.get_client')
     @patch('monzo.endpoints.pot.Pot.fetch_single')
     @patch('monzo.endpoints.pot.Pot.deposit', new=raise_Exception)
     @patch('time.sleep')
-    def test_deposit_to_pot_exception(self, mock_sleep, mock_fetch_single, mock_get_client, mock_load_tokens, mock_init):
+    def test_deposit_to_pot_exception(self, mock_sleep, mock_fetch_single, mock_get_client, mock_reload_tokens, mock_init):
         mock_init.return_value = None
         mock_get_client.return_value = 'client'
 
@@ -584,12 +775,13 @@ class TestMonzoAPI(BaseTest):
         mock_fetch_single.return_value = pot
 
         api = MonzoAPI()
+        api.client = 'client'
 
         with freeze_time("2024-01-01"):
             resp = api.deposit_to_pot(123, pot, 10010)
 
         self.assertEqual(resp, False)
 
-        mock_load_tokens.assert_called()
-        mock_get_client.assert_called()
+        mock_reload_tokens.assert_called()
+        mock_get_client.assert_not_called()
         mock_fetch_single.assert_called_with('client', account_id=123, pot_id=324142)
@@ -7,6 +7,7 @@ from unittest.mock import MagicMock
 from monzo_utils.lib.singleton import Singleton
 from monzo_utils.lib.db import DB
 from monzo_utils.lib.config import Config
+from monzo_utils.lib.monzo_api import MonzoAPIError
 from monzo_utils.model.account import Account
 from monzo_utils.model.pot import Pot
 from monzo_utils.model.card_payment import CardPayment
@@ -24,6 +25,8 @@ import json
 import pytest
 import datetime
 import decimal
+import tempfile
+import yaml
 
 class TestMonzoPayments(BaseTest):
 
@@ -89,6 +92,23 @@ class TestMonzoPayments(BaseTest):
             mp = MonzoPayments('Current')
 
 
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.load_config')
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.validate_config')
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.get_db')
+    def test_constructor_shared_lookups(self, mock_get_db, mock_validate_config, mock_load_config):
+        mock_load_config.return_value = self.config
+
+        provider = Provider({'id': 1, 'name': 'Monzo'})
+        account = Account({'id': 2, 'provider_id': 1, 'name': 'Current'})
+
+        mp = MonzoPayments('Current', provider=provider, accounts={'Current': account})
+
+        self.assertEqual(mp.provider, provider)
+        self.assertEqual(mp.account, account)
+
+        self.db.one.assert_not_called()
+
+
     @patch('monzo_utils.lib.monzo_payments.MonzoPayments.__init__')
     @patch('os.path.exists')
     @patch('os.mkdir')
@@ -191,6 +211,72 @@ class TestMonzoPayments(BaseTest):
         self.assertEqual(config, {'account': 'AccountName'})
 
 
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.__init__')
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.compiled_config_file')
+    def test_load_config_compiled(self, mock_compiled_config_file, mock_mp):
+        mock_mp.return_value = None
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config_file = f"{tmpdir}/Current.yaml"
+            mock_compiled_config_file.return_value = f"{tmpdir}/Current.yaml.compiled"
+
+            with open(config_file, 'w') as f:
+                f.write(yaml.dump({
+                    'account': 'Current',
+                    'salary_description': 'ACME',
+                    'salary_payment_day': 15,
+                    'payments': [{'type': 'Direct Debit', 'payments': [{'name': 'Gym', 'desc': 'GYM', 'amount': 30}]}]
+                }))
+
+            mp = MonzoPayments()
+            mp.account_name = config_file
+            mp.config = mp.load_config()
+
+            self.assertEqual(mp.compiled, None)
+
+            mp.validate_config()
+
+            self.assertEqual(mp.compiled.patterns, ['ACME', 'GYM'])
+            self.assertTrue(os.path.exists(f"{tmpdir}/Current.yaml.compiled"))
+
+            mp = MonzoPayments()
+            mp.account_name = config_file
+
+            with patch('yaml.safe_load') as mock_yaml_load:
+                mp.config = mp.load_config()
+
+                mock_yaml_load.assert_not_called()
+
+            self.assertEqual(mp.account_name, 'Current')
+            self.assertEqual(mp.config['payments'][0]['payments'][0]['name'], 'Gym')
+            self.assertEqual(mp.description_patterns(), ['ACME', 'GYM'])
+
+            # already validated when it was compiled
+            with patch('monzo_utils.lib.payments_config.PaymentsConfig.compile') as mock_compile:
+                mp.validate_config()
+
+                mock_compile.assert_not_called()
+
+
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.__init__')
+    @patch('sys.stderr.write')
+    def test_validate_config_invalid(self, mock_write, mock_mp):
+        mock_mp.return_value = None
+
+        mp = MonzoPayments()
+        mp.config_file = '/path/to/configfile.yaml'
+        mp.config = {
+            'payments': [{'type': 'Cheque', 'payments': [{'name': 'Rent'}]}],
+            'salary_description': 1,
+            'salary_payment_day': 1
+        }
+
+        with pytest.raises(SystemExit) as e:
+            mp.validate_config()
+
+        mock_write.assert_called_with('Invalid config: unknown payment type: Cheque\n')
+
+
     @patch('monzo_utils.lib.monzo_payments.MonzoPayments.__init__')
     @patch('sys.stderr.write')
     def test_validate_config_required_keys(self, mock_write, mock_mp):
@@ -767,6 +853,31 @@ class TestMonzoPayments(BaseTest):
         mock_sync.assert_called()
 
 
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.__init__')
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.sync')
+    @patch('monzo_utils.lib.log.Log.error')
+    def test_sync_account(self, mock_log_error, mock_sync, mock_init_sync, mock_mp):
+        mock_mp.return_value = None
+        mock_init_sync.return_value = None
+
+        mp = MonzoPayments()
+        mp.account_name = 'Current'
+        mp.account = Account({'id': 1})
+
+        mp.sync_account()
+
+        mock_sync.assert_called_once_with(3, mp.account)
+        mock_log_error.assert_not_called()
+
+        # the transfer has already happened so an api failure is logged
+        mock_sync.side_effect = MonzoAPIError("failed to retrieve accounts")
+
+        mp.sync_account()
+
+        mock_log_error.assert_called_once_with("failed to sync Current after moving money: failed to retrieve accounts")
+
+
     @patch('monzo_utils.lib.monzo_payments.MonzoPayments.__init__')
     @patch('monzo_utils.model.flex_summary.FlexSummary.display')
     @patch('monzo_utils.lib.monzo_payments.MonzoPayments.get_payments')
@@ -3685,6 +3796,61 @@ class TestMonzoPayments(BaseTest):
         mock_last_salary_transaction.assert_called_with(description='SALARY', salary_minimum=1000, salary_payment_day=1)
 
 
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.__init__')
+    @patch('monzo_utils.model.account.Account.last_salary_transaction')
+    def test_get_last_salary_date_with_matcher(self, mock_last_salary_transaction, mock_mp):
+        mock_mp.return_value = None
+
+        mp = MonzoPayments()
+        mp.account = Account({'id':1,'name':'test'})
+        mp.account_name = 'Current'
+        mp.matcher = MagicMock()
+        mp.matcher.last_salary_transaction.return_value = {
+            'date': datetime.date(2024,1,1)
+        }
+        mp.config = {
+            'salary_description': 'SALARY',
+            'salary_payment_day': 1,
+            'salary_minimum': 1000
+        }
+
+        last_salary_date = mp.get_last_salary_date()
+
+        self.assertEqual(last_salary_date, datetime.date(2024, 1, 1))
+
+        mp.matcher.last_salary_transaction.assert_called_with(mp.account, description='SALARY', salary_minimum=1000, salary_payment_day=1)
+        mock_last_salary_transaction.assert_not_called()
+
+
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.__init__')
+    def test_description_patterns(self, mock_mp):
+        mock_mp.return_value = None
+
+        mp = MonzoPayments()
+        mp.config = {
+            'salary_description': ['SALARY', 'ACME'],
+            'payments': [
+                {
+                    'type': 'Card Payment',
+                    'payments': [
+                        {'name': 'Netflix', 'desc': 'netflix'},
+                        {'name': 'Tesco', 'desc': ['tesco', 'sainsburys']},
+                        {'name': 'Other'}
+                    ]
+                },
+                {
+                    'type': 'Direct Debit',
+                    'payments': None
+                }
+            ],
+            'refunds_due': [
+                {'name': 'Amazon', 'desc': 'amazon'}
+            ]
+        }
+
+        self.assertEqual(mp.description_patterns(), ['SALARY', 'ACME', 'netflix', 'tesco', 'sainsburys', 'amazon'])
+
+
     @patch('monzo_utils.lib.monzo_payments.MonzoPayments.__init__')
     @patch('monzo_utils.model.account.Account.__init__')
     @patch('monzo_utils.model.account.Account.last_salary_transaction')
@@ -3729,6 +3895,28 @@ class TestMonzoPayments(BaseTest):
         self.assertEqual(next_salary_date, datetime.date(2024,2,1))
 
 
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.__init__')
+    @patch('monzo_utils.lib.salary_calendar.SalaryCalendar.load_bank_holidays')
+    def test_get_salary_calendar_bank_holidays(self, mock_load_bank_holidays, mock_mp):
+        mock_mp.return_value = None
+        mock_load_bank_holidays.return_value = set([datetime.date(2024,12,25)])
+
+        mp = MonzoPayments()
+        mp.config_path = '/tmp/.monzo'
+        mp.config = {
+            'salary_payment_day': 25,
+            'uk_bank_holidays': True
+        }
+
+        calendar = mp.get_salary_calendar()
+
+        self.assertEqual(mp.get_salary_calendar(), calendar)
+        self.assertEqual(calendar.holidays, set([datetime.date(2024,12,25)]))
+        self.assertEqual(mp.get_next_salary_date(datetime.date(2024,11,25)), datetime.date(2024,12,24))
+
+        mock_load_bank_holidays.assert_called_once_with('/tmp/.monzo/bank_holidays.json')
+
+
     @patch('monzo_utils.lib.monzo_payments.MonzoPayments.__init__')
     def test_get_next_salary_date_saturday(self, mock_mp):
         mock_mp.return_value = None
@@ -4513,3 +4701,134 @@ class TestMonzoPayments(BaseTest):
         resp = mp.get_transfer_amount(pot, payment)
 
         self.assertEqual(resp, 5000)
+
+
+    @freeze_time("2024-01-10")
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.__init__')
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.load_salary_dates')
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.get_payments')
+    @patch('monzo_utils.model.pot.Pot.one')
+    def test_forecast(self, mock_pot_one, mock_get_payments, mock_load_salary_dates, mock_mp):
+        mock_mp.return_value = None
+
+        mp = MonzoPayments()
+        mp.json = True
+        mp.print_json = False
+        mp.account_name = 'Current'
+        mp.account = MagicMock()
+        mp.account.balance = 100
+        mp.last_salary_date = datetime.date(2023,12,29)
+        mp.last_salary_amount = 2000
+        mp.config = {
+            'salary_payment_day': 29,
+            'payments': [
+                {
+                    'type': 'Direct Debit',
+                    'payments': [{'name': 'Gym', 'amount': 50}]
+                }
+            ],
+            'payments_to_pots': [
+                {'name': 'Savings', 'amount': 200, 'topup': True}
+            ]
+        }
+
+        payment = MagicMock(spec=Payment)
+        payment.payment_config = {'amount': 50}
+        payment.last_date = None
+        payment.due_date = datetime.date(2024,1,15)
+        payment.display_amount = 50
+        payment.next_month_amount = 50
+
+        mock_get_payments.side_effect = lambda payment_list, annual: [] if annual else [payment]
+
+        pot = Pot()
+        pot.attributes['id'] = 1
+        pot.attributes['name'] = 'Savings'
+        pot.attributes['balance'] = 150
+        pot.attributes['last_monthly_transfer_date'] = datetime.date(2023,12,29)
+        mock_pot_one.return_value = pot
+
+        data = mp.forecast('2m')
+
+        self.assertEqual(data['start'], '2024-01-10')
+        self.assertEqual(data['end'], '2024-03-10')
+
+        # payments on 15/1 and 15/2, salary on 29/1 and 29/2 with the
+        # savings pot topped back up to £200 on the first payday
+        self.assertEqual(data['balances']['Current']['minimum_balance'], 50)
+        self.assertEqual(data['balances']['Current']['minimum_date'], '2024-01-15')
+        self.assertEqual(data['balances']['Current']['end_balance'], 3950)
+        self.assertEqual(data['balances']['Current']['shortfall_dates'], [])
+        self.assertEqual(data['balances']['Savings']['end_balance'], 200)
+        self.assertEqual(data['balances']['Savings']['months']['2024-01'], {'in': 50, 'out': 0})
+
+        mock_load_salary_dates.assert_called_once()
+
+
+    @freeze_time("2024-01-10")
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.__init__')
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.load_salary_dates')
+    @patch('monzo_utils.lib.monzo_payments.MonzoPayments.get_payments')
+    def test_forecast_bills_pot(self, mock_get_payments, mock_load_salary_dates, mock_mp):
+        mock_mp.return_value = None
+
+        mp = MonzoPayments()
+        mp.json = True
+        mp.print_json = False
+        mp.account_name = 'Current'
+        mp.account = MagicMock()
+        mp.account.balance = 100
+        mp.last_salary_date = datetime.date(2023,12,29)
+        mp.last_salary_amount = 2000
+        mp.config = {
+            'salary_payment_day': 29,
+            'pot': 'Bills',
+            'payments': [
+                {
+                    'type': 'Direct Debit',
+                    'payments': [{'name': 'Gym', 'amount': 50}]
+                }
+            ]
+        }
+
+        pot = Pot()
+        pot.attributes['balance'] = 20
+        mp.account.get_pot.return_value = pot
+
+        payment = MagicMock(spec=Payment)
+        payment.payment_config = {'amount': 50}
+        payment.last_date = None
+        payment.due_date = datetime.date(2024,1,15)
+        payment.display_amount = 50
+        payment.next_month_amount = 50
+
+        mock_get_payments.side_effect = lambda payment_list, annual: [] if annual else [payment]
+
+        data = mp.forecast('2m')
+
+        # the pot is topped up with the £30 shortfall today and the £50 due
+        # on 15/2 on the first payday. nothing is due before the end after
+        # the second payday
+        self.assertEqual(data['balances']['Bills']['minimum_balance'], 0)
+        self.assertEqual(data['balances']['Bills']['end_balance'], 0)
+        self.assertEqual(data['balances']['Bills']['shortfall_dates'], [])
+        self.assertEqual(data['balances']['Bills']['months']['2024-01'], {'in': 80, 'out': 50})
+        self.assertEqual(data['balances']['Current']['minimum_balance'], 70)
+        self.assertEqual(data['balances']['Current']['minimum_date'], '2024-01-10')
+        self.assertEqual(data['balances']['Current']['end_balance'], 4020)
+
+        # any credit is only withdrawn with auto_withdraw
+        pot.attributes['balance'] = 120
+
+        data = mp.forecast('2m')
+
+        self.assertEqual(data['balances']['Bills']['end_balance'], 20)
+        self.assertEqual(data['balances']['Current']['end_balance'], 4100)
+
+        mp.config['auto_withdraw'] = True
+
+        data = mp.forecast('2m')
+
+        self.assertEqual(data['balances']['Bills']['end_balance'], 0)
+        self.assertEqual(data['balances']['Bills']['months']['2024-01'], {'in': 50, 'out': 120})
+        self.assertEqual(data['balances']['Current']['end_balance'], 4120)
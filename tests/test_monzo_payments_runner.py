@@ -0,0 +1,154 @@
+from base_test import BaseTest
+from unittest.mock import patch
+from unittest.mock import MagicMock
+from monzo_utils.lib.monzo_payments_runner import MonzoPaymentsRunner
+from monzo_utils.lib.payment_matcher import PaymentMatcher, DEFAULT_LOOKBACK_DAYS
+from monzo_utils.lib.transactions_seen import TransactionsSeen
+from monzo_utils.model.provider import Provider
+from monzo_utils.model.account import Account
+import os
+import json
+import tempfile
+import datetime
+
+class TestMonzoPaymentsRunner(BaseTest):
+
+    def setUp(self):
+        TransactionsSeen().seen = {}
+
+
+    def payments(self, account_name, config, data=None):
+        p = MagicMock()
+        p.account_name = account_name
+        p.config = config
+        p.provider = Provider({'id': 1, 'name': 'Monzo'})
+        p.main.return_value = data
+
+        return p
+
+
+    def test_all_account_configs(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            files = {
+                'config.yaml': "account: nope\npayments: []\n",
+                'Current.yaml': "account: Current\npayments: []\n",
+                'Joint.yaml': "account: Joint\npayments: []\n",
+                'other.yaml': "foo: bar\n",
+                'broken.yaml': "account: [\n",
+                'notes.txt': "account: Current\npayments: []\n"
+            }
+
+            for filename in files:
+                with open(f"{tmpdir}/{filename}", 'w') as f:
+                    f.write(files[filename])
+
+            self.assertEqual(MonzoPaymentsRunner.all_account_configs(tmpdir), [
+                f"{tmpdir}/Current.yaml",
+                f"{tmpdir}/Joint.yaml"
+            ])
+
+
+    @patch('monzo_utils.lib.monzo_payments_runner.MonzoPayments')
+    @patch('monzo_utils.model.account.Account.find')
+    def test_load(self, mock_find, mock_mp):
+        current = self.payments('Current', {'lookback_days': 100})
+        joint = self.payments('Joint', {'lookback_days': 400})
+
+        mock_mp.side_effect = [current, joint]
+        mock_find.return_value = [
+            Account({'id': 2, 'name': 'Current'}),
+            Account({'id': 3, 'name': 'Joint'})
+        ]
+
+        r = MonzoPaymentsRunner(['Current', 'Joint'], True)
+        r.load()
+
+        mock_find.assert_called_once_with("select * from account where provider_id = %s", [1])
+
+        accounts = current.accounts
+
+        self.assertEqual(sorted(accounts.keys()), ['Current', 'Joint'])
+        self.assertEqual(mock_mp.call_args_list[0][0], ('Current', True, False, None, None))
+        self.assertEqual(mock_mp.call_args_list[1][0], ('Joint', True, False, current.provider, accounts))
+
+        self.assertEqual(type(current.matcher), PaymentMatcher)
+        self.assertEqual(current.matcher, joint.matcher)
+        self.assertEqual(current.matcher.since, datetime.date.today() - datetime.timedelta(days=400))
+        self.assertFalse(current.print_json)
+
+
+    @patch('monzo_utils.lib.monzo_payments_runner.MonzoPayments')
+    @patch('monzo_utils.model.account.Account.find')
+    def test_load_without_lookback(self, mock_find, mock_mp):
+        mock_mp.side_effect = [
+            self.payments('Current', {'lookback_days': 100}),
+            self.payments('Joint', {'lookback_days': 0})
+        ]
+        mock_find.return_value = []
+
+        r = MonzoPaymentsRunner(['Current', 'Joint'])
+        r.load()
+
+        self.assertEqual(r.payments[0].matcher.since, None)
+
+
+    @patch('monzo_utils.lib.monzo_payments_runner.MonzoPayments')
+    @patch('monzo_utils.model.account.Account.find')
+    def test_load_default_lookback(self, mock_find, mock_mp):
+        mock_mp.side_effect = [
+            self.payments('Current', {'lookback_days': 100}),
+            self.payments('Joint', {})
+        ]
+        mock_find.return_value = []
+
+        r = MonzoPaymentsRunner(['Current', 'Joint'])
+        r.load()
+
+        self.assertEqual(r.payments[0].matcher.since, datetime.date.today() - datetime.timedelta(days=DEFAULT_LOOKBACK_DAYS))
+
+
+    @patch('monzo_utils.lib.monzo_payments_runner.MonzoPaymentsRunner.load')
+    @patch('builtins.print')
+    def test_main_json(self, mock_print, mock_load):
+        r = MonzoPaymentsRunner(['Current', 'Joint'], True)
+
+        current = self.payments('Current', {})
+        current.main.return_value = {'due': 1}
+        joint = self.payments('Joint', {})
+        joint.main.return_value = {'due': 2}
+
+        r.payments = [current, joint]
+        r.main()
+
+        mock_print.assert_called_once_with(json.dumps({'Current': {'due': 1}, 'Joint': {'due': 2}}, indent=4))
+
+
+    @patch('monzo_utils.lib.monzo_payments_runner.MonzoPaymentsRunner.load')
+    @patch('sys.stdout.write')
+    @patch('builtins.print')
+    def test_main_tables(self, mock_print, mock_stdout_write, mock_load):
+        r = MonzoPaymentsRunner(['Current', 'Joint'])
+        r.payments = [self.payments('Current', {}), self.payments('Joint', {})]
+        r.main()
+
+        self.assertEqual(mock_print.call_args_list[0][0][0], "Current:\n")
+        self.assertEqual(mock_print.call_args_list[1][0][0], "Joint:\n")
+
+        r.payments[0].main.assert_called_once()
+        r.payments[1].main.assert_called_once()
+
+
+    @patch('monzo_utils.lib.monzo_payments_runner.MonzoPaymentsRunner.load')
+    @patch('builtins.print')
+    def test_main_forecast(self, mock_print, mock_load):
+        r = MonzoPaymentsRunner(['Current', 'Joint'], True, False, '12m')
+        r.payments = [self.payments('Current', {}), self.payments('Joint', {})]
+        r.payments[0].forecast.return_value = {'start': '2024-01-01'}
+        r.payments[1].forecast.return_value = {'start': '2024-01-01'}
+        r.main()
+
+        r.payments[0].forecast.assert_called_once_with('12m')
+        r.payments[1].forecast.assert_called_once_with('12m')
+        r.payments[0].main.assert_not_called()
+
+        mock_print.assert_called_once_with(json.dumps({'Current': {'start': '2024-01-01'}, 'Joint': {'start': '2024-01-01'}}, indent=4))
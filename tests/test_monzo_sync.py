@@ -6,6 +6,10 @@ from monzo_utils.lib.db import DB
 from monzo_utils.lib.config import Config
 from monzo_utils.lib.monzo_sync import MonzoSync
 from monzo_utils.lib.monzo_api import MonzoAPI
+from monzo_utils.lib.sync_metrics import SyncMetrics
+from monzo_utils.lib.monthly_summary import MonthlySummary
+from monzo_utils.lib.metadata_pivot import MetadataPivot
+from monzo_utils.lib.trigram_index import TrigramIndex
 from monzo_utils.model.account import Account
 from monzo_utils.model.merchant import Merchant
 from monzo_utils.model.merchant_address import MerchantAddress
@@ -13,13 +17,16 @@ from monzo_utils.model.transaction import Transaction
 from monzo_utils.model.counterparty import Counterparty
 from monzo_utils.model.provider import Provider
 from monzo_utils.model.pot import Pot
-from monzo.exceptions import MonzoAuthenticationError, MonzoServerError, MonzoHTTPError, MonzoPermissionsError
+from monzo.exceptions import MonzoAuthenticationError, MonzoServerError, MonzoHTTPError, MonzoPermissionsError, MonzoRateError
 import monzo.endpoints.account
 import monzo.endpoints.balance
 import pytest
 import os
 import pwd
 import datetime
+import decimal
+import json
+import tempfile
 from freezegun import freeze_time
 
 class TestMonzoSync(BaseTest):
@@ -27,6 +34,12 @@ class TestMonzoSync(BaseTest):
     def setUp(self):
         Config._instances = {}
         DB._instances = {}
+        MonthlySummary._instances = {}
+        MonthlySummary().available = False
+        MetadataPivot._instances = {}
+        MetadataPivot().available = False
+        TrigramIndex._instances = {}
+        TrigramIndex().available = False
 
 
     @patch('os.path.exists')
@@ -1745,10 +1758,14 @@ class TestMonzoSync(BaseTest):
 
 
     @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    @patch('monzo_utils.lib.db.DB.__init__')
+    @patch('monzo_utils.lib.db.DB.begin')
+    @patch('monzo_utils.lib.db.DB.commit')
     @patch('monzo_utils.model.pot.Pot.save')
-    @patch('monzo_utils.model.pot.Pot.one')
-    def test_sync_account_pots_create(self, mock_one, mock_save, mock_init):
+    @patch('monzo_utils.model.pot.Pot.find')
+    def test_sync_account_pots_create(self, mock_find, mock_save, mock_commit, mock_begin, mock_db_init, mock_init):
         mock_init.return_value = None
+        mock_db_init.return_value = None
 
         pot1 = MagicMock()
         pot1.pot_id = 234
@@ -1761,11 +1778,14 @@ class TestMonzoSync(BaseTest):
 
         account = MagicMock()
         account.account_id = 123
+        account.id = 1
 
-        mock_one.return_value = None
+        mock_find.return_value = []
 
         pot_lookup = ms.sync_account_pots(account)
 
+        mock_find.assert_called_once_with("select * from pot where account_id = %s", [1])
+
         self.assertIsInstance(pot_lookup, dict)
         self.assertIn(234, pot_lookup)
         self.assertIn(456, pot_lookup)
@@ -1775,18 +1795,33 @@ class TestMonzoSync(BaseTest):
 
         self.assertEqual(pot_lookup[234].id, None)
         self.assertEqual(pot_lookup[456].id, None)
+        self.assertEqual(pot_lookup[234].account_id, 1)
+
+        self.assertEqual(mock_save.call_count, 2)
+        mock_begin.assert_called_once()
+        mock_commit.assert_called_once()
 
 
     @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    @patch('monzo_utils.lib.db.DB.__init__')
+    @patch('monzo_utils.lib.db.DB.begin')
+    @patch('monzo_utils.lib.db.DB.commit')
     @patch('monzo_utils.model.pot.Pot.save')
-    @patch('monzo_utils.model.pot.Pot.one')
-    def test_sync_account_pots_update(self, mock_one, mock_save, mock_init):
+    @patch('monzo_utils.model.pot.Pot.find')
+    def test_sync_account_pots_update(self, mock_find, mock_save, mock_commit, mock_begin, mock_db_init, mock_init):
         mock_init.return_value = None
+        mock_db_init.return_value = None
 
         pot1 = MagicMock()
         pot1.pot_id = 234
+        pot1.name = 'Bills'
+        pot1.balance = 10000
+        pot1.deleted = False
         pot2 = MagicMock()
         pot2.pot_id = 456
+        pot2.name = 'Savings'
+        pot2.balance = 5050
+        pot2.deleted = True
 
         ms = MonzoSync()
         ms.api = MagicMock()
@@ -1795,14 +1830,22 @@ class TestMonzoSync(BaseTest):
         account = MagicMock()
         account.account_id = 123
 
-        pot1 = Pot({
-            'id': 22
-        })
-        pot2 = Pot({
-            'id': 88
-        })
-
-        mock_one.side_effect = [pot1, pot2]
+        mock_find.return_value = [
+            Pot({
+                'id': 22,
+                'pot_id': 234,
+                'name': 'Bills',
+                'balance': decimal.Decimal('90.00'),
+                'deleted': 0
+            }),
+            Pot({
+                'id': 88,
+                'pot_id': 456,
+                'name': 'Savings',
+                'balance': decimal.Decimal('50.50'),
+                'deleted': 0
+            })
+        ]
 
         pot_lookup = ms.sync_account_pots(account)
 
@@ -1816,6 +1859,51 @@ class TestMonzoSync(BaseTest):
         self.assertEqual(pot_lookup[234].id, 22)
         self.assertEqual(pot_lookup[456].id, 88)
 
+        self.assertEqual(pot_lookup[234].balance, 100)
+        self.assertEqual(pot_lookup[456].deleted, True)
+
+        self.assertEqual(mock_save.call_count, 2)
+        mock_commit.assert_called_once()
+
+
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    @patch('monzo_utils.lib.db.DB.__init__')
+    @patch('monzo_utils.lib.db.DB.begin')
+    @patch('monzo_utils.model.pot.Pot.save')
+    @patch('monzo_utils.model.pot.Pot.find')
+    def test_sync_account_pots_unchanged(self, mock_find, mock_save, mock_begin, mock_db_init, mock_init):
+        mock_init.return_value = None
+        mock_db_init.return_value = None
+
+        pot1 = MagicMock()
+        pot1.pot_id = 234
+        pot1.name = 'Bills'
+        pot1.balance = 10000
+        pot1.deleted = False
+
+        ms = MonzoSync()
+        ms.api = MagicMock()
+        ms.api.pots.return_value = [pot1]
+
+        account = MagicMock()
+
+        mock_find.return_value = [
+            Pot({
+                'id': 22,
+                'pot_id': 234,
+                'name': 'Bills',
+                'balance': decimal.Decimal('100.00'),
+                'deleted': 0
+            })
+        ]
+
+        pot_lookup = ms.sync_account_pots(account)
+
+        self.assertEqual(pot_lookup[234].id, 22)
+
+        mock_save.assert_not_called()
+        mock_begin.assert_not_called()
+
 
     @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
     @patch('monzo_utils.model.account.Account.save')
@@ -1967,3 +2055,300 @@ class TestMonzoSync(BaseTest):
         self.assertEqual(account.type, 'credit')
         self.assertEqual(account.balance, 87.78)
         self.assertEqual(account.available, 912.22)
+
+
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.add_transaction')
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.save_backfill_checkpoint')
+    @patch('monzo_utils.lib.db.DB.__init__')
+    @patch('monzo_utils.lib.db.DB.begin')
+    @patch('monzo_utils.lib.db.DB.commit')
+    def test_backfill_transactions_pages(self, mock_commit, mock_begin, mock_db_init, mock_save_checkpoint, mock_add_transaction, mock_init):
+        mock_init.return_value = None
+        mock_db_init.return_value = None
+
+        page1 = []
+        for i in range(0, 100):
+            mo_transaction = MagicMock()
+            mo_transaction.transaction_id = f"tx_{i}"
+            page1.append(mo_transaction)
+
+        page2 = []
+        for i in range(100, 150):
+            mo_transaction = MagicMock()
+            mo_transaction.transaction_id = f"tx_{i}"
+            page2.append(mo_transaction)
+
+        ms = MonzoSync()
+        ms.api = MagicMock()
+        ms.api.transactions.side_effect = [page1, page2]
+
+        account = MagicMock()
+        since = datetime.datetime(2020,1,1)
+
+        checkpoint = {
+            'cursors': {},
+            'pot_account_ids': {}
+        }
+
+        total = ms.backfill_transactions(account, 'acc_1', since, {}, checkpoint)
+
+        self.assertEqual(total, 150)
+        self.assertEqual(mock_add_transaction.call_count, 150)
+        self.assertEqual(mock_begin.call_count, 2)
+        self.assertEqual(mock_commit.call_count, 2)
+        self.assertEqual(mock_save_checkpoint.call_count, 2)
+
+        ms.api.transactions.assert_any_call('acc_1', since=since, limit=100)
+        ms.api.transactions.assert_any_call('acc_1', since='tx_99', limit=100)
+
+        self.assertEqual(checkpoint['cursors']['acc_1'], 'tx_149')
+
+
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.add_transaction')
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.save_backfill_checkpoint')
+    def test_backfill_transactions_resume_from_checkpoint(self, mock_save_checkpoint, mock_add_transaction, mock_init):
+        mock_init.return_value = None
+
+        ms = MonzoSync()
+        ms.api = MagicMock()
+        ms.api.transactions.return_value = []
+
+        checkpoint = {
+            'cursors': {
+                'acc_1': 'tx_123'
+            },
+            'pot_account_ids': {}
+        }
+
+        total = ms.backfill_transactions(MagicMock(), 'acc_1', datetime.datetime(2020,1,1), {}, checkpoint)
+
+        self.assertEqual(total, 0)
+
+        ms.api.transactions.assert_called_with('acc_1', since='tx_123', limit=100)
+
+        mock_add_transaction.assert_not_called()
+        mock_save_checkpoint.assert_not_called()
+
+
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.add_transaction')
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.save_backfill_checkpoint')
+    @patch('monzo_utils.lib.log.Log.error')
+    def test_backfill_transactions_rate_limited(self, mock_log_error, mock_save_checkpoint, mock_add_transaction, mock_init):
+        mock_init.return_value = None
+
+        ms = MonzoSync()
+        ms.api = MagicMock()
+        ms.api.transactions.side_effect = MonzoRateError('rate limited')
+
+        checkpoint = {
+            'cursors': {},
+            'pot_account_ids': {}
+        }
+
+        total = ms.backfill_transactions(MagicMock(), 'acc_1', datetime.datetime(2020,1,1), {}, checkpoint)
+
+        self.assertEqual(total, None)
+        self.assertEqual(checkpoint['cursors'], {})
+
+        mock_log_error.assert_called()
+
+
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.backfill_account')
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.load_backfill_checkpoint')
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.save_backfill_checkpoint')
+    def test_backfill_clears_checkpoint(self, mock_save_checkpoint, mock_load_checkpoint, mock_backfill_account, mock_init):
+        mock_init.return_value = None
+
+        config = Config({'accounts': {'acc_1': {'name': 'Current'}, 'acc_2': {'name': 'Joint'}}})
+        Config._instances[Config] = config
+
+        mo_accounts = []
+
+        for account_id in ['acc_1', 'acc_2']:
+            mo_account = MagicMock()
+            mo_account.account_id = account_id
+            mo_account.description = 'user_123'
+            mo_accounts.append(mo_account)
+
+        ms = MonzoSync()
+        ms.api = MagicMock()
+        ms.api.accounts.return_value = mo_accounts
+
+        # an interrupted backfill keeps its cursors so it can be resumed
+        mock_backfill_account.side_effect = [True, False]
+
+        ms.backfill()
+
+        mock_save_checkpoint.assert_not_called()
+
+        mock_backfill_account.side_effect = None
+        mock_backfill_account.return_value = True
+        mock_load_checkpoint.return_value = {
+            'cursors': {'acc_1': 'tx_1', 'pot_1': 'tx_2', 'acc_2': 'tx_3', 'acc_3': 'tx_4'},
+            'pot_account_ids': {'acc_1': {'pot_1': 'p1'}}
+        }
+
+        ms.backfill()
+
+        mock_save_checkpoint.assert_called_once_with({
+            'cursors': {'acc_3': 'tx_4'},
+            'pot_account_ids': {'acc_1': {'pot_1': 'p1'}}
+        })
+
+
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    @patch('os.path.exists')
+    def test_load_backfill_checkpoint_no_file(self, mock_exists, mock_init):
+        mock_init.return_value = None
+        mock_exists.return_value = False
+
+        ms = MonzoSync()
+        ms.backfill_file = '/tmp/blah'
+
+        self.assertEqual(ms.load_backfill_checkpoint(), {'cursors': {}, 'pot_account_ids': {}})
+
+
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    def test_row_changed(self, mock_init):
+        mock_init.return_value = None
+
+        ms = MonzoSync()
+
+        before = {
+            'id': 1,
+            'date': datetime.date(2024,1,2),
+            'money_in': decimal.Decimal('12.50'),
+            'money_out': None,
+            'pending': 0,
+            'created_at': '2024-01-02 10:11:12.123000+00:00',
+            'settled': None,
+            'notes': ''
+        }
+
+        after = dict(before)
+        after.update({
+            'date': '2024-01-02',
+            'money_in': 12.5,
+            'pending': False,
+            'created_at': datetime.datetime(2024,1,2,10,11,12,123000),
+            'settled': ''
+        })
+
+        self.assertFalse(ms.row_changed(before, after))
+
+        after['money_in'] = 12.51
+
+        self.assertTrue(ms.row_changed(before, after))
+
+
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    def test_metrics(self, mock_init):
+        mock_init.return_value = None
+
+        ms = MonzoSync()
+
+        self.assertIsInstance(ms.metrics, SyncMetrics)
+        self.assertIs(ms.metrics, ms.metrics)
+
+
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    def test_write_metrics_touch_file(self, mock_init):
+        mock_init.return_value = None
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            Config._instances[Config] = Config({'touch_file': f"{tmpdir}/touch"})
+
+            ms = MonzoSync()
+            ms.metrics.row('inserted')
+            ms.metrics.finish()
+            ms.write_metrics()
+
+            self.assertIn('monzo_sync_rows{result="inserted"} 1', open(f"{tmpdir}/monzo_sync.prom").read())
+            self.assertEqual(json.loads(open(f"{tmpdir}/monzo_sync.json").read())['rows']['inserted'], 1)
+
+
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    def test_write_metrics_accounts(self, mock_init):
+        mock_init.return_value = None
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            Config._instances[Config] = Config({'touch_file': f"{tmpdir}/touch"})
+
+            ms = MonzoSync()
+            ms.account_metrics = {}
+
+            # each account synced by the daemon is kept in the file
+            for name in ['Joint', 'Current', 'Joint']:
+                ms._metrics = SyncMetrics(name)
+                ms.metrics.row('inserted')
+                ms.metrics.finish()
+                ms.write_metrics()
+
+            self.assertEqual(sorted(json.loads(open(f"{tmpdir}/monzo_sync.json").read())['accounts'].keys()), ['Current', 'Joint'])
+
+            lines = open(f"{tmpdir}/monzo_sync.prom").read().split("\n")
+
+            self.assertIn('monzo_sync_rows{account="Current",result="inserted"} 1', lines)
+            self.assertIn('monzo_sync_rows{account="Joint",result="inserted"} 1', lines)
+
+            # a sync of every account replaces them
+            ms._metrics = SyncMetrics()
+            ms.metrics.finish()
+            ms.write_metrics()
+
+            self.assertEqual(ms.account_metrics, {})
+            self.assertIn('rows', json.loads(open(f"{tmpdir}/monzo_sync.json").read()))
+            self.assertNotIn('account="Current"', open(f"{tmpdir}/monzo_sync.prom").read())
+
+
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    def test_write_metrics_single_account(self, mock_init):
+        mock_init.return_value = None
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            Config._instances[Config] = Config({'touch_file': f"{tmpdir}/touch"})
+
+            ms = MonzoSync()
+            ms.metrics.row('inserted')
+            ms.metrics.finish()
+            ms.write_metrics()
+
+            # one account synced outside the daemon, eg by monzo-payments,
+            # leaves the full sync's metrics in place
+            ms = MonzoSync()
+            ms._metrics = SyncMetrics('Current')
+            ms.metrics.finish()
+            ms.write_metrics()
+
+            self.assertEqual(json.loads(open(f"{tmpdir}/monzo_sync.json").read())['rows']['inserted'], 1)
+            self.assertNotIn('account="Current"', open(f"{tmpdir}/monzo_sync.prom").read())
+
+
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    @patch('monzo_utils.lib.sync_metrics.SyncMetrics.write')
+    def test_write_metrics_config(self, mock_write, mock_init):
+        mock_init.return_value = None
+
+        Config._instances[Config] = Config({'metrics': {'prometheus_file': '/tmp/sync.prom'}})
+
+        ms = MonzoSync()
+        ms.write_metrics()
+
+        mock_write.assert_called_with('/tmp/sync.prom', None)
+
+
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    @patch('monzo_utils.lib.sync_metrics.SyncMetrics.write')
+    def test_write_metrics_not_configured(self, mock_write, mock_init):
+        mock_init.return_value = None
+
+        Config._instances[Config] = Config({'accounts': {}})
+
+        ms = MonzoSync()
+        ms.write_metrics()
+
+        mock_write.assert_not_called()
@@ -0,0 +1,161 @@
+from base_test import BaseTest
+from unittest.mock import patch
+from unittest.mock import MagicMock
+from monzo_utils.lib.db import DB
+from monzo_utils.lib.config import Config
+from monzo_utils.lib.monzo_sync_daemon import MonzoSyncDaemon
+from monzo_utils.model.account import Account
+import pytest
+import os
+import time
+import tempfile
+
+class TestMonzoSyncDaemon(BaseTest):
+
+    def setUp(self):
+        Config._instances = {}
+        DB._instances = {}
+
+
+    def get_daemon(self, daemon_config=None):
+        config = {
+            'accounts': {
+                'acc_1': {
+                    'name': 'Current'
+                },
+                'acc_2': {
+                    'name': 'Joint'
+                }
+            }
+        }
+
+        if daemon_config is not None:
+            config['daemon'] = daemon_config
+
+        Config._instances[Config] = Config(config)
+
+        with patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__') as mock_init:
+            mock_init.return_value = None
+
+            with patch('monzo_utils.lib.monzo_sync.MonzoSync.monzo_dir', '/tmp/monzo', create=True):
+                return MonzoSyncDaemon()
+
+
+    def test_constructor_defaults(self):
+        d = self.get_daemon()
+
+        self.assertEqual(d.interval, 300)
+        self.assertEqual(d.jitter, 30)
+        self.assertEqual(d.days, 3)
+        self.assertEqual(d.status_socket, '/tmp/monzo/daemon.sock')
+        self.assertEqual(d.monzo_sync.account_metrics, {})
+
+        self.assertEqual(list(d.jobs.keys()), ['acc_1', 'acc_2'])
+        self.assertEqual(d.jobs['acc_1']['interval'], 300)
+        self.assertEqual(d.jobs['acc_1']['runs'], 0)
+
+
+    def test_constructor_account_intervals(self):
+        d = self.get_daemon({
+            'interval': 600,
+            'jitter': 10,
+            'days': 7,
+            'status_socket': '/tmp/blah.sock',
+            'accounts': {
+                'Joint': 60
+            }
+        })
+
+        self.assertEqual(d.interval, 600)
+        self.assertEqual(d.jitter, 10)
+        self.assertEqual(d.days, 7)
+        self.assertEqual(d.status_socket, '/tmp/blah.sock')
+
+        self.assertEqual(d.jobs['acc_1']['interval'], 600)
+        self.assertEqual(d.jobs['acc_2']['interval'], 60)
+
+
+    def test_next_job(self):
+        d = self.get_daemon()
+
+        d.jobs['acc_1']['next_run'] = 200
+        d.jobs['acc_2']['next_run'] = 100
+
+        self.assertEqual(d.next_job(), 'acc_2')
+
+
+    @patch('monzo_utils.lib.db.DB.__init__')
+    @patch('monzo_utils.lib.db.DB.ping')
+    def test_run_job(self, mock_ping, mock_db_init):
+        mock_db_init.return_value = None
+
+        d = self.get_daemon({'interval': 100, 'jitter': 5})
+        d.monzo_sync = MagicMock()
+
+        d.run_job('acc_1')
+
+        args = d.monzo_sync.sync.call_args[0]
+
+        self.assertEqual(args[0], 3)
+        self.assertIsInstance(args[1], Account)
+        self.assertEqual(args[1].account_id, 'acc_1')
+
+        self.assertEqual(d.jobs['acc_1']['runs'], 1)
+        self.assertEqual(d.jobs['acc_1']['failures'], 0)
+        self.assertEqual(d.jobs['acc_1']['last_error'], None)
+        self.assertGreaterEqual(d.jobs['acc_1']['next_run'], time.time() + 94)
+        self.assertLessEqual(d.jobs['acc_1']['next_run'], time.time() + 105)
+
+        mock_ping.assert_called()
+
+
+    @patch('monzo_utils.lib.db.DB.__init__')
+    @patch('monzo_utils.lib.db.DB.ping')
+    @patch('monzo_utils.lib.log.Log.error')
+    def test_run_job_failure(self, mock_error, mock_ping, mock_db_init):
+        mock_db_init.return_value = None
+
+        d = self.get_daemon()
+        d.monzo_sync = MagicMock()
+        d.monzo_sync.sync.side_effect = SystemExit(1)
+
+        d.run_job('acc_2')
+
+        self.assertEqual(d.jobs['acc_2']['runs'], 1)
+        self.assertEqual(d.jobs['acc_2']['failures'], 1)
+        self.assertEqual(d.jobs['acc_2']['last_error'], '1')
+
+        mock_error.assert_called()
+
+
+    def test_schedule_minimum(self):
+        d = self.get_daemon({'jitter': 0})
+
+        self.assertGreaterEqual(d.schedule(0), time.time())
+
+
+    def test_status(self):
+        d = self.get_daemon()
+
+        status = d.status()
+
+        self.assertEqual(status['pid'], os.getpid())
+        self.assertIn('Current', status['accounts'])
+        self.assertIn('Joint', status['accounts'])
+        self.assertNotIn('name', status['accounts']['Current'])
+
+
+    def test_status_socket(self):
+        d = self.get_daemon()
+        d.status_socket = tempfile.mktemp(suffix='.sock')
+
+        d.start_status_server()
+
+        try:
+            status = MonzoSyncDaemon.query_status(d.status_socket)
+        finally:
+            d.stop_status_server()
+
+        self.assertEqual(status['pid'], os.getpid())
+        self.assertEqual(status['accounts']['Current']['runs'], 0)
+        self.assertFalse(os.path.exists(d.status_socket))
@@ -8,6 +8,7 @@ from monzo_utils.model.account import Account
 from monzo_utils.lib.db import DB
 from monzo_utils.lib.config import Config
 from monzo_utils.lib.transactions_seen import TransactionsSeen
+from monzo_utils.lib.claim_registry import ClaimRegistry
 import pytest
 import datetime
 import decimal
@@ -391,6 +392,8 @@ class TestPayment(BaseTest):
 
             mock_due_this_month.return_value = True
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'DUE')
 
 
@@ -422,6 +425,8 @@ class TestPayment(BaseTest):
 
             p.payment_config['renew_date'] = datetime.date(2024,3,1)
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'SKIPPED')
 
 
@@ -453,9 +458,47 @@ class TestPayment(BaseTest):
 
             p.payment_config['exclude_months'] = [1]
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'SKIPPED')
 
 
+    @patch('monzo_utils.lib.db.DB.__init__')
+    @patch('monzo_utils.lib.db.DB.query')
+    def test_set_cached(self, mock_query, mock_db):
+        mock_db.return_value = None
+
+        with freeze_time('2024-01-22'):
+            account = Account({
+                'id': 1,
+                'name': 'test'
+            })
+
+            p = Payment(
+                {},
+                account,
+                'payment_list_config',
+                {
+                    'name': 'payment',
+                    'amount': 123,
+                },
+                datetime.date(2024,2,1),
+                datetime.date(2024,3,1),
+                datetime.date(2024,4,1),
+            )
+
+            self.assertEqual(p.status, 'DUE')
+            self.assertEqual(p.due_date, None)
+
+            p.set_cached('last_date', datetime.date(2024,2,5))
+
+            self.assertNotIn('status', p.cache)
+            self.assertNotIn('due_date', p.cache)
+
+            self.assertEqual(p.status, 'PAID')
+            self.assertEqual(p.due_date, datetime.date(2024,3,5))
+
+
     @patch('monzo_utils.lib.db.DB.__init__')
     @patch('monzo_utils.lib.db.DB.query')
     @patch('monzo_utils.model.payment.Payment.last_date', new_callable=PropertyMock)
@@ -486,6 +529,8 @@ class TestPayment(BaseTest):
 
             mock_last_date.return_value = datetime.date(2024,2,1)
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'PAID')
 
 
@@ -519,6 +564,8 @@ class TestPayment(BaseTest):
 
             mock_due_date.return_value = datetime.date(2024,3,1)
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'SKIPPED')
 
 
@@ -1494,6 +1541,65 @@ class TestPayment(BaseTest):
         mock_find.assert_called_with('select * from transaction where blah = %s order by created_at desc', [12])
 
 
+    @patch('monzo_utils.lib.db.DB.__init__')
+    @patch('monzo_utils.lib.db.DB.query')
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    @patch('monzo_utils.model.payment.Payment.get_transaction_where_condition')
+    def test_last_payment_claims(self, mock_get_transaction_where_condition, mock_find, mock_query, mock_db):
+        mock_db.return_value = None
+        mock_get_transaction_where_condition.return_value = 'blah = %s', [12]
+
+        mock_find.return_value = [
+            Transaction({
+                'id': 123,
+                'date': datetime.date(2024,1,1)
+            }),
+            Transaction({
+                'id': 234,
+                'date': datetime.date(2024,1,2)
+            })
+        ]
+
+        account = Account({
+            'id': 1,
+            'name': 'test'
+        })
+
+        claims = ClaimRegistry()
+        payments = []
+
+        for name in ['payment1', 'payment2', 'payment3']:
+            p = Payment(
+                {},
+                account,
+                'payment_list_config',
+                {
+                    'name': name,
+                    'amount': 123,
+                    'desc': 'desc1'
+                },
+                datetime.date(2024,2,1),
+                datetime.date(2024,3,1),
+                datetime.date(2024,4,1),
+            )
+            p.claims = claims
+
+            payments.append(p)
+
+        TransactionsSeen().seen = {}
+
+        self.assertEqual(payments[0].last_payment.id, 123)
+        self.assertEqual(payments[1].last_payment.id, 234)
+        self.assertEqual(payments[2].last_payment, None)
+        self.assertEqual(payments[2].older_last_payment, None)
+
+        self.assertEqual(claims.seen, {123: id(payments[0].payment_config), 234: id(payments[1].payment_config)})
+        self.assertEqual(TransactionsSeen().seen, {})
+
+        # the candidates are looked up once per payment
+        self.assertEqual(mock_find.call_count, 3)
+
+
     @patch('monzo_utils.lib.db.DB.__init__')
     @patch('monzo_utils.lib.db.DB.query')
     @patch('monzo_utils.model.transaction.Transaction.find')
@@ -1921,6 +2027,8 @@ class TestPayment(BaseTest):
 
         mock_last_date.return_value = datetime.date(2023,12,28)
 
+        p.invalidate('due_date')
+
         self.assertEqual(p.due_date, datetime.date(2024,1,28))
 
 
@@ -1989,6 +2097,8 @@ class TestPayment(BaseTest):
 
         p.payment_config['exclude_months'] = [12]
 
+        p.invalidate('due_date')
+
         self.assertEqual(p.due_date, datetime.date(2024,1,28))
 
 
@@ -2021,6 +2131,8 @@ class TestPayment(BaseTest):
 
         p.payment_config['renew_date'] = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -2055,6 +2167,8 @@ class TestPayment(BaseTest):
 
         p.payment_config['start_date'] = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -2117,6 +2231,8 @@ class TestPayment(BaseTest):
 
         mock_due_date.return_value = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -2155,3 +2271,21 @@ class TestPayment(BaseTest):
         p.payment_config['yearly_month'] = 3
 
         self.assertEqual(p.yearly_payment_due_this_month(), False)
+
+
+    @patch('monzo_utils.lib.db.DB.__init__')
+    @patch('monzo_utils.lib.currency_rates.CurrencyRates.convert')
+    def test_convert_currency(self, mock_convert, mock_db):
+        mock_db.return_value = None
+        mock_convert.return_value = 8.5
+
+        account = Account({
+            'id': 1,
+            'name': 'test'
+        })
+
+        p = Payment({}, account, {}, {'name': 'test'}, datetime.date(2024,1,1), datetime.date(2024,2,1), datetime.date(2024,3,1))
+
+        self.assertEqual(p.convert_currency(10, 'USD'), 8.5)
+
+        mock_convert.assert_called_once_with(10, 'USD', 'GBP')
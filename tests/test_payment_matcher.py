@@ -0,0 +1,386 @@
+from base_test import BaseTest
+from unittest.mock import patch
+from unittest.mock import MagicMock
+from monzo_utils.lib.payment_matcher import PaymentMatcher
+from monzo_utils.model.payment import Payment
+from monzo_utils.model.refund import Refund
+from monzo_utils.model.finance import Finance
+from monzo_utils.model.account import Account
+from monzo_utils.model.provider import Provider
+from monzo_utils.model.transaction import Transaction
+from monzo_utils.model.transaction_metadata import TransactionMetadata
+from monzo_utils.lib.transactions_seen import TransactionsSeen
+from monzo_utils.lib.claim_registry import ClaimRegistry
+from monzo_utils.lib.metadata_pivot import MetadataPivot
+import datetime
+import decimal
+
+class TestPaymentMatcher(BaseTest):
+
+    def setUp(self):
+        TransactionsSeen().seen = {}
+        MetadataPivot._instances = {}
+        MetadataPivot().available = False
+
+        self.account = Account({
+            'id': 1,
+            'name': 'test'
+        })
+
+        self.transactions = [
+            self.transaction(6, 1, '2024-03-05', 'NETFLIX.COM', money_out='10.99'),
+            self.transaction(5, 1, '2024-03-01', 'Tesco Stores 1234', money_out='52.10'),
+            self.transaction(4, 1, '2024-02-05', 'Netflix.com', money_out='10.99'),
+            self.transaction(3, 1, '2024-02-03', 'Refund from Amazon', money_in='15.00'),
+            self.transaction(2, 1, '2024-01-05', 'NETFLIX.COM', money_out='9.99'),
+            self.transaction(1, 1, '2024-01-02', 'Tesco Stores 1234', money_out='12.00')
+        ]
+
+
+    def transaction(self, _id, account_id, date, description, money_in=None, money_out=None):
+        date = datetime.datetime.strptime(date, '%Y-%m-%d').date()
+
+        return Transaction({
+            'id': _id,
+            'account_id': account_id,
+            'date': date,
+            'created_at': datetime.datetime(date.year, date.month, date.day, 12, 0, 0),
+            'description': description,
+            'money_in': decimal.Decimal(money_in) if money_in else None,
+            'money_out': decimal.Decimal(money_out) if money_out else None,
+            'declined': 0
+        })
+
+
+    def payment(self, payment_config, cls=Payment):
+        return cls({}, self.account, {}, payment_config, datetime.date(2024,2,28), datetime.date(2024,3,28), datetime.date(2024,4,28))
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    def test_load(self, mock_find):
+        mock_find.return_value = self.transactions
+
+        m = PaymentMatcher(datetime.date(2023,1,1))
+        m.load((1,))
+        m.load((1,))
+
+        mock_find.assert_called_once_with("select * from `transaction` where account_id in (%s) and declined = %s and `date` >= %s order by created_at desc", [1, 0, '2023-01-01'])
+
+        self.assertEqual(m.transactions, self.transactions)
+        self.assertEqual(m.loaded_accounts, [1])
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    def test_load_merges_accounts(self, mock_find):
+        other = self.transaction(7, 2, '2024-02-10', 'NETFLIX.COM', money_out='10.99')
+
+        mock_find.side_effect = [self.transactions, [other]]
+
+        m = PaymentMatcher()
+        m.load((1,))
+        m.load((1,2))
+
+        self.assertEqual(mock_find.call_args[0][1], [2, 0])
+        self.assertEqual([t.id for t in m.transactions], [6, 5, 7, 4, 3, 2, 1])
+
+
+    def test_like(self):
+        m = PaymentMatcher()
+
+        self.assertTrue(m.like('%netflix%', 'NETFLIX.COM'))
+        self.assertTrue(m.like('%tesco%1234%', 'Tesco Stores 1234'))
+        self.assertTrue(m.like('%net_lix%', 'netflix'))
+        self.assertTrue(m.like('abc', 'ABC'))
+        self.assertFalse(m.like('abc', 'abcd'))
+        self.assertFalse(m.like('%a.c%', 'abc'))
+        self.assertFalse(m.like('%netflix%', None))
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    def test_find(self, mock_find):
+        mock_find.return_value = self.transactions
+
+        m = PaymentMatcher()
+
+        p = self.payment({'name': 'Netflix', 'desc': 'netflix', 'amount': 10.99})
+
+        self.assertEqual([t.id for t in m.find(p)], [6, 4, 2])
+        self.assertEqual([t.id for t in m.find(p, order='asc')], [2, 4, 6])
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    def test_find_desc_list(self, mock_find):
+        mock_find.return_value = self.transactions
+
+        m = PaymentMatcher()
+
+        p = self.payment({'name': 'Netflix', 'desc': ['netflix', 'tesco'], 'amount': 10.99})
+
+        self.assertEqual([t.id for t in m.find(p)], [6, 5, 4, 2, 1])
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    def test_find_default_desc(self, mock_find):
+        mock_find.return_value = self.transactions
+
+        m = PaymentMatcher()
+
+        p = self.payment({'name': 'Amazon refund', 'amount': 15}, Refund)
+
+        self.assertEqual([t.id for t in m.find(p)], [3])
+        self.assertEqual(p.payment_config['desc'], 'Refund')
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    def test_find_fixed(self, mock_find):
+        mock_find.return_value = self.transactions
+
+        m = PaymentMatcher()
+
+        p = self.payment({'name': 'Netflix', 'desc': 'netflix', 'amount': 10.99, 'fixed': True})
+
+        self.assertEqual([t.id for t in m.find(p)], [6, 4])
+        self.assertEqual([t.id for t in m.find(p, amounts=[9.99])], [2])
+        self.assertEqual([t.id for t in m.find(p, amounts=False)], [6, 4, 2])
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    def test_find_start_date_and_monthly_day(self, mock_find):
+        mock_find.return_value = self.transactions
+
+        m = PaymentMatcher()
+
+        p = self.payment({'name': 'Netflix', 'desc': 'netflix', 'amount': 10.99, 'start_date': datetime.date(2024,2,1)})
+
+        self.assertEqual([t.id for t in m.find(p)], [6, 4])
+
+        p = self.payment({'name': 'Tesco', 'desc': 'tesco', 'amount': 10, 'monthly_day': 2})
+
+        self.assertEqual([t.id for t in m.find(p)], [1])
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    @patch('monzo_utils.model.transaction_metadata.TransactionMetadata.find')
+    def test_find_metadata(self, mock_metadata_find, mock_find):
+        mock_find.return_value = self.transactions
+        mock_metadata_find.return_value = [
+            TransactionMetadata({'transaction_id': 5, 'key': 'metadata_notes', 'value': 'weekly shop'}),
+            TransactionMetadata({'transaction_id': 6, 'key': 'metadata_notes', 'value': 'telly'}),
+            TransactionMetadata({'transaction_id': 1, 'key': 'metadata_other', 'value': 'weekly shop'})
+        ]
+
+        m = PaymentMatcher()
+
+        p = self.payment({'name': 'Shopping', 'desc': 'nomatch', 'amount': 10, 'metadata': {'metadata_notes': 'weekly%'}})
+
+        self.assertEqual([t.id for t in m.find(p)], [5])
+
+        # like the sql join, transactions without any metadata never match
+        p = self.payment({'name': 'Netflix', 'desc': 'netflix', 'amount': 10, 'metadata': {'metadata_notes': 'nomatch'}})
+
+        self.assertEqual([t.id for t in m.find(p)], [6])
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    @patch('monzo_utils.lib.metadata_pivot.MetadataPivot.load')
+    def test_find_metadata_pivot(self, mock_load, mock_find):
+        MetadataPivot().available = True
+
+        mock_find.return_value = self.transactions
+        mock_load.return_value = {
+            5: {'metadata_notes': 'weekly shop', 'metadata_shop': 'tesco'},
+            6: {'metadata_notes': 'telly'},
+            1: {'metadata_other': 'weekly shop'}
+        }
+
+        m = PaymentMatcher()
+
+        p = self.payment({'name': 'Shopping', 'desc': 'nomatch', 'amount': 10, 'metadata': {'metadata_notes': 'weekly%'}})
+
+        self.assertEqual([t.id for t in m.find(p)], [5])
+
+        # every key has to match
+        p = self.payment({'name': 'Shopping', 'desc': 'nomatch', 'amount': 10, 'metadata': {'metadata_notes': 'weekly%', 'metadata_shop': 'asda'}})
+
+        self.assertEqual([t.id for t in m.find(p)], [])
+
+        p = self.payment({'name': 'Shopping', 'desc': 'nomatch', 'amount': 10, 'metadata': {'metadata_notes': 'weekly%', 'metadata_shop': 'TESCO'}})
+
+        self.assertEqual([t.id for t in m.find(p)], [5])
+        self.assertEqual(mock_load.call_count, 1)
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    @patch('monzo_utils.model.provider.Provider.one')
+    @patch('monzo_utils.model.account.Account.one')
+    def test_find_other_accounts(self, mock_account_one, mock_provider_one, mock_find):
+        other = self.transaction(7, 2, '2024-02-10', 'NETFLIX.COM', money_out='10.99')
+
+        mock_find.return_value = self.transactions[0:2] + [other] + self.transactions[2:]
+        mock_provider_one.return_value = Provider({'id': 1})
+        mock_account_one.return_value = Account({'id': 2})
+
+        m = PaymentMatcher()
+
+        payment_config = {'name': 'Netflix', 'desc': 'netflix', 'amount': 10.99, 'other_accounts': [{'provider': 'Monzo', 'name': 'Joint'}]}
+
+        p = self.payment(payment_config)
+
+        self.assertEqual(m.account_ids(p), (1, 2))
+        self.assertEqual(m.account_ids(p), (1, 2))
+
+        mock_account_one.assert_called_once()
+
+        self.assertEqual([t.id for t in m.find(p)], [6, 7, 4, 2])
+
+        mock_find.assert_called_once_with("select * from `transaction` where account_id in (%s,%s) and declined = %s order by created_at desc", [1, 2, 0])
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    def test_prepare_single_pass(self, mock_find):
+        mock_find.return_value = self.transactions
+
+        m = PaymentMatcher()
+
+        payments = [
+            self.payment({'name': 'Netflix', 'desc': 'netflix', 'amount': 10.99}),
+            self.payment({'name': 'Netflix again', 'desc': 'netflix', 'amount': 10.99}),
+            self.payment({'name': 'Tesco', 'desc': 'tesco', 'amount': 12})
+        ]
+
+        with patch.object(PaymentMatcher, 'matches', wraps=m.matches) as mock_matches:
+            m.prepare(payments)
+
+            self.assertEqual(mock_matches.call_count, len(self.transactions) * 2)
+
+            m.find(payments[1])
+
+            self.assertEqual(mock_matches.call_count, len(self.transactions) * 2)
+
+        mock_find.assert_called_once()
+
+        self.assertEqual(len(m.candidates), 2)
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    def test_payment_claims(self, mock_find):
+        mock_find.return_value = self.transactions
+
+        m = PaymentMatcher()
+
+        p1 = self.payment({'name': 'Netflix', 'desc': 'netflix', 'amount': 10.99})
+        p1.matcher = m
+        p2 = self.payment({'name': 'Netflix 2', 'desc': 'netflix', 'amount': 10.99})
+        p2.matcher = m
+
+        self.assertEqual(p1.last_payment.id, 6)
+        self.assertEqual(p2.last_payment.id, 4)
+        self.assertEqual(p2.older_last_payment.id, 2)
+
+        mock_find.assert_called_once()
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    def test_payment_claims_same_name(self, mock_find):
+        mock_find.return_value = self.transactions
+
+        m = PaymentMatcher()
+        claims = ClaimRegistry()
+        payments = []
+
+        # eg a monthly and a yearly entry both called Netflix
+        for payment_config in [{'name': 'Netflix', 'desc': 'netflix', 'amount': 10.99}, {'name': 'Netflix', 'desc': 'netflix', 'amount': 10.99}]:
+            p = self.payment(payment_config)
+            p.matcher = m
+            p.claims = claims
+
+            payments.append(p)
+
+        self.assertEqual(payments[0].last_payment.id, 6)
+        self.assertEqual(payments[1].last_payment.id, 4)
+
+        # a payment rebuilt from the same entry finds the same transaction
+        rebuilt = self.payment(payments[0].payment_config)
+        rebuilt.matcher = m
+        rebuilt.claims = claims
+
+        self.assertEqual(rebuilt.last_payment.id, 6)
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    def test_last_salary_transaction(self, mock_find):
+        mock_find.return_value = [
+            self.transaction(9, 1, '2024-03-15', 'ACME LTD SALARY', money_in='2500.00'),
+            self.transaction(8, 1, '2024-03-01', 'ACME LTD SALARY', money_in='50.00')
+        ] + self.transactions
+
+        m = PaymentMatcher()
+
+        self.assertEqual(m.last_salary_transaction(self.account, 'salary', 1000, 15)['id'], 9)
+        self.assertEqual(m.last_salary_transaction(self.account, ['nomatch', 'acme%salary'], 1000, 17)['id'], 9)
+        self.assertEqual(m.last_salary_transaction(self.account, 'salary', 10, 1)['id'], 8)
+        self.assertEqual(m.last_salary_transaction(self.account, 'salary', 1000, 10), None)
+        self.assertEqual(m.last_salary_transaction(self.account, 'refund', 10, 3)['id'], 3)
+
+        mock_find.assert_called_once()
+
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    def test_last_salary_transaction_before_lookback(self, mock_find):
+        mock_find.side_effect = [
+            self.transactions,
+            [
+                self.transaction(8, 1, '2023-12-20', 'ACME LTD SALARY', money_in='2500.00'),
+                self.transaction(7, 1, '2023-11-15', 'ACME LTD SALARY', money_in='2500.00')
+            ]
+        ]
+
+        m = PaymentMatcher(datetime.date(2024,1,1))
+
+        self.assertEqual(m.last_salary_transaction(self.account, 'salary', 1000, 15)['id'], 7)
+
+        mock_find.assert_called_with("select * from `transaction` where account_id = %s and declined = %s and money_in >= %s and `date` < %s order by created_at desc", [1, 0, 1000, '2024-01-01'])
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    @patch('monzo_utils.model.transaction_metadata.TransactionMetadata.find')
+    def test_load_metadata_since(self, mock_metadata_find, mock_find):
+        mock_metadata_find.return_value = []
+
+        m = PaymentMatcher(datetime.date(2024,1,1))
+        m.load_metadata((1,))
+
+        mock_metadata_find.assert_called_once_with("select transaction_metadata.* from transaction_metadata join `transaction` on `transaction`.id = transaction_metadata.transaction_id where `transaction`.account_id in (%s) and `transaction`.`date` >= %s", [1, '2024-01-01'])
+
+
+    def test_lookback(self):
+        self.assertEqual(PaymentMatcher.lookback({}), datetime.date.today() - datetime.timedelta(days=800))
+        self.assertEqual(PaymentMatcher.lookback({'lookback_days': 30}), datetime.date.today() - datetime.timedelta(days=30))
+        self.assertEqual(PaymentMatcher.lookback({'lookback_days': 0}), None)
+
+
+    @patch('monzo_utils.model.transaction.Transaction.find')
+    def test_finance_older_than_lookback(self, mock_find):
+        payments = [self.transaction(20 + i, 1, '2021-%02d-01' % (i + 1), 'LOAN CO', money_out='10.00') for i in range(0, 12)]
+
+        mock_find.return_value = payments
+
+        m = PaymentMatcher(datetime.date(2021,6,1))
+
+        p = self.payment({'name': 'Loan', 'desc': 'loan', 'amount': 120, 'months': 12, 'start_date': datetime.date(2021,1,1)}, Finance)
+        p.matcher = m
+
+        self.assertFalse(m.covers(p))
+
+        # the plan started before the window so every payment is queried
+        self.assertEqual(p.total_paid, 120)
+        self.assertEqual(p.num_paid, 12)
+        self.assertEqual(m.loaded_accounts, [])
+        mock_find.assert_called_once()
+        self.assertEqual(mock_find.call_args[0][1][-2:], ['2021-01-01', 10.0])
+
+        p = self.payment({'name': 'Loan', 'desc': 'loan', 'amount': 120, 'months': 12, 'start_date': datetime.date(2021,7,1)}, Finance)
+
+        self.assertTrue(m.covers(p))
+        self.assertTrue(PaymentMatcher().covers(p))
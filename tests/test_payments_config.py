@@ -0,0 +1,148 @@
+from base_test import BaseTest
+from monzo_utils.lib.payments_config import PaymentsConfig, PaymentRule, PaymentsConfigError
+import os
+import yaml
+import pickle
+import datetime
+import tempfile
+
+class TestPaymentsConfig(BaseTest):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.config_file = f"{self.tmpdir.name}/Current.yaml"
+        self.cache_file = f"{self.tmpdir.name}/Current.yaml.compiled"
+
+        self.config = {
+            'account': 'Current',
+            'salary_description': 'ACME',
+            'salary_payment_day': 15,
+            'payments': [
+                {
+                    'type': 'Direct Debit',
+                    'payments': [
+                        {'name': 'Gym', 'desc': 'GYM', 'amount': 30},
+                        {'name': 'Insurance', 'desc': ['INS', 'COVER'], 'amount': 300, 'yearly_month': 3, 'yearly_day': 1}
+                    ]
+                },
+                {
+                    'type': 'Card Payment',
+                    'payments': None
+                }
+            ],
+            'refunds_due': [
+                {'name': 'Shoes', 'desc': 'SHOP', 'amount': 50}
+            ]
+        }
+
+        with open(self.config_file, 'w') as f:
+            f.write(yaml.dump(self.config))
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_rule(self):
+        payment_list = {'type': 'Amazon Payments', 'payments': []}
+
+        rule = PaymentRule(payment_list, {'name': 'TV', 'desc': 'AMZ', 'is_yearly': True})
+
+        self.assertEqual(rule.library, 'amazon_payments')
+        self.assertEqual(rule.class_name, 'AmazonPayments')
+        self.assertEqual(rule.annual, True)
+        self.assertEqual(rule.desc, ['AMZ'])
+
+        rule = PaymentRule(payment_list, {'name': 'TV', 'yearly_month': 1})
+
+        self.assertEqual(rule.annual, False)
+        self.assertEqual(rule.desc, [])
+
+
+    def test_compile(self):
+        compiled = PaymentsConfig.compile(self.config_file)
+
+        self.assertEqual(compiled.config, self.config)
+        self.assertEqual([rule.payment_config['name'] for rule in compiled.rules], ['Gym', 'Insurance', 'Shoes'])
+        self.assertEqual([rule.annual for rule in compiled.rules], [False, True, False])
+        self.assertEqual(compiled.rules[2].class_name, 'Refund')
+        self.assertEqual(compiled.patterns, ['ACME', 'GYM', 'INS', 'COVER', 'SHOP'])
+
+        self.assertEqual(compiled.rule(compiled.config['payments'][0]['payments'][1]), compiled.rules[1])
+        self.assertEqual(compiled.rule({'name': 'Gym', 'desc': 'GYM', 'amount': 30}), None)
+
+
+    def test_save_and_load(self):
+        compiled = PaymentsConfig.compile(self.config_file)
+
+        self.assertTrue(compiled.save(self.cache_file))
+
+        loaded = PaymentsConfig.load(self.config_file, self.cache_file)
+
+        self.assertEqual(loaded.config, self.config)
+        self.assertEqual(loaded.key, compiled.key)
+
+        # the rules still point at the loaded config
+        payment_config = loaded.config['refunds_due'][0]
+
+        self.assertEqual(loaded.rule(payment_config).payment_config, payment_config)
+
+
+    def test_load_no_cache(self):
+        self.assertEqual(PaymentsConfig.load(self.config_file, self.cache_file), None)
+
+
+    def test_load_changed_config(self):
+        PaymentsConfig.compile(self.config_file).save(self.cache_file)
+
+        with open(self.config_file, 'a') as f:
+            f.write("notify_credit: false\n")
+
+        self.assertEqual(PaymentsConfig.load(self.config_file, self.cache_file), None)
+
+
+    def test_load_corrupt_cache(self):
+        with open(self.cache_file, 'wb') as f:
+            f.write(b'not a pickle')
+
+        self.assertEqual(PaymentsConfig.load(self.config_file, self.cache_file), None)
+
+        with open(self.cache_file, 'wb') as f:
+            f.write(pickle.dumps({'key': PaymentsConfig.file_key(self.config_file)}))
+
+        self.assertEqual(PaymentsConfig.load(self.config_file, self.cache_file), None)
+
+
+    def test_save_without_file(self):
+        compiled = PaymentsConfig(None, self.config)
+
+        self.assertFalse(compiled.save(self.cache_file))
+        self.assertFalse(os.path.exists(self.cache_file))
+
+
+    def test_validate_unknown_type(self):
+        self.config['payments'][0]['type'] = 'Cheque'
+
+        with self.assertRaises(PaymentsConfigError) as e:
+            PaymentsConfig(None, self.config)
+
+        self.assertEqual(str(e.exception), 'unknown payment type: Cheque')
+
+
+    def test_validate_payment(self):
+        for payment_config, error in [
+            [{'desc': 'X'}, 'Direct Debit payment is missing a name'],
+            [{'name': 'X', 'desc': 1}, 'X: desc must be a string or a list of strings'],
+            [{'name': 'X', 'start_date': '2024-01-01'}, 'X: start_date must be a date (YYYY-MM-DD)'],
+            [{'name': 'X', 'yearly_month': 13, 'yearly_day': 1}, 'X: yearly_month must be 1-12'],
+            [{'name': 'X', 'yearly_month': 1, 'yearly_day': 0}, 'X: yearly_day must be 1-31'],
+            [{'name': 'X', 'exclude_months': [0]}, 'X: exclude_months must be 1-12'],
+            [{'name': 'X', 'renewal': {'amount': 1}}, 'X: renewal needs a date (YYYY-MM-DD)'],
+            [{'name': 'X', 'renewal': {'date': datetime.date(2024,1,1)}}, 'X: renewal needs an amount']
+        ]:
+            self.config['payments'][0]['payments'] = [payment_config]
+
+            with self.assertRaises(PaymentsConfigError) as e:
+                PaymentsConfig(None, self.config)
+
+            self.assertEqual(str(e.exception), error)
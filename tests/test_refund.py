@@ -345,6 +345,8 @@ class TestRefund(BaseTest):
 
             mock_due_date.return_value = datetime.date(2024,3,1)
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'SKIPPED')
 
 
@@ -377,6 +379,8 @@ class TestRefund(BaseTest):
 
             p.payment_config['due_after'] = datetime.date(2024,3,1)
 
+            p.invalidate('status')
+
             self.assertEqual(p.status, 'SKIPPED')
 
 
@@ -1567,6 +1571,8 @@ class TestRefund(BaseTest):
 
         mock_last_date.return_value = datetime.date(2023,12,28)
 
+        p.invalidate('due_date')
+
         self.assertEqual(p.due_date, datetime.date(2024,1,28))
 
 
@@ -1635,6 +1641,8 @@ class TestRefund(BaseTest):
 
         p.payment_config['exclude_months'] = [12]
 
+        p.invalidate('due_date')
+
         self.assertEqual(p.due_date, datetime.date(2024,1,28))
 
 
@@ -1667,6 +1675,8 @@ class TestRefund(BaseTest):
 
         p.payment_config['renew_date'] = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -1701,6 +1711,8 @@ class TestRefund(BaseTest):
 
         p.payment_config['start_date'] = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -1763,6 +1775,8 @@ class TestRefund(BaseTest):
 
         mock_due_date.return_value = datetime.date(2024,4,1)
 
+        p.invalidate('due_next_month')
+
         self.assertEqual(p.due_next_month, False)
 
 
@@ -0,0 +1,216 @@
+from base_test import BaseTest
+from unittest.mock import patch
+from unittest.mock import MagicMock
+from monzo_utils.lib.request_scheduler import RequestScheduler, TokenBucket
+from monzo.exceptions import MonzoRateError, MonzoServerError, MonzoPermissionsError
+import pytest
+import email.utils
+import datetime
+
+class TestRequestScheduler(BaseTest):
+
+    def setUp(self):
+        RequestScheduler._instances = {}
+
+
+    def rate_error(self, retry_after=None):
+        cause = Exception('429')
+        cause.headers = {}
+
+        if retry_after is not None:
+            cause.headers['Retry-After'] = retry_after
+
+        try:
+            raise MonzoRateError('rate limited') from cause
+        except MonzoRateError as e:
+            return e
+
+
+    def test_constructor_defaults(self):
+        s = RequestScheduler()
+
+        self.assertEqual(s.max_attempts, 5)
+        self.assertEqual(s.base_delay, 1)
+        self.assertEqual(s.max_delay, 60)
+        self.assertEqual(s.endpoints['transactions'], {'rate': 5, 'burst': 10})
+        self.assertEqual(s.semaphore._initial_value, 4)
+
+
+    def test_constructor_config(self):
+        s = RequestScheduler({
+            'concurrency': 2,
+            'max_attempts': 3,
+            'endpoints': {
+                'transactions': {
+                    'rate': 1
+                },
+                'webhooks': {
+                    'burst': 1
+                }
+            }
+        })
+
+        self.assertEqual(s.max_attempts, 3)
+        self.assertEqual(s.endpoints['transactions'], {'rate': 1, 'burst': 10})
+        self.assertEqual(s.endpoints['webhooks'], {'rate': 5, 'burst': 1})
+        self.assertEqual(s.semaphore._initial_value, 2)
+
+
+    def test_configure(self):
+        s = RequestScheduler()
+        s.bucket('transactions')
+
+        RequestScheduler().configure({'max_attempts': 2, 'endpoints': {'transactions': {'rate': 1}}})
+
+        self.assertEqual(s.max_attempts, 2)
+        self.assertEqual(s.endpoints['transactions'], {'rate': 1, 'burst': 10})
+        self.assertEqual(s.buckets, {})
+
+        # settings that aren't given go back to their defaults
+        s.configure()
+
+        self.assertEqual(s.max_attempts, 5)
+        self.assertEqual(s.endpoints['transactions'], {'rate': 5, 'burst': 10})
+
+
+    @patch('time.sleep')
+    def test_call_success(self, mock_sleep):
+        s = RequestScheduler()
+
+        func = MagicMock()
+        func.return_value = 'resp'
+
+        self.assertEqual(s.call('transactions', func, 'client', account_id=123), 'resp')
+
+        func.assert_called_with('client', account_id=123)
+        mock_sleep.assert_not_called()
+
+
+    @patch('time.sleep')
+    @patch('monzo_utils.lib.log.Log.warning')
+    def test_call_retries_server_error(self, mock_warning, mock_sleep):
+        s = RequestScheduler()
+
+        func = MagicMock()
+        func.side_effect = [MonzoServerError('error'), MonzoServerError('error'), 'resp']
+
+        self.assertEqual(s.call('transactions', func), 'resp')
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 2)
+
+        for call in mock_sleep.call_args_list:
+            self.assertLessEqual(call[0][0], 60)
+
+
+    @patch('time.sleep')
+    @patch('monzo_utils.lib.log.Log.warning')
+    def test_call_gives_up(self, mock_warning, mock_sleep):
+        s = RequestScheduler({'max_attempts': 3})
+
+        func = MagicMock()
+        func.side_effect = MonzoServerError('error')
+
+        with pytest.raises(MonzoServerError):
+            s.call('transactions', func)
+
+        self.assertEqual(func.call_count, 3)
+
+
+    @patch('time.sleep')
+    def test_call_does_not_retry_permissions_error(self, mock_sleep):
+        s = RequestScheduler()
+
+        func = MagicMock()
+        func.side_effect = MonzoPermissionsError('error')
+
+        with pytest.raises(MonzoPermissionsError):
+            s.call('transactions', func)
+
+        self.assertEqual(func.call_count, 1)
+        mock_sleep.assert_not_called()
+
+
+    @patch('time.sleep')
+    @patch('monzo_utils.lib.log.Log.warning')
+    def test_call_honours_retry_after(self, mock_warning, mock_sleep):
+        s = RequestScheduler()
+
+        func = MagicMock()
+        func.side_effect = [self.rate_error('7'), 'resp']
+
+        self.assertEqual(s.call('transactions', func), 'resp')
+
+        # once for the retry delay and once for the paused bucket
+        self.assertEqual(mock_sleep.call_args_list[0][0][0], 7)
+        self.assertGreater(s.bucket('transactions').paused_until, 0)
+
+
+    def test_retry_after_seconds(self):
+        s = RequestScheduler()
+
+        self.assertEqual(s.retry_after(self.rate_error('12')), 12)
+
+
+    def test_retry_after_date(self):
+        s = RequestScheduler()
+
+        retry_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=30)
+
+        delay = s.retry_after(self.rate_error(email.utils.format_datetime(retry_at)))
+
+        self.assertGreater(delay, 25)
+        self.assertLessEqual(delay, 30)
+
+
+    def test_retry_after_missing(self):
+        s = RequestScheduler()
+
+        self.assertEqual(s.retry_after(self.rate_error()), None)
+        self.assertEqual(s.retry_after(MonzoServerError('error')), None)
+
+
+    def test_backoff(self):
+        s = RequestScheduler({'base_delay': 2, 'max_delay': 10})
+
+        for attempt in range(0, 10):
+            delay = s.backoff(attempt)
+
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(10, 2 * (2 ** attempt)))
+
+
+    @patch('time.sleep')
+    @patch('time.monotonic')
+    def test_token_bucket(self, mock_monotonic, mock_sleep):
+        mock_monotonic.return_value = 100
+
+        bucket = TokenBucket(2, 2)
+
+        bucket.acquire()
+        bucket.acquire()
+
+        mock_sleep.assert_not_called()
+
+        bucket.acquire()
+
+        mock_sleep.assert_called_with(0.5)
+
+        mock_monotonic.return_value = 102
+        mock_sleep.reset_mock()
+
+        bucket.acquire()
+
+        mock_sleep.assert_not_called()
+
+
+    @patch('time.sleep')
+    @patch('time.monotonic')
+    def test_token_bucket_pause(self, mock_monotonic, mock_sleep):
+        mock_monotonic.return_value = 100
+
+        bucket = TokenBucket(2, 2)
+        bucket.pause(10)
+
+        bucket.acquire()
+
+        mock_sleep.assert_called_with(10)
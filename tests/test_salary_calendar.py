@@ -0,0 +1,147 @@
+from base_test import BaseTest
+from unittest.mock import patch
+from unittest.mock import MagicMock
+from monzo_utils.lib.salary_calendar import SalaryCalendar
+import os
+import json
+import datetime
+import tempfile
+
+class TestSalaryCalendar(BaseTest):
+
+    def setUp(self):
+        SalaryCalendar.bank_holidays_cache = {}
+        SalaryCalendar.calendars = {}
+
+
+    def test_constructor_precomputes_pay_dates(self):
+        calendar = SalaryCalendar(15, start_year=2024, years=2)
+
+        self.assertEqual(len(calendar.pay_dates), 24)
+        self.assertEqual(calendar.pay_dates[2024 * 12], datetime.date(2024,1,15))
+        self.assertEqual(calendar.pay_dates[2024 * 12 + 5], datetime.date(2024,6,14))
+
+
+    def test_get(self):
+        calendar = SalaryCalendar.get(15)
+
+        self.assertEqual(SalaryCalendar.get(15), calendar)
+        self.assertNotEqual(SalaryCalendar.get(15, set()), calendar)
+        self.assertNotEqual(SalaryCalendar.get(14), calendar)
+
+        holidays = set([datetime.date(2024,12,25)])
+
+        self.assertEqual(SalaryCalendar.get(15, holidays).holidays, holidays)
+
+
+    def test_nominal_date(self):
+        calendar = SalaryCalendar(31, start_year=2024, years=0)
+
+        self.assertEqual(calendar.nominal_date(2024 * 12), datetime.date(2024,1,31))
+        self.assertEqual(calendar.nominal_date(2024 * 12 + 1), None)
+        self.assertEqual(calendar.next_index(2024 * 12 + 1), 2024 * 12 + 2)
+
+
+    def test_next_salary_date(self):
+        calendar = SalaryCalendar(1, start_year=2024, years=0)
+
+        self.assertEqual(calendar.next_salary_date(datetime.date(2024,1,1)), datetime.date(2024,2,1))
+
+
+    def test_next_salary_date_weekend(self):
+        calendar = SalaryCalendar(3, start_year=2024, years=0)
+
+        self.assertEqual(calendar.next_salary_date(datetime.date(2024,1,3)), datetime.date(2024,2,2))
+
+
+    def test_next_salary_date_previous_month(self):
+        calendar = SalaryCalendar(1, start_year=2024, years=0)
+
+        # june 1st 2024 was a saturday so salary was paid on may 31st
+        self.assertEqual(calendar.next_salary_date(datetime.date(2024,5,31)), datetime.date(2024,7,1))
+
+
+    def test_next_salary_date_end_of_year(self):
+        calendar = SalaryCalendar(15, start_year=2024, years=0)
+
+        self.assertEqual(calendar.next_salary_date(datetime.date(2024,12,30)), datetime.date(2025,2,14))
+
+
+    def test_next_salary_date_short_months(self):
+        calendar = SalaryCalendar(31, start_year=2024, years=0)
+
+        self.assertEqual(calendar.next_salary_date(datetime.date(2024,1,31)), datetime.date(2024,3,29))
+        self.assertEqual(calendar.next_salary_date(datetime.date(2024,4,10)), datetime.date(2024,7,31))
+
+
+    def test_next_salary_date_bank_holidays(self):
+        calendar = SalaryCalendar(25, set([datetime.date(2024,12,25), datetime.date(2024,12,26)]), start_year=2024, years=0)
+
+        self.assertEqual(calendar.next_salary_date(datetime.date(2024,11,25)), datetime.date(2024,12,24))
+
+
+    def test_next_salary_date_extra_holidays(self):
+        self.assertEqual(SalaryCalendar(1, start_year=2024, years=0).next_salary_date(datetime.date(2024,3,1)), datetime.date(2024,4,1))
+        self.assertEqual(SalaryCalendar(1, set(), start_year=2024, years=0).next_salary_date(datetime.date(2024,3,1)), datetime.date(2024,3,29))
+
+
+    @patch('govuk_bank_holidays.bank_holidays.BankHolidays')
+    def test_load_bank_holidays_fresh_cache(self, mock_bank_holidays):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_file = f"{tmpdir}/bank_holidays.json"
+
+            with open(cache_file, 'w') as f:
+                f.write(json.dumps(['2024-12-25']))
+
+            self.assertEqual(SalaryCalendar.load_bank_holidays(cache_file), set([datetime.date(2024,12,25)]))
+
+        mock_bank_holidays.assert_not_called()
+
+
+    @patch('govuk_bank_holidays.bank_holidays.BankHolidays')
+    def test_load_bank_holidays_expired_cache(self, mock_bank_holidays):
+        mock_bank_holidays.return_value.get_holidays.return_value = [{'date': datetime.date(2025,1,1)}]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_file = f"{tmpdir}/bank_holidays.json"
+
+            with open(cache_file, 'w') as f:
+                f.write(json.dumps(['2024-12-25']))
+
+            os.utime(cache_file, (0, 0))
+
+            self.assertEqual(SalaryCalendar.load_bank_holidays(cache_file), set([datetime.date(2025,1,1)]))
+            self.assertEqual(json.loads(open(cache_file).read()), ['2025-01-01'])
+
+        mock_bank_holidays.assert_called_once_with()
+
+
+    @patch('govuk_bank_holidays.bank_holidays.BankHolidays')
+    def test_load_bank_holidays_download_fails(self, mock_bank_holidays):
+        mock_bank_holidays.side_effect = Exception('offline')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_file = f"{tmpdir}/bank_holidays.json"
+
+            with open(cache_file, 'w') as f:
+                f.write(json.dumps(['2024-12-25']))
+
+            os.utime(cache_file, (0, 0))
+
+            self.assertEqual(SalaryCalendar.load_bank_holidays(cache_file), set([datetime.date(2024,12,25)]))
+
+        self.assertEqual(mock_bank_holidays.call_count, 1)
+
+
+    @patch('govuk_bank_holidays.bank_holidays.BankHolidays')
+    def test_load_bank_holidays_bundled_fallback(self, mock_bank_holidays):
+        bundled = MagicMock()
+        bundled.get_holidays.return_value = [{'date': datetime.date(2024,12,25)}]
+
+        mock_bank_holidays.side_effect = [Exception('offline'), bundled]
+
+        self.assertEqual(SalaryCalendar.load_bank_holidays(), set([datetime.date(2024,12,25)]))
+        self.assertEqual(SalaryCalendar.load_bank_holidays(), set([datetime.date(2024,12,25)]))
+
+        mock_bank_holidays.assert_called_with(use_cached_holidays=True)
+        self.assertEqual(mock_bank_holidays.call_count, 2)
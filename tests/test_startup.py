@@ -0,0 +1,80 @@
+from base_test import BaseTest
+import os
+import sys
+import ast
+import json
+import subprocess
+
+ROOT = os.path.realpath(os.path.dirname(__file__) + "/../")
+
+# the interactive commands should be able to start in tens of milliseconds so
+# their imports are held to a budget, generous enough for a slow CI box
+IMPORT_BUDGET = 0.25
+
+# modules that are slow to import or only needed for some code paths. these
+# must only be imported when they're actually used
+DEFERRED = [
+    'MySQLdb',
+    'dateparser',
+    'pushover',
+    'requests',
+    'monzo',
+    'currency_converter',
+    'govuk_bank_holidays',
+    'monzo_utils.lib.monzo_api',
+    'monzo_utils.lib.monzo_sync'
+]
+
+# runs the top-level imports of a script in a fresh interpreter and reports how
+# long they took and which of the deferred modules were loaded
+PROBE = """
+import sys
+import json
+import time
+
+start = time.perf_counter()
+
+exec(compile(sys.argv[1], 'imports', 'exec'))
+
+print(json.dumps({
+    'elapsed': time.perf_counter() - start,
+    'loaded': [m for m in json.loads(sys.argv[2]) if m in sys.modules]
+}))
+"""
+
+class TestStartup(BaseTest):
+
+    def script_imports(self, script):
+        tree = ast.parse(open(f"{ROOT}/{script}").read())
+
+        imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+        return ast.unparse(ast.Module(body=imports, type_ignores=[]))
+
+
+    def probe(self, script):
+        output = subprocess.check_output(
+            [sys.executable, '-c', PROBE, self.script_imports(script), json.dumps(DEFERRED)],
+            cwd=ROOT
+        )
+
+        return json.loads(output)
+
+
+    def check(self, script):
+        result = self.probe(script)
+
+        self.assertEqual(result['loaded'], [])
+        self.assertLess(result['elapsed'], IMPORT_BUDGET)
+
+
+    def test_monzo_status(self):
+        self.check('monzo-status')
+
+
+    def test_monzo_search(self):
+        self.check('monzo-search')
+
+
+    def test_monzo_payments(self):
+        self.check('monzo-payments')
@@ -0,0 +1,181 @@
+from base_test import BaseTest
+from unittest.mock import patch
+from monzo_utils.lib.sync_metrics import SyncMetrics, PHASES, LATENCY_BUCKETS
+import os
+import json
+import tempfile
+
+class TestSyncMetrics(BaseTest):
+
+    def test_constructor(self):
+        metrics = SyncMetrics()
+
+        self.assertEqual(list(metrics.phases.keys()), PHASES)
+        self.assertEqual(metrics.rows, {'inserted': 0, 'updated': 0, 'unchanged': 0})
+        self.assertEqual(metrics.latency, {})
+        self.assertEqual(metrics.finished, None)
+
+
+    @patch('time.monotonic')
+    def test_phase(self, mock_monotonic):
+        mock_monotonic.side_effect = [10, 12.5]
+
+        metrics = SyncMetrics()
+
+        with metrics.phase('pot_sync'):
+            pass
+
+        self.assertEqual(metrics.phases['pot_sync'], {'seconds': 2.5, 'count': 1})
+        self.assertEqual(metrics.stack, [])
+
+
+    @patch('time.monotonic')
+    def test_phase_nested(self, mock_monotonic):
+        # pot_transactions 10-11 and 14-15, db_upsert 11-13, metadata_diff 13-14
+        mock_monotonic.side_effect = [10, 11, 12, 13, 14, 15]
+
+        metrics = SyncMetrics()
+
+        with metrics.phase('pot_transactions'):
+            with metrics.phase('db_upsert'):
+                with metrics.phase('metadata_diff'):
+                    pass
+
+        self.assertEqual(metrics.phases['pot_transactions']['seconds'], 2)
+        self.assertEqual(metrics.phases['db_upsert']['seconds'], 2)
+        self.assertEqual(metrics.phases['metadata_diff']['seconds'], 1)
+
+
+    @patch('time.monotonic')
+    def test_phase_exception(self, mock_monotonic):
+        mock_monotonic.side_effect = [10, 11]
+
+        metrics = SyncMetrics()
+
+        with self.assertRaises(Exception):
+            with metrics.phase('transaction_fetch'):
+                raise Exception('server error')
+
+        self.assertEqual(metrics.phases['transaction_fetch'], {'seconds': 1, 'count': 1})
+        self.assertEqual(metrics.stack, [])
+
+
+    @patch('time.monotonic')
+    def test_api_call(self, mock_monotonic):
+        mock_monotonic.side_effect = [10, 10.3]
+
+        metrics = SyncMetrics()
+
+        with metrics.api_call('transactions'):
+            pass
+
+        self.assertEqual(metrics.latency['transactions']['count'], 1)
+        self.assertEqual(metrics.latency['transactions']['buckets'], [0, 0, 0, 1, 1, 1, 1, 1])
+
+
+    def test_observe(self):
+        metrics = SyncMetrics()
+
+        metrics.observe('pots', 0.01)
+        metrics.observe('pots', 3)
+        metrics.observe('pots', 20)
+
+        self.assertEqual(metrics.latency['pots']['buckets'], [1, 1, 1, 1, 1, 1, 2, 2])
+        self.assertAlmostEqual(metrics.latency['pots']['sum'], 23.01)
+        self.assertEqual(metrics.latency['pots']['count'], 3)
+
+
+    def test_row(self):
+        metrics = SyncMetrics()
+
+        metrics.row('inserted')
+        metrics.row('unchanged')
+        metrics.row('unchanged')
+
+        self.assertEqual(metrics.rows, {'inserted': 1, 'updated': 0, 'unchanged': 2})
+
+
+    def test_to_dict(self):
+        metrics = SyncMetrics()
+        metrics.accounts = 2
+        metrics.observe('accounts', 0.2)
+        metrics.row('updated')
+        metrics.finish()
+
+        data = metrics.to_dict()
+
+        self.assertEqual(data['accounts'], 2)
+        self.assertEqual(data['rows']['updated'], 1)
+        self.assertEqual(data['api_latency']['accounts']['buckets']['0.25'], 1)
+        self.assertEqual(data['api_latency']['accounts']['buckets']['0.1'], 0)
+        self.assertEqual(data['phases']['db_upsert'], {'seconds': 0, 'count': 0})
+        self.assertEqual(data['finished'], metrics.finished)
+
+
+    def test_to_prometheus(self):
+        metrics = SyncMetrics()
+        metrics.observe('transactions', 0.2)
+        metrics.row('inserted')
+        metrics.finish()
+
+        lines = metrics.to_prometheus().split("\n")
+
+        self.assertIn('monzo_sync_rows{result="inserted"} 1', lines)
+        self.assertIn('monzo_sync_phase_seconds{phase="db_upsert"} 0.000000', lines)
+        self.assertIn('monzo_sync_api_latency_seconds_bucket{endpoint="transactions",le="0.1"} 0', lines)
+        self.assertIn('monzo_sync_api_latency_seconds_bucket{endpoint="transactions",le="0.25"} 1', lines)
+        self.assertIn('monzo_sync_api_latency_seconds_bucket{endpoint="transactions",le="+Inf"} 1', lines)
+        self.assertIn('monzo_sync_api_latency_seconds_count{endpoint="transactions"} 1', lines)
+        self.assertIn('# TYPE monzo_sync_api_latency_seconds histogram', lines)
+
+
+    def test_write(self):
+        metrics = SyncMetrics()
+        metrics.row('inserted')
+        metrics.finish()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            metrics.write(f"{tmpdir}/monzo_sync.prom", f"{tmpdir}/monzo_sync.json")
+
+            self.assertIn('monzo_sync_rows{result="inserted"} 1', open(f"{tmpdir}/monzo_sync.prom").read())
+            self.assertEqual(json.loads(open(f"{tmpdir}/monzo_sync.json").read())['rows']['inserted'], 1)
+            self.assertEqual(sorted(os.listdir(tmpdir)), ['monzo_sync.json', 'monzo_sync.prom'])
+
+
+    def test_prometheus_accounts(self):
+        current = SyncMetrics('Current')
+        current.row('inserted')
+        current.finish()
+
+        joint = SyncMetrics('Joint "Bills"')
+        joint.observe('transactions', 0.2)
+        joint.finish()
+
+        text = SyncMetrics.prometheus([current, joint])
+        lines = text.split("\n")
+
+        self.assertIn('monzo_sync_rows{account="Current",result="inserted"} 1', lines)
+        self.assertIn('monzo_sync_rows{account="Joint \\"Bills\\"",result="inserted"} 0', lines)
+        self.assertIn('monzo_sync_api_latency_seconds_count{account="Joint \\"Bills\\"",endpoint="transactions"} 1', lines)
+
+        # each family is only described once
+        self.assertEqual(text.count('# TYPE monzo_sync_rows gauge'), 1)
+
+
+    def test_write_all(self):
+        current = SyncMetrics('Current')
+        current.row('inserted')
+        current.finish()
+
+        joint = SyncMetrics('Joint')
+        joint.row('updated')
+        joint.finish()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            SyncMetrics.write_all([current, joint], f"{tmpdir}/monzo_sync.prom", f"{tmpdir}/monzo_sync.json")
+
+            data = json.loads(open(f"{tmpdir}/monzo_sync.json").read())
+
+            self.assertEqual(sorted(data['accounts'].keys()), ['Current', 'Joint'])
+            self.assertEqual(data['accounts']['Joint']['rows']['updated'], 1)
+            self.assertIn('monzo_sync_rows{account="Current",result="inserted"} 1', open(f"{tmpdir}/monzo_sync.prom").read())
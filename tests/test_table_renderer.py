@@ -0,0 +1,62 @@
+from base_test import BaseTest
+from unittest.mock import MagicMock
+from monzo_utils.lib.table_renderer import TableRenderer
+import io
+
+class TestTableRenderer(BaseTest):
+
+    def setUp(self):
+        self.rows = [
+            {'name': 'a', 'amount': 1},
+            {'name': 'bbbbbb', 'amount': 22},
+            {'name': 'cc', 'amount': 333333}
+        ]
+
+
+    def test_render(self):
+        out = io.StringIO()
+
+        count = TableRenderer(['name', 'amount'], align={'amount': 'right'}, out=out).render(iter(self.rows))
+
+        self.assertEqual(count, 3)
+        self.assertEqual(out.getvalue(),
+            "name    amount  \n" +
+            "----------------\n" +
+            "a            1  \n" +
+            "bbbbbb      22  \n" +
+            "cc      333333  \n"
+        )
+
+
+    def test_sample(self):
+        out = io.StringIO()
+
+        TableRenderer(['name', 'amount'], out=out, sample_size=1).render(iter(self.rows))
+
+        # widths come from the first row only so later rows overflow
+        self.assertEqual(out.getvalue().split("\n")[3], "bbbbbb  22      ")
+
+
+    def test_chunks(self):
+        out = MagicMock()
+
+        rows = ({'name': str(i), 'amount': i} for i in range(0, 10))
+
+        count = TableRenderer(['name', 'amount'], out=out, sample_size=2, chunk_size=4).render(rows)
+
+        self.assertEqual(count, 10)
+
+        # header plus 3 rows, then 4 rows at a time
+        self.assertEqual(len(out.write.call_args_list), 3)
+        self.assertEqual(out.write.call_args_list[0][0][0].count("\n"), 5)
+        self.assertEqual(out.write.call_args_list[1][0][0].count("\n"), 4)
+        self.assertEqual(out.write.call_args_list[2][0][0].count("\n"), 3)
+
+
+    def test_empty(self):
+        out = io.StringIO()
+
+        count = TableRenderer(['name', 'amount'], out=out).render([])
+
+        self.assertEqual(count, 0)
+        self.assertEqual(out.getvalue(), "name  amount  \n--------------\n")
@@ -0,0 +1,154 @@
+from base_test import BaseTest
+from unittest.mock import patch
+from unittest.mock import MagicMock
+from monzo_utils.lib.config import Config
+from monzo_utils.lib.log import Log
+from monzo_utils.lib.tenant_orchestrator import TenantOrchestrator, run_tenant, sync_tenant
+import pytest
+import os
+import time
+import queue
+import tempfile
+
+def sync_ok(config_path, days):
+    pass
+
+
+def sync_fail(config_path, days):
+    if config_path.endswith('tenant2'):
+        raise Exception('token expired')
+
+
+def sync_exit(config_path, days):
+    os._exit(3)
+
+
+def sync_slow(config_path, days):
+    time.sleep(30)
+
+
+class TestTenantOrchestrator(BaseTest):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        self.paths = []
+
+        for i in range(1, 4):
+            path = f"{self.tmpdir.name}/tenant{i}"
+            os.mkdir(path)
+            self.paths.append(path)
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_constructor(self):
+        o = TenantOrchestrator(self.paths + [self.paths[0]], 0, 60, 7)
+
+        self.assertEqual(o.config_paths, [os.path.realpath(p) for p in self.paths])
+        self.assertEqual(o.processes, 1)
+        self.assertEqual(o.timeout, 60)
+        self.assertEqual(o.days, 7)
+
+
+    def test_validate(self):
+        open(f"{self.paths[0]}/config.yaml", 'w').close()
+
+        o = TenantOrchestrator(self.paths)
+
+        errors = o.validate()
+
+        self.assertEqual(len(errors), 2)
+        self.assertIn('tenant2', errors[0])
+        self.assertIn('tenant3', errors[1])
+
+
+    @patch('monzo_utils.lib.tenant_orchestrator.sync_tenant', new=sync_fail)
+    def test_run_tenant(self):
+        results = queue.Queue()
+
+        run_tenant(self.paths[0], 3, results)
+        run_tenant(self.paths[1], 3, results)
+
+        result = results.get()
+
+        self.assertEqual(result['tenant'], self.paths[0])
+        self.assertEqual(result['status'], 'ok')
+        self.assertEqual(result['error'], None)
+
+        result = results.get()
+
+        self.assertEqual(result['status'], 'failed')
+        self.assertEqual(result['error'], 'Exception: token expired')
+
+
+    @patch('monzo_utils.lib.tenant_orchestrator.sync_tenant', new=sync_fail)
+    def test_run(self):
+        o = TenantOrchestrator(self.paths, 2)
+
+        report = o.run()
+
+        self.assertEqual(report['tenants'], 3)
+        self.assertEqual(report['succeeded'], 2)
+        self.assertEqual(report['failed'], 1)
+        self.assertEqual([r['tenant'] for r in report['results']], [os.path.realpath(p) for p in self.paths])
+        self.assertEqual(report['results'][1]['status'], 'failed')
+
+
+    @patch('monzo_utils.lib.tenant_orchestrator.sync_tenant', new=sync_exit)
+    def test_run_process_died(self):
+        o = TenantOrchestrator(self.paths[0:1])
+
+        report = o.run()
+
+        self.assertEqual(report['failed'], 1)
+        self.assertIn('exited with code 3', report['results'][0]['error'])
+
+
+    @patch('monzo_utils.lib.tenant_orchestrator.sync_tenant', new=sync_slow)
+    def test_run_timeout(self):
+        o = TenantOrchestrator(self.paths[0:1], 1, 0.5)
+
+        report = o.run()
+
+        self.assertEqual(report['results'][0]['status'], 'timeout')
+        self.assertLess(report['wall_time'], 10)
+
+
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.__init__')
+    @patch('monzo_utils.lib.monzo_sync.MonzoSync.sync')
+    @patch('monzo_utils.lib.config.Config.__init__')
+    @patch('monzo_utils.lib.log.Log.__init__')
+    def test_sync_tenant(self, mock_log_init, mock_config_init, mock_sync, mock_sync_init):
+        Config._instances = {}
+        Log._instances = {}
+
+        mock_log_init.return_value = None
+        mock_config_init.return_value = None
+        mock_sync_init.return_value = None
+
+        with patch.dict(os.environ, {}):
+            sync_tenant('/tmp/tenant1', 5)
+
+            self.assertEqual(os.environ['NO_AUTH'], '1')
+
+        mock_log_init.assert_called_with('/tmp/tenant1')
+        mock_config_init.assert_called_with(None, '/tmp/tenant1')
+        mock_sync_init.assert_called_with(config_path='/tmp/tenant1')
+        mock_sync.assert_called_with(5)
+
+
+    def test_display(self):
+        o = TenantOrchestrator(self.paths)
+
+        report = o.report([
+            {'tenant': 'tenant1', 'status': 'ok', 'duration': 1.5, 'error': None},
+            {'tenant': 'tenant2', 'status': 'failed', 'duration': 0.5, 'error': 'blah'}
+        ], 1.6)
+
+        self.assertEqual(report['total_sync_time'], 2.0)
+        self.assertEqual(report['max_sync_time'], 1.5)
+
+        o.display(report)
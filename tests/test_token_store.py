@@ -0,0 +1,89 @@
+from base_test import BaseTest
+from unittest.mock import patch
+from monzo_utils.lib.token_store import TokenStore
+import os
+import json
+import time
+import tempfile
+import threading
+
+class TestTokenStore(BaseTest):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.token_file = f"{self.tmpdir.name}/tokens"
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_get(self):
+        store = TokenStore.get(self.token_file)
+
+        self.assertIs(TokenStore.get(self.token_file), store)
+        self.assertIsNot(TokenStore.get(self.token_file + '2'), store)
+
+
+    def test_load_no_file(self):
+        store = TokenStore(self.token_file)
+
+        self.assertEqual(store.load(), None)
+
+
+    def test_save_and_load(self):
+        store = TokenStore(self.token_file)
+
+        tokens = {'access_token': 'a', 'expiry': 123, 'refresh_token': 'r'}
+
+        store.save(tokens)
+
+        self.assertEqual(json.loads(open(self.token_file).read()), tokens)
+        self.assertFalse(os.path.exists(self.token_file + '.new'))
+
+        self.assertEqual(TokenStore(self.token_file).load(), tokens)
+
+
+    def test_load_cached(self):
+        store = TokenStore(self.token_file)
+        store.save({'access_token': 'a', 'expiry': 123, 'refresh_token': 'r'})
+
+        with patch('builtins.open') as mock_open:
+            store.load()
+
+            mock_open.assert_not_called()
+
+
+    def test_load_changed_by_another_process(self):
+        store = TokenStore(self.token_file)
+        store.save({'access_token': 'a', 'expiry': 123, 'refresh_token': 'r'})
+
+        TokenStore(self.token_file).save({'access_token': 'b', 'expiry': 456, 'refresh_token': 'r2'})
+
+        self.assertEqual(store.load()['access_token'], 'b')
+
+
+    def test_lock(self):
+        store1 = TokenStore(self.token_file)
+        store2 = TokenStore(self.token_file)
+
+        events = []
+
+        def hold_lock():
+            with store1.lock():
+                events.append('locked')
+                time.sleep(0.3)
+                events.append('released')
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+
+        while 'locked' not in events:
+            time.sleep(0.01)
+
+        with store2.lock():
+            events.append('acquired')
+
+        thread.join()
+
+        self.assertEqual(events, ['locked', 'released', 'acquired'])
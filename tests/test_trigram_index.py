@@ -0,0 +1,130 @@
+from base_test import BaseTest
+from monzo_utils.lib.config import Config
+from monzo_utils.lib.db import DB
+from monzo_utils.lib.trigram_index import TrigramIndex
+import os
+import tempfile
+
+SCHEMA = os.path.realpath(os.path.dirname(__file__) + "/../schema_sqlite3.sql")
+
+class TestTrigramIndex(BaseTest):
+
+    def setUp(self):
+        Config._instances = {}
+        DB._instances = {}
+        TrigramIndex._instances = {}
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+        DB({'driver': 'sqlite', 'path': f"{self.tmpdir.name}/data.db"})
+        DB().driver.db.executescript(open(SCHEMA).read())
+
+
+    def tearDown(self):
+        DB._instances = {}
+        self.tmpdir.cleanup()
+
+
+    def postings(self, record_type, record_id):
+        rows = DB().query("select trigram, trigrams from search_trigram where record_type = %s and record_id = %s order by trigram", [record_type, record_id])
+
+        return [[row['trigram'], row['trigrams']] for row in rows]
+
+
+    def results(self, term):
+        return [[match['record_type'], match['record_id'], round(match['score'], 2), round(match['similarity'], 2)] for match in TrigramIndex().search(term)]
+
+
+    def test_enabled(self):
+        self.assertTrue(TrigramIndex().enabled())
+
+        DB().query("drop table search_trigram")
+
+        TrigramIndex._instances = {}
+        DB().columns = {}
+
+        self.assertFalse(TrigramIndex().enabled())
+
+
+    def test_trigrams(self):
+        self.assertEqual(TrigramIndex().trigrams('Tesco'), set(['  t', ' te', 'tes', 'esc', 'sco', 'co ']))
+        self.assertEqual(TrigramIndex().trigrams('A-B'), set(['  a', ' a ', '  b', ' b ']))
+        self.assertEqual(TrigramIndex().trigrams(''), set())
+        self.assertEqual(TrigramIndex().trigrams(None), set())
+
+
+    def test_update(self):
+        TrigramIndex().update('merchant', 1, None, 'Tesco')
+
+        self.assertEqual(self.postings('merchant', 1), [['  t', 6], [' te', 6], ['co ', 6], ['esc', 6], ['sco', 6], ['tes', 6]])
+
+        TrigramIndex().update('merchant', 1, 'Tesco', 'Tesco')
+
+        self.assertEqual(len(self.postings('merchant', 1)), 6)
+
+        TrigramIndex().update('merchant', 1, 'Tesco', 'Co')
+
+        self.assertEqual(self.postings('merchant', 1), [['  c', 3], [' co', 3], ['co ', 3]])
+
+        TrigramIndex().update('merchant', 1, 'Co', '')
+
+        self.assertEqual(self.postings('merchant', 1), [])
+
+
+    def test_update_disabled(self):
+        TrigramIndex().available = False
+
+        TrigramIndex().update('merchant', 1, None, 'Tesco')
+
+        self.assertEqual(self.postings('merchant', 1), [])
+
+
+    def test_search(self):
+        TrigramIndex().update('merchant', 1, None, 'Tesco')
+        TrigramIndex().update('merchant', 2, None, 'Trainline')
+        TrigramIndex().update('transaction', 1, None, 'TESCO STORES 1234 LONDON GB')
+        TrigramIndex().update('transaction', 2, None, 'Tesco')
+        TrigramIndex().update('transaction', 3, None, 'Amazon Marketplace')
+
+        self.assertEqual(self.results('tesco'), [
+            ['merchant', 1, 1.0, 1.0],
+            ['transaction', 2, 1.0, 1.0],
+            ['transaction', 1, 1.0, 0.21]
+        ])
+
+        # misspellings still match, just with a lower score
+        self.assertEqual(self.results('tescco'), [
+            ['merchant', 1, 0.71, 0.62],
+            ['transaction', 2, 0.71, 0.62],
+            ['transaction', 1, 0.71, 0.17]
+        ])
+
+        self.assertEqual(self.results('amazn'), [['transaction', 3, 0.67, 0.19]])
+        self.assertEqual(self.results('sainsburys'), [])
+        self.assertEqual(self.results(''), [])
+
+
+    def test_rebuild(self):
+        DB().query("insert into provider (name) values (%s)", ['Monzo'])
+        DB().query("insert into account (provider_id, name, type, account_id, balance, available, active, sortcode, account_no) values (%s, %s, %s, %s, %s, %s, %s, %s, %s)", [1, 'Current', 'uk_retail', 'acc_1', 0, 0, 1, '', ''])
+        DB().query("insert into merchant (merchant_id, group_id, name, logo, category, online, atm, disable_feedback) values (%s, %s, %s, %s, %s, %s, %s, %s)", ['m1', 'g1', 'Tesco', '', 'groceries', 0, 0, 0])
+
+        for i, description in enumerate(['TESCO STORES', 'Trainline']):
+            DB().create('transaction', {
+                'id': i+1,
+                'account_id': 1,
+                'date': '2024-01-15',
+                'type': 'debit',
+                'description': description,
+                'money_out': 10,
+                'pending': 0,
+                'created_at': '2024-01-15 12:00:00',
+                'updated_at': '2024-01-15 12:00:00',
+                'declined': 0
+            })
+
+        TrigramIndex().update('merchant', 99, None, 'Stale')
+
+        self.assertEqual(TrigramIndex().rebuild(), 3)
+        self.assertEqual(self.postings('merchant', 99), [])
+        self.assertEqual([[match['record_type'], match['record_id']] for match in TrigramIndex().search('tesco')], [['merchant', 1], ['transaction', 1]])
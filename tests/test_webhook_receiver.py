@@ -0,0 +1,244 @@
+from base_test import BaseTest
+from unittest.mock import patch
+from unittest.mock import MagicMock
+from monzo_utils.lib.db import DB
+from monzo_utils.lib.config import Config
+from monzo_utils.lib.webhook_receiver import WebhookReceiver, WebhookError, WebhookRequestHandler
+from monzo_utils.model.account import Account
+from http.server import ThreadingHTTPServer
+import pytest
+import json
+import datetime
+import threading
+import urllib.request
+import urllib.error
+
+PAYLOAD = {
+    'type': 'transaction.created',
+    'data': {
+        'account_id': 'acc_1',
+        'amount': -350,
+        'created': '2024-01-01T12:00:00.000Z',
+        'currency': 'GBP',
+        'description': 'Ozone Coffee Roasters',
+        'id': 'tx_1',
+        'category': 'eating_out',
+        'is_load': False,
+        'settled': '2024-01-02T12:00:00.000Z',
+        'merchant': {
+            'id': 'merch_1',
+            'name': 'The De Beauvoir Deli Co.',
+            'address': {}
+        }
+    }
+}
+
+class TestWebhookReceiver(BaseTest):
+
+    def setUp(self):
+        Config._instances = {}
+        DB._instances = {}
+
+        Config._instances[Config] = Config({
+            'accounts': {
+                'acc_1': {
+                    'name': 'Current'
+                }
+            },
+            'webhook': {
+                'secret': 'secret',
+                'batch_size': 2,
+                'batch_interval': 0.1
+            }
+        })
+
+
+    def get_payload(self):
+        return json.loads(json.dumps(PAYLOAD))
+
+
+    def test_constructor(self):
+        r = WebhookReceiver()
+
+        self.assertEqual(r.listen, '127.0.0.1')
+        self.assertEqual(r.port, 8045)
+        self.assertEqual(r.secret, 'secret')
+        self.assertEqual(r.batch_size, 2)
+        self.assertEqual(r.batch_interval, 0.1)
+        self.assertEqual(r.reconcile_interval, 3600)
+
+
+    def test_validate(self):
+        r = WebhookReceiver()
+
+        data = r.validate(self.get_payload())
+
+        self.assertEqual(data['id'], 'tx_1')
+
+
+    def test_validate_wrong_type(self):
+        r = WebhookReceiver()
+
+        payload = self.get_payload()
+        payload['type'] = 'transaction.updated'
+
+        with pytest.raises(WebhookError):
+            r.validate(payload)
+
+
+    def test_validate_missing_field(self):
+        r = WebhookReceiver()
+
+        payload = self.get_payload()
+        payload['data'].pop('amount')
+
+        with pytest.raises(WebhookError) as e:
+            r.validate(payload)
+
+        self.assertIn('amount', str(e))
+
+
+    def test_validate_unknown_account(self):
+        r = WebhookReceiver()
+
+        payload = self.get_payload()
+        payload['data']['account_id'] = 'acc_2'
+
+        with pytest.raises(WebhookError):
+            r.validate(payload)
+
+
+    def test_build_transaction(self):
+        r = WebhookReceiver()
+        r.monzo_sync = MagicMock()
+
+        mo_transaction = r.build_transaction(self.get_payload()['data'])
+
+        self.assertEqual(mo_transaction.transaction_id, 'tx_1')
+        self.assertEqual(mo_transaction.amount, -350)
+        self.assertEqual(mo_transaction.created, datetime.datetime(2024,1,1,12,0,0))
+        self.assertEqual(mo_transaction.updated, datetime.datetime(2024,1,1,12,0,0))
+        self.assertEqual(mo_transaction.settled, datetime.datetime(2024,1,2,12,0,0))
+        self.assertEqual(mo_transaction.decline_reason, '')
+        self.assertEqual(mo_transaction.metadata, {})
+        self.assertEqual(mo_transaction.merchant['name'], 'The De Beauvoir Deli Co.')
+
+
+    @patch('monzo_utils.lib.db.DB.__init__')
+    @patch('monzo_utils.lib.db.DB.begin')
+    @patch('monzo_utils.lib.db.DB.commit')
+    @patch('monzo_utils.lib.log.Log.warning')
+    @patch('monzo_utils.model.account.Account.one')
+    def test_apply_batch(self, mock_account_one, mock_warning, mock_commit, mock_begin, mock_db_init):
+        mock_db_init.return_value = None
+        mock_account_one.return_value = None
+
+        r = WebhookReceiver()
+        r.monzo_sync = MagicMock()
+
+        account = Account({'id': 1, 'account_id': 'acc_1'})
+
+        r.accounts = {
+            'acc_1': account
+        }
+
+        data1 = self.get_payload()['data']
+        data2 = self.get_payload()['data']
+        data2['account_id'] = 'acc_2'
+
+        applied = r.apply_batch([data1, data2])
+
+        self.assertEqual(applied, 1)
+        self.assertEqual(r.monzo_sync.add_transaction.call_count, 1)
+        self.assertEqual(r.monzo_sync.add_transaction.call_args[0][0], account)
+        self.assertEqual(r.monzo_sync.add_transaction.call_args[0][1].transaction_id, 'tx_1')
+
+        mock_begin.assert_called()
+        mock_commit.assert_called()
+        mock_warning.assert_called()
+
+
+    @patch('monzo_utils.model.account.Account.one')
+    def test_get_account(self, mock_account_one):
+        r = WebhookReceiver()
+        r.monzo_sync = MagicMock()
+
+        # an account that hasn't been synced yet isn't cached
+        mock_account_one.return_value = None
+
+        self.assertEqual(r.get_account('acc_1'), None)
+        self.assertEqual(r.accounts, {})
+
+        account = Account({'id': 1, 'account_id': 'acc_1'})
+        mock_account_one.return_value = account
+
+        self.assertEqual(r.get_account('acc_1'), account)
+        self.assertEqual(r.get_account('acc_1'), account)
+        self.assertEqual(mock_account_one.call_count, 2)
+
+
+    @patch('monzo_utils.lib.db.DB.__init__')
+    @patch('monzo_utils.lib.db.DB.begin')
+    @patch('monzo_utils.lib.db.DB.rollback')
+    def test_apply_batch_rollback(self, mock_rollback, mock_begin, mock_db_init):
+        mock_db_init.return_value = None
+
+        r = WebhookReceiver()
+        r.monzo_sync = MagicMock()
+        r.monzo_sync.add_transaction.side_effect = Exception('db error')
+        r.accounts = {'acc_1': Account({'id': 1})}
+
+        with pytest.raises(Exception):
+            r.apply_batch([self.get_payload()['data']])
+
+        mock_rollback.assert_called()
+
+
+    def test_next_batch(self):
+        r = WebhookReceiver()
+
+        for i in range(0, 3):
+            r.enqueue(self.get_payload())
+
+        self.assertEqual(len(r.next_batch()), 2)
+        self.assertEqual(len(r.next_batch()), 1)
+        self.assertEqual(len(r.next_batch()), 0)
+
+
+    def post(self, port, path, body):
+        request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=body, method='POST')
+
+        try:
+            response = urllib.request.urlopen(request)
+
+            return response.code, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+
+    def test_http_receiver(self):
+        r = WebhookReceiver()
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), WebhookRequestHandler)
+        server.receiver = r
+
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        port = server.server_address[1]
+
+        try:
+            code, resp = self.post(port, '/webhook/wrong', json.dumps(self.get_payload()).encode('utf-8'))
+            self.assertEqual(code, 403)
+
+            code, resp = self.post(port, '/webhook/secret', b'not json')
+            self.assertEqual(code, 400)
+
+            code, resp = self.post(port, '/webhook/secret', json.dumps(self.get_payload()).encode('utf-8'))
+            self.assertEqual(code, 200)
+            self.assertEqual(resp, {'status': 'queued'})
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(r.queue.qsize(), 1)